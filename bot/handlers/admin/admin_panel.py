@@ -1,49 +1,31 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
 
-from database.base import async_session_factory
-from database.models.user import User
 from bot.keyboards.common import get_admin_panel_keyboard, get_manager_panel_keyboard
+from bot.middlewares.permissions import Permission, require_permission
+from bot.utils.user_cache import UserIdentity
 
 router = Router()
+require_permission(router, Permission.STAFF)
 
 
 
 
-@router.message(F.text.in_(["👨‍💼 Админ панель", "👨‍💼 Administrator paneli", "👨‍💼 Панели администратор", "👨‍💼 Админ панели"]))
-async def admin_panel(message: Message, state: FSMContext):
+@router.message(
+    F.text.in_(["👨‍💼 Админ панель", "👨‍💼 Administrator paneli", "👨‍💼 Панели администратор", "👨‍💼 Админ панели"]),
+    flags={"permission": Permission.ADMIN}
+)
+async def admin_panel(message: Message, state: FSMContext, identity: UserIdentity):
     """Вход в административную панель"""
     await state.clear()
     print(f"🚨 ADMIN PANEL: Обработчик вызван!")
     
-    telegram_id = message.from_user.id
-    username = message.from_user.username
-    full_name = message.from_user.full_name
-    
+    # Права администратора уже проверены PermissionMiddleware
     print(f"🔍 DEBUG: Нажатие на админ панель от пользователя:")
-    print(f"   - ID: {telegram_id}")
-    print(f"   - Username: @{username}")
-    print(f"   - Name: {full_name}")
-    
-    async with async_session_factory() as session:
-        # Проверяем права доступа
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        print(f"🔍 DEBUG: Найден пользователь в БД: {user is not None}")
-        if user:
-            print(f"   - Роль: {user.role.value}")
-            print(f"   - is_admin: {user.is_admin}")
-            print(f"   - Статус: {user.status.value}")
-        
-        if not user or not user.is_admin:
-            print(f"❌ DEBUG: Доступ запрещен - user: {user is not None}, is_admin: {user.is_admin if user else False}")
-            await message.answer("❌ У вас нет прав администратора")
-            return
+    print(f"   - ID: {identity.telegram_id}")
+    print(f"   - Username: @{message.from_user.username}")
+    print(f"   - Роль: {identity.role.value if identity.role else None}")
     
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     
@@ -61,11 +43,12 @@ async def admin_panel(message: Message, state: FSMContext):
         ]
     ])
     
-    print(f"✅ DEBUG: Отправляем админ панель пользователю {user.full_name}")
+    full_name = identity.full_name or message.from_user.full_name
+    print(f"✅ DEBUG: Отправляем админ панель пользователю {full_name}")
     
     await message.answer(
         "👨‍💼 **Административная панель**\n\n"
-        f"Добро пожаловать, {user.full_name}!\n"
+        f"Добро пожаловать, {full_name}!\n"
         "Выберите раздел для управления:",
         reply_markup=admin_keyboard
     )
@@ -74,25 +57,13 @@ async def admin_panel(message: Message, state: FSMContext):
 
 
 @router.message(F.text.in_(["👨‍💼 Менеджер панель", "👨‍💼 Menejer paneli", "👨‍💼 Панели менеҷер", "👨‍💼 Менеджер панели"]))
-async def manager_panel(message: Message, state: FSMContext):
+async def manager_panel(message: Message, state: FSMContext, identity: UserIdentity):
     """Вход в менеджерскую панель"""
     await state.clear()
-    telegram_id = message.from_user.id
-    
-    async with async_session_factory() as session:
-        # Проверяем права доступа
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.is_staff:
-            await message.answer("❌ У вас нет прав менеджера")
-            return
     
     await message.answer(
         "👨‍💼 **Менеджерская панель**\n\n"
-        f"Добро пожаловать, {user.full_name}!\n"
+        f"Добро пожаловать, {identity.full_name or message.from_user.full_name}!\n"
         "Выберите раздел для управления:",
         reply_markup=get_manager_panel_keyboard()
     )
@@ -162,18 +133,6 @@ async def admin_settings_callback(callback: CallbackQuery, state: FSMContext):
 async def admin_documents_text(message: Message, state: FSMContext):
     """Обработка текстовой кнопки Документы"""
     await state.clear()
-    telegram_id = message.from_user.id
-    
-    async with async_session_factory() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.can_verify_documents:
-            await message.answer("❌ У вас нет прав для проверки документов")
-            return
-    
     from bot.handlers.admin.document_verification import documents_menu
     await documents_menu(message, state)
 
@@ -182,18 +141,6 @@ async def admin_documents_text(message: Message, state: FSMContext):
 async def admin_bikes_text(message: Message, state: FSMContext):
     """Обработка текстовой кнопки Велосипеды"""
     await state.clear()
-    telegram_id = message.from_user.id
-    
-    async with async_session_factory() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.can_manage_bikes:
-            await message.answer("❌ У вас нет прав для управления велосипедами")
-            return
-    
     # Используем существующую функцию из bike_management
     from bot.keyboards.admin import get_bike_management_keyboard
     await message.answer(
@@ -207,17 +154,5 @@ async def admin_bikes_text(message: Message, state: FSMContext):
 async def admin_settings_text(message: Message, state: FSMContext):
     """Обработка текстовой кнопки Настройки"""
     await state.clear()
-    telegram_id = message.from_user.id
-    
-    async with async_session_factory() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.is_staff:
-            await message.answer("❌ У вас нет прав для изменения настроек")
-            return
-    
     from bot.handlers.admin.settings_management import settings_menu
     await settings_menu(message, state) 
\ No newline at end of file
@@ -5,7 +5,6 @@ from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 
 from database.base import async_session_factory
-from database.models.user import User
 from database.models.bike import Bike, Battery, BikeStatus
 from bot.keyboards.admin import (
     get_bike_management_keyboard, 
@@ -14,26 +13,16 @@ from bot.keyboards.admin import (
     get_bike_status_keyboard
 )
 from bot.keyboards.common import get_admin_panel_keyboard
+from bot.middlewares.permissions import Permission, require_permission
 
 router = Router()
+require_permission(router, Permission.MANAGE_BIKES)
 
 
 @router.message(F.text.in_(["🚴‍♂️ Велосипеды", "🚴‍♂️ Velosipedlar", "🚴‍♂️ Дучархаҳо", "🚴‍♂️ Велосипеддер"]))
 async def bike_management_menu(message: Message, state: FSMContext):
     """Главное меню управления велосипедами"""
     await state.clear()
-    telegram_id = message.from_user.id
-    
-    async with async_session_factory() as session:
-        # Проверяем права доступа
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.can_manage_bikes:
-            await message.answer("❌ У вас нет прав для управления велосипедами")
-            return
     
     await message.answer(
         "🚴‍♂️ **Управление парком велосипедов**\n\n"
@@ -1,17 +1,71 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select, update
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from datetime import datetime
+from typing import Iterable, Optional, Tuple
+import hashlib
 
 from database.base import async_session_factory
 from database.models.user import User, UserStatus, UserRole
 from database.models.document import Document, DocumentStatus, DocumentType
-from bot.keyboards.admin import get_document_verification_keyboard
+from bot.keyboards.admin import get_document_verification_keyboard, get_review_queue_keyboard, get_user_review_keyboard
 from bot.keyboards.common import get_admin_panel_keyboard
+from bot.middlewares.permissions import Permission, require_permission
+from bot.utils.document_photos import send_document_album, send_document_photo
+from bot.utils.user_cache import identity_cache
+from services.document_review_queue import get_document_review_queue, load_review_user
 
 router = Router()
+require_permission(router, Permission.VERIFY_DOCUMENTS)
+
+# Проблемы качества фото, найденные при загрузке (services/image_processing.py)
+QUALITY_ISSUE_LABELS = {
+    "blurry": "размыто",
+    "dark": "темно",
+    "overexposed": "засвечено",
+    "low_resolution": "низкое разрешение",
+}
+
+
+def quality_flag(document: Document) -> str:
+    """Пометка о плохом качестве фото (пустая строка, если проблем нет)"""
+    problems = document.quality_problems
+    if not problems:
+        return ""
+    return " ⚠️ " + ", ".join(QUALITY_ISSUE_LABELS.get(problem, problem) for problem in problems)
+
+
+class DocumentsChangedError(Exception):
+    """Документы пользователя изменились после того, как их показали администратору"""
+
+
+def review_token(documents: Iterable) -> str:
+    """
+    Версия показанных администратору документов для callback_data
+    
+    Пока документ на проверке, пользователь может переснять фото - тогда
+    меняется file_path (ключ файла зависит от содержимого). Решение
+    администратора применяется, только если версия совпадает, чтобы
+    нельзя было одобрить фото, которое администратор не видел.
+    """
+    digest = hashlib.sha256()
+    for document in sorted(documents, key=lambda d: d.id):
+        digest.update(f"{document.id}:{document.file_path};".encode())
+    return digest.hexdigest()[:10]
+
+
+def pending_review_token(user: User) -> str:
+    """Версия документов пользователя на проверке"""
+    return review_token(d for d in user.documents if d.status == DocumentStatus.PENDING)
+
+
+def split_review_callback(data: str, prefix: str) -> Tuple[int, str]:
+    """id и версия документов из callback_data вида <prefix><id>_<версия>"""
+    target_id, _, token = data[len(prefix):].partition("_")
+    return int(target_id), token
 
 
 
@@ -26,25 +80,14 @@ async def documents_menu(message_or_callback, state: FSMContext):
     if hasattr(message_or_callback, 'message'):
         # Это callback
         message = message_or_callback.message
-        telegram_id = message_or_callback.from_user.id
         send_method = message.edit_text
     else:
         # Это обычное сообщение
         message = message_or_callback
-        telegram_id = message.from_user.id
         send_method = message.answer
     
     async with async_session_factory() as session:
-        # Проверяем права доступа
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.can_verify_documents:
-            await send_method("❌ У вас нет прав для проверки документов")
-            return
-        
+        # Права доступа уже проверены PermissionMiddleware
         # Получаем пользователей по статусам
         unverified_users = await session.execute(
             select(User)
@@ -69,6 +112,7 @@ async def documents_menu(message_or_callback, state: FSMContext):
     )
     
     keyboard = [
+        [InlineKeyboardButton(text="▶️ Проверять по очереди", callback_data="admin_review_next")],
         [InlineKeyboardButton(text=f"❌ Не прошли ({unverified_count})", callback_data="admin_users_unverified")],
         [InlineKeyboardButton(text=f"✅ Прошли ({verified_count})", callback_data="admin_users_verified")],
         [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_admin")]
@@ -257,8 +301,13 @@ async def show_user_documents(callback: CallbackQuery, state: FSMContext):
             status_text = status_emoji.get(doc.status, "❓")
             upload_date = doc.uploaded_at.strftime("%d.%m.%Y") if doc.uploaded_at else "Неизвестно"
             
+            # Файл еще скачивается фоновой очередью - показывать нечего
+            if not doc.is_ingested:
+                docs_text.append(f"📥 {doc_type_name} (ID: {doc.id}) - загружается...")
+                continue
+            
             docs_text.append(
-                f"{status_text} {doc_type_name} (ID: {doc.id}) - 📅 {upload_date}"
+                f"{status_text} {doc_type_name} (ID: {doc.id}) - 📅 {upload_date}{quality_flag(doc)}"
             )
             
             # Кнопка для просмотра документа
@@ -271,10 +320,14 @@ async def show_user_documents(callback: CallbackQuery, state: FSMContext):
         
         # Кнопки массовых действий
         pending_docs = [d for d in user.documents if d.status == DocumentStatus.PENDING]
-        if pending_docs:
+        if pending_docs and all(d.is_ingested for d in user.documents):
+            token = review_token(pending_docs)
             keyboard.append([
-                InlineKeyboardButton(text="✅ Одобрить все", callback_data=f"admin_approve_all_{user.id}"),
-                InlineKeyboardButton(text="❌ Отклонить все", callback_data=f"admin_reject_all_{user.id}")
+                InlineKeyboardButton(text="🗂 Проверить все одним альбомом", callback_data=f"admin_review_user_{user.id}")
+            ])
+            keyboard.append([
+                InlineKeyboardButton(text="✅ Одобрить все", callback_data=f"admin_approve_all_{user.id}_{token}"),
+                InlineKeyboardButton(text="❌ Отклонить все", callback_data=f"admin_reject_all_{user.id}_{token}")
             ])
         
         keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_users_unverified")])
@@ -299,6 +352,137 @@ async def show_user_documents(callback: CallbackQuery, state: FSMContext):
             )
 
 
+@router.callback_query(F.data.startswith("admin_review_user_"))
+async def review_user_documents(callback: CallbackQuery, state: FSMContext):
+    """Показать все документы пользователя на проверке одним альбомом"""
+    user_id = int(callback.data.split("_")[-1])
+    
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(User)
+            .options(selectinload(User.documents))
+            .where(User.id == user_id)
+        )
+        user = result.scalar_one_or_none()
+    
+    if not user:
+        await callback.answer("❌ Пользователь не найден", show_alert=True)
+        return
+    
+    if not all(d.is_ingested for d in user.documents):
+        await callback.answer("📥 Документы еще загружаются, попробуйте через минуту", show_alert=True)
+        return
+    
+    if not any(d.status == DocumentStatus.PENDING for d in user.documents):
+        await callback.answer("✅ У пользователя нет документов на проверке", show_alert=True)
+        return
+    
+    await callback.answer()
+    await send_user_review(callback, user, get_user_review_keyboard(user.id, pending_review_token(user)))
+
+
+async def send_user_review(callback: CallbackQuery, user: User, reply_markup: InlineKeyboardMarkup) -> None:
+    """Заменить сообщение callback альбомом документов пользователя на проверке"""
+    documents = [d for d in user.documents if d.status == DocumentStatus.PENDING]
+    
+    doc_types = {
+        DocumentType.PASSPORT: "📄 Паспорт",
+        DocumentType.DRIVER_LICENSE: "🚗 Водительские права",
+        DocumentType.SELFIE: "🤳 Селфи с документом"
+    }
+    
+    # Документ - первым, селфи - последним
+    type_order = [DocumentType.PASSPORT, DocumentType.DRIVER_LICENSE, DocumentType.SELFIE]
+    documents.sort(key=lambda d: type_order.index(d.document_type) if d.document_type in type_order else len(type_order))
+    
+    caption_lines = [
+        f"👤 {user.full_name}",
+        f"📱 @{user.username or 'без username'}",
+        f"📞 {user.phone or 'не указан'}\n",
+    ]
+    for i, doc in enumerate(documents, 1):
+        upload_date = doc.uploaded_at.strftime("%d.%m.%Y") if doc.uploaded_at else "Неизвестно"
+        caption_lines.append(f"{i}. {doc_types.get(doc.document_type, 'Неизвестный тип')} (ID: {doc.id}) - 📅 {upload_date}{quality_flag(doc)}")
+    
+    # Список документов заменяется альбомом
+    try:
+        await callback.message.delete()
+    except:
+        pass
+    
+    # Все документы - одним запросом (повторно - по сохраненным file_id)
+    try:
+        await send_document_album(callback.message, documents, "\n".join(caption_lines))
+    except Exception as e:
+        await callback.message.answer(f"❌ Ошибка загрузки файлов: {str(e)}")
+    
+    await callback.message.answer(
+        f"📋 Документов на проверке: {len(documents)}. Решение применяется ко всем.",
+        reply_markup=reply_markup
+    )
+
+
+@router.callback_query(F.data.in_(["admin_review_next", "admin_review_skip", "admin_review_restart"]))
+async def review_next_user(callback: CallbackQuery, state: FSMContext):
+    """Показать следующего пользователя из очереди проверки"""
+    queue = get_document_review_queue()
+    admin_id = callback.from_user.id
+    
+    if callback.data == "admin_review_restart":
+        await queue.reset_skipped(admin_id)
+    
+    await callback.answer()
+    await show_next_in_queue(callback, skip=callback.data == "admin_review_skip")
+
+
+async def show_next_in_queue(callback: CallbackQuery, skip: bool = False) -> None:
+    """Закрепить за администратором следующего пользователя и показать его документы"""
+    queue = get_document_review_queue()
+    admin_id = callback.from_user.id
+    
+    user = await queue.claim_next(admin_id, skip=skip)
+    if user is None:
+        try:
+            await callback.message.delete()
+        except:
+            pass
+        
+        await callback.message.answer(
+            "✅ **Очередь пуста**\n\n"
+            "Нет пользователей, готовых к проверке (или остальных уже проверяют другие администраторы).",
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [InlineKeyboardButton(text="🔄 Начать сначала (с пропущенными)", callback_data="admin_review_restart")],
+                    [InlineKeyboardButton(text="◀️ Назад", callback_data="admin_documents")]
+                ]
+            )
+        )
+        return
+    
+    await send_user_review(callback, user, get_review_queue_keyboard(user.id, pending_review_token(user)))
+    
+    # Пока администратор смотрит текущего пользователя, готовим следующего
+    queue.prefetch(callback.bot, admin_id)
+
+
+@router.callback_query(F.data == "admin_review_stop")
+async def stop_review_queue(callback: CallbackQuery, state: FSMContext):
+    """Закончить проверку по очереди"""
+    await get_document_review_queue().stop(callback.from_user.id)
+    await callback.answer("⏹ Проверка завершена")
+    
+    try:
+        await callback.message.delete()
+    except:
+        pass
+    
+    fake_message = type('obj', (object,), {
+        'answer': callback.message.answer,
+        'from_user': callback.from_user
+    })()
+    await documents_menu(fake_message, state)
+
+
 @router.callback_query(F.data.startswith("admin_view_doc_"))
 async def view_document(callback: CallbackQuery, state: FSMContext):
     """Просмотр конкретного документа"""
@@ -316,6 +500,10 @@ async def view_document(callback: CallbackQuery, state: FSMContext):
             await callback.answer("❌ Документ не найден", show_alert=True)
             return
         
+        if not document.is_ingested:
+            await callback.answer("📥 Документ еще загружается, попробуйте через минуту", show_alert=True)
+            return
+        
         doc_types = {
             DocumentType.PASSPORT: "📄 Паспорт",
             DocumentType.DRIVER_LICENSE: "🚗 Водительские права",
@@ -343,61 +531,267 @@ async def view_document(callback: CallbackQuery, state: FSMContext):
         if document.admin_comment:
             doc_info += f"\n💬 Комментарий: {document.admin_comment}"
         
-        # Отправляем фото документа
+        # Отправляем фото документа (повторно - по сохраненному file_id)
         try:
-            photo = FSInputFile(document.file_path)
-            await callback.message.answer_photo(
-                photo=photo,
+            await send_document_photo(
+                callback.message,
+                document,
                 caption=doc_info,
-                reply_markup=get_document_verification_keyboard(document.id, document.user_id)
+                reply_markup=get_document_verification_keyboard(document.id, document.user_id, review_token([document]))
             )
         except Exception as e:
             # Если не удалось отправить фото, отправляем только текст
             await callback.message.edit_text(
                 f"{doc_info}\n\n❌ Ошибка загрузки файла: {str(e)}",
-                reply_markup=get_document_verification_keyboard(document.id, document.user_id)
+                reply_markup=get_document_verification_keyboard(document.id, document.user_id, review_token([document]))
             )
 
 
 @router.callback_query(F.data.startswith("doc_approve_"))
 async def approve_document(callback: CallbackQuery, state: FSMContext):
     """Одобрить документ"""
-    doc_id = int(callback.data.split("_")[-1])
-    await process_document_verification(callback, doc_id, DocumentStatus.APPROVED, "✅ Документ одобрен", state)
+    doc_id, token = split_review_callback(callback.data, "doc_approve_")
+    await process_document_verification(callback, doc_id, token, DocumentStatus.APPROVED, "✅ Документ одобрен", state)
 
 
 @router.callback_query(F.data.startswith("doc_reject_"))
 async def reject_document(callback: CallbackQuery, state: FSMContext):
     """Отклонить документ"""
-    doc_id = int(callback.data.split("_")[-1])
-    await process_document_verification(callback, doc_id, DocumentStatus.REJECTED, "❌ Документ отклонен", state)
+    doc_id, token = split_review_callback(callback.data, "doc_reject_")
+    await process_document_verification(callback, doc_id, token, DocumentStatus.REJECTED, "❌ Документ отклонен", state)
 
 
 @router.callback_query(F.data.startswith("doc_revision_"))
 async def revision_document(callback: CallbackQuery, state: FSMContext):
     """Отправить на доработку"""
-    doc_id = int(callback.data.split("_")[-1])
-    await process_document_verification(callback, doc_id, DocumentStatus.REVISION, "🔄 Документ отправлен на доработку", state)
+    doc_id, token = split_review_callback(callback.data, "doc_revision_")
+    await process_document_verification(callback, doc_id, token, DocumentStatus.REVISION, "🔄 Документ отправлен на доработку", state)
+
 
+@router.callback_query(F.data.startswith("admin_approve_all_"))
+async def approve_all_documents(callback: CallbackQuery, state: FSMContext):
+    """Одобрить все документы пользователя на проверке"""
+    user_id, token = split_review_callback(callback.data, "admin_approve_all_")
+    await process_user_verification(callback, user_id, token, DocumentStatus.APPROVED, "✅ Документы одобрены", state)
 
-async def process_document_verification(callback: CallbackQuery, doc_id: int, new_status: DocumentStatus, success_message: str, state: FSMContext):
-    """Обработать верификацию документа"""
+
+@router.callback_query(F.data.startswith("admin_reject_all_"))
+async def reject_all_documents(callback: CallbackQuery, state: FSMContext):
+    """Отклонить все документы пользователя на проверке"""
+    user_id, token = split_review_callback(callback.data, "admin_reject_all_")
+    await process_user_verification(callback, user_id, token, DocumentStatus.REJECTED, "❌ Документы отклонены", state)
+
+
+async def verify_user_if_all_approved(session: AsyncSession, callback: CallbackQuery, user: User) -> None:
+    """Верифицировать пользователя, если все его документы одобрены"""
+    user_docs = await session.execute(
+        select(Document).where(Document.user_id == user.id)
+    )
+    all_docs = user_docs.scalars().all()
+    
+    # Если все документы одобрены, верифицируем пользователя
+    if all(doc.status == DocumentStatus.APPROVED for doc in all_docs):
+        await session.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(status=UserStatus.VERIFIED)
+        )
+        
+        # Уведомляем пользователя
+        try:
+            bot = callback.bot
+            await bot.send_message(
+                user.telegram_id,
+                "🎉 **Поздравляем!**\n\n"
+                "✅ Все ваши документы прошли проверку!\n"
+                "🚴‍♂️ Теперь вы можете арендовать велосипеды.\n\n"
+                "Используйте кнопку \"🚴‍♂️ Арендовать\" в главном меню."
+            )
+        except:
+            pass  # Игнорируем ошибки отправки уведомлений
+
+
+async def show_user_documents_again(callback: CallbackQuery, user_id: int, state: FSMContext) -> None:
+    """Вернуться к списку документов пользователя"""
+    try:
+        await callback.message.delete()
+    except:
+        pass  # Игнорируем ошибки удаления
+    
+    fake_callback = type('obj', (object,), {
+        'data': f"admin_user_docs_{user_id}",
+        'message': callback.message,
+        'from_user': callback.from_user,
+        'bot': callback.bot
+    })()
+    await show_user_documents(fake_callback, state)
+
+
+@router.callback_query(F.data.startswith("admin_queue_approve_"))
+async def queue_approve_documents(callback: CallbackQuery, state: FSMContext):
+    """Одобрить документы пользователя из очереди и перейти к следующему"""
+    user_id, token = split_review_callback(callback.data, "admin_queue_approve_")
+    await process_queue_verification(callback, user_id, token, DocumentStatus.APPROVED, "✅ Документы одобрены")
+
+
+@router.callback_query(F.data.startswith("admin_queue_reject_"))
+async def queue_reject_documents(callback: CallbackQuery, state: FSMContext):
+    """Отклонить документы пользователя из очереди и перейти к следующему"""
+    user_id, token = split_review_callback(callback.data, "admin_queue_reject_")
+    await process_queue_verification(callback, user_id, token, DocumentStatus.REJECTED, "❌ Документы отклонены")
+
+
+async def process_queue_verification(callback: CallbackQuery, user_id: int, token: str, new_status: DocumentStatus, success_message: str):
+    """Применить решение к пользователю из очереди и показать следующего"""
+    # Аренда могла истечь - тогда пользователя мог взять другой администратор
+    if not await get_document_review_queue().acquire(user_id, callback.from_user.id):
+        await callback.answer("⚠️ Этого пользователя уже проверяет другой администратор", show_alert=True)
+        await show_next_in_queue(callback)
+        return
+    
+    try:
+        count = await apply_user_verification(callback, user_id, token, new_status)
+    except DocumentsChangedError:
+        await callback.answer("⚠️ Пользователь переснял фото - проверьте документы еще раз", show_alert=True)
+        
+        # Новое фото еще загружается - пользователь вернется в очередь позже
+        user = await load_review_user(user_id)
+        if user is None:
+            await show_next_in_queue(callback)
+        else:
+            await send_user_review(callback, user, get_review_queue_keyboard(user.id, pending_review_token(user)))
+        return
+    
+    if count:
+        await callback.answer(f"{success_message} ({count})")
+    else:
+        await callback.answer("ℹ️ Нет документов на проверке")
+    
+    await show_next_in_queue(callback)
+
+
+async def apply_user_verification(callback: CallbackQuery, user_id: int, token: str, new_status: DocumentStatus) -> Optional[int]:
+    """
+    Применить решение ко всем документам пользователя на проверке
+    
+    Args:
+        token: Версия документов, показанных администратору (review_token)
+    
+    Returns:
+        Optional[int]: Количество документов (None - пользователь не найден)
+    
+    Raises:
+        DocumentsChangedError: Документы изменились после показа
+    """
     async with async_session_factory() as session:
-        # Обновляем статус документа
         admin_result = await session.execute(
             select(User).where(User.telegram_id == callback.from_user.id)
         )
         admin = admin_result.scalar_one_or_none()
         
-        await session.execute(
+        user = await session.get(User, user_id)
+        if not user:
+            return None
+        
+        # Только загруженные документы: незагруженные администратор не видел
+        pending = await session.execute(
+            select(Document.id, Document.file_path)
+            .where(
+                Document.user_id == user_id,
+                Document.status == DocumentStatus.PENDING,
+                Document.file_path != ""
+            )
+        )
+        shown = pending.all()
+        if review_token(shown) != token:
+            raise DocumentsChangedError(user_id)
+        if not shown:
+            return 0
+        
+        # Пользователь мог переснять фото и после проверки версии
+        result = await session.execute(
             update(Document)
-            .where(Document.id == doc_id)
+            .where(
+                Document.status == DocumentStatus.PENDING,
+                or_(*(
+                    and_(Document.id == document.id, Document.file_path == document.file_path)
+                    for document in shown
+                ))
+            )
             .values(
                 status=new_status,
                 verified_at=datetime.utcnow(),
                 verified_by=admin.id if admin else None
             )
         )
+        if result.rowcount != len(shown):
+            await session.rollback()
+            raise DocumentsChangedError(user_id)
+        
+        if result.rowcount:
+            await verify_user_if_all_approved(session, callback, user)
+        
+        await session.commit()
+    
+    # Статус пользователя мог измениться
+    identity_cache.invalidate(user.telegram_id)
+    return result.rowcount
+
+
+async def process_user_verification(callback: CallbackQuery, user_id: int, token: str, new_status: DocumentStatus, success_message: str, state: FSMContext):
+    """Применить решение ко всем документам пользователя на проверке"""
+    try:
+        count = await apply_user_verification(callback, user_id, token, new_status)
+    except DocumentsChangedError:
+        await callback.answer("⚠️ Пользователь переснял фото - проверьте документы еще раз", show_alert=True)
+        await show_user_documents_again(callback, user_id, state)
+        return
+    
+    if count is None:
+        await callback.answer("❌ Пользователь не найден", show_alert=True)
+        return
+    
+    if count:
+        await callback.answer(f"{success_message} ({count})", show_alert=True)
+    else:
+        await callback.answer("ℹ️ Нет документов на проверке", show_alert=True)
+    
+    await show_user_documents_again(callback, user_id, state)
+
+
+async def process_document_verification(callback: CallbackQuery, doc_id: int, token: str, new_status: DocumentStatus, success_message: str, state: FSMContext):
+    """Обработать верификацию документа (token - версия показанного фото)"""
+    async with async_session_factory() as session:
+        # Обновляем статус документа
+        admin_result = await session.execute(
+            select(User).where(User.telegram_id == callback.from_user.id)
+        )
+        admin = admin_result.scalar_one_or_none()
+        
+        shown_result = await session.execute(
+            select(Document.id, Document.user_id, Document.file_path).where(Document.id == doc_id)
+        )
+        shown = shown_result.one_or_none()
+        if shown is None:
+            await callback.answer("❌ Документ не найден", show_alert=True)
+            return
+        
+        # Решение относится только к тому фото, которое видел администратор
+        result = None
+        if review_token([shown]) == token:
+            result = await session.execute(
+                update(Document)
+                .where(Document.id == doc_id, Document.file_path == shown.file_path)
+                .values(
+                    status=new_status,
+                    verified_at=datetime.utcnow(),
+                    verified_by=admin.id if admin else None
+                )
+            )
+        if result is None or not result.rowcount:
+            await callback.answer("⚠️ Пользователь переснял фото - проверьте документ еще раз", show_alert=True)
+            await show_user_documents_again(callback, shown.user_id, state)
+            return
         
         # Получаем документ и пользователя
         doc_result = await session.execute(
@@ -409,49 +803,18 @@ async def process_document_verification(callback: CallbackQuery, doc_id: int, ne
         
         if document:
             # Проверяем, все ли документы пользователя одобрены
-            user_docs = await session.execute(
-                select(Document).where(Document.user_id == document.user_id)
-            )
-            all_docs = user_docs.scalars().all()
-            
-            # Если все документы одобрены, верифицируем пользователя
-            if all(doc.status == DocumentStatus.APPROVED for doc in all_docs):
-                await session.execute(
-                    update(User)
-                    .where(User.id == document.user_id)
-                    .values(status=UserStatus.VERIFIED)
-                )
-                
-                # Уведомляем пользователя
-                try:
-                    bot = callback.bot
-                    await bot.send_message(
-                        document.user.telegram_id,
-                        "🎉 **Поздравляем!**\n\n"
-                        "✅ Все ваши документы прошли проверку!\n"
-                        "🚴‍♂️ Теперь вы можете арендовать велосипеды.\n\n"
-                        "Используйте кнопку \"🚴‍♂️ Арендовать\" в главном меню."
-                    )
-                except:
-                    pass  # Игнорируем ошибки отправки уведомлений
+            await verify_user_if_all_approved(session, callback, document.user)
         
         await session.commit()
         
+        if document:
+            # Статус пользователя мог измениться
+            identity_cache.invalidate(document.user.telegram_id)
+        
         await callback.answer(success_message, show_alert=True)
         
         # Возвращаемся к списку документов пользователя
-        try:
-            await callback.message.delete()
-        except:
-            pass  # Игнорируем ошибки удаления
-            
-        fake_callback = type('obj', (object,), {
-            'data': f"admin_user_docs_{document.user_id}",
-            'message': callback.message,
-            'from_user': callback.from_user,
-            'bot': callback.bot
-        })()
-        await show_user_documents(fake_callback, state)
+        await show_user_documents_again(callback, document.user_id, state)
 
 
 @router.callback_query(F.data == "admin_documents_menu")
@@ -1,31 +1,19 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
 
-from database.base import async_session_factory
-from database.models.user import User
 from services.settings_service import SettingsService
+from bot.utils.screen_cache import screen_cache
+from bot.middlewares.permissions import Permission, require_permission
 
 router = Router()
+require_permission(router, Permission.MANAGE_SETTINGS)
 
 
 @router.message(F.text.in_(["⚙️ Настройки", "⚙️ Sozlamalar", "⚙️ Танзимот", "⚙️ Жөндөөлөр"]))
 async def settings_menu(message: Message, state: FSMContext):
     """Главное меню настроек системы"""
     await state.clear()
-    telegram_id = message.from_user.id
-    
-    async with async_session_factory() as session:
-        # Проверяем права доступа
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.is_staff:
-            await message.answer("❌ У вас нет прав для изменения настроек")
-            return
     
     # Получаем текущие настройки
     settings = await SettingsService.get_settings()
@@ -56,6 +44,15 @@ async def settings_menu(message: Message, state: FSMContext):
 @router.callback_query(F.data == "settings_contacts")
 async def edit_contacts(callback: CallbackQuery, state: FSMContext):
     """Редактирование контактной информации"""
+    contact_text, keyboard = await screen_cache.get_or_render(
+        "settings_contacts", "ru", render_contacts_screen
+    )
+    
+    await callback.message.edit_text(contact_text, reply_markup=keyboard)
+
+
+async def render_contacts_screen():
+    """Отрендерить экран редактирования контактов"""
     settings = await SettingsService.get_settings()
     
     contact_text = (
@@ -66,22 +63,28 @@ async def edit_contacts(callback: CallbackQuery, state: FSMContext):
         "Выберите, что изменить:"
     )
     
-    keyboard = [
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📍 Изменить адрес", callback_data="edit_address")],
         [InlineKeyboardButton(text="📞 Изменить телефон", callback_data="edit_phone")],
         [InlineKeyboardButton(text="📧 Изменить email", callback_data="edit_email")],
         [InlineKeyboardButton(text="◀️ Назад к настройкам", callback_data="settings_back")]
-    ]
+    ])
     
-    await callback.message.edit_text(
-        contact_text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
-    )
+    return contact_text, keyboard
 
 
 @router.callback_query(F.data == "settings_hours")
 async def edit_working_hours(callback: CallbackQuery, state: FSMContext):
     """Редактирование часов работы"""
+    hours_text, keyboard = await screen_cache.get_or_render(
+        "settings_hours", "ru", render_working_hours_screen
+    )
+    
+    await callback.message.edit_text(hours_text, reply_markup=keyboard)
+
+
+async def render_working_hours_screen():
+    """Отрендерить экран редактирования часов работы"""
     settings = await SettingsService.get_settings()
     
     hours_text = (
@@ -90,17 +93,14 @@ async def edit_working_hours(callback: CallbackQuery, state: FSMContext):
         "Выберите режим редактирования:"
     )
     
-    keyboard = [
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📅 Общие часы (Пн-Вс)", callback_data="edit_general_hours")],
         [InlineKeyboardButton(text="📋 По дням недели", callback_data="edit_daily_hours")],
         [InlineKeyboardButton(text="🚀 Быстрые настройки", callback_data="quick_hours")],
         [InlineKeyboardButton(text="◀️ Назад к настройкам", callback_data="settings_back")]
-    ]
+    ])
     
-    await callback.message.edit_text(
-        hours_text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
-    )
+    return hours_text, keyboard
 
 
 @router.callback_query(F.data == "quick_hours")
@@ -205,6 +205,24 @@ async def start_edit_phone(callback: CallbackQuery, state: FSMContext):
     await state.set_state(SettingsStates.editing_phone)
 
 
+@router.callback_query(F.data == "settings_maintenance")
+async def toggle_maintenance_mode(callback: CallbackQuery, state: FSMContext):
+    """Включить/выключить режим технических работ"""
+    settings = await SettingsService.get_settings()
+    enabled = not settings.maintenance_mode
+    
+    success = await SettingsService.set_maintenance_mode(enabled, settings.maintenance_message)
+    
+    if success:
+        await callback.answer(
+            "🚧 Режим техработ включен" if enabled else "✅ Режим техработ выключен",
+            show_alert=True
+        )
+        await back_to_settings(callback, state)
+    else:
+        await callback.answer("❌ Ошибка при обновлении", show_alert=True)
+
+
 @router.callback_query(F.data == "settings_back")
 async def back_to_settings(callback: CallbackQuery, state: FSMContext):
     """Возврат к настройкам"""
@@ -1,15 +1,20 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 
 from database.base import async_session_factory
 from database.models.user import User, UserStatus
 from database.models.document import Document, DocumentStatus, DocumentType
 from bot.keyboards.common import get_language_selection_keyboard, get_main_menu_keyboard
+from bot.states.documents import DocumentRetakeStates
+from bot.utils.document_photos import send_document_photo
 from bot.utils.i18n import change_user_language, get_language_name
+from bot.utils.tiered_storage import REDIS_UNAVAILABLE_ERRORS
 from bot.utils.translations import get_text, get_user_language
+from services.document_ingestion import get_document_ingestion_queue
 
 router = Router()
 
@@ -209,6 +214,10 @@ async def view_profile_document(callback: CallbackQuery, state: FSMContext):
             await callback.answer(get_text("errors.access_denied", lang), show_alert=True)
             return
         
+        if not document.is_ingested:
+            await callback.answer(get_text("documents.processing", document.user.language or "ru"), show_alert=True)
+            return
+        
         doc_types = {
             DocumentType.PASSPORT: "📄 Паспорт",
             DocumentType.DRIVER_LICENSE: "🚗 Водительские права",
@@ -234,15 +243,15 @@ async def view_profile_document(callback: CallbackQuery, state: FSMContext):
         if document.admin_comment:
             doc_info += f"\n💬 Комментарий администратора:\n{document.admin_comment}"
         
-        # Отправляем фото документа
+        # Отправляем фото документа (повторно - по сохраненному file_id)
         try:
-            photo = FSInputFile(document.file_path)
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="◀️ Назад к документам", callback_data="profile_view_documents")]
             ])
             
-            await callback.message.answer_photo(
-                photo=photo,
+            await send_document_photo(
+                callback.message,
+                document,
                 caption=doc_info,
                 reply_markup=keyboard
             )
@@ -369,4 +378,90 @@ async def back_to_profile(callback: CallbackQuery, state: FSMContext):
         'answer': callback.message.edit_text,
         'from_user': callback.from_user
     })()
-    await show_profile(fake_message, state) 
\ No newline at end of file
+    await show_profile(fake_message, state) 
+
+
+@router.callback_query(F.data.startswith("retake_doc_"))
+async def start_document_retake(callback: CallbackQuery, state: FSMContext):
+    """Переснять фото документа (по просьбе после проверки качества)"""
+    doc_id = int(callback.data.split("_")[-1])
+    
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(Document)
+            .options(selectinload(Document.user))
+            .where(Document.id == doc_id)
+        )
+        document = result.scalar_one_or_none()
+    
+    if not document or document.user.telegram_id != callback.from_user.id:
+        await callback.answer(get_text("errors.access_denied", "ru"), show_alert=True)
+        return
+    
+    lang = document.user.language or "ru"
+    
+    # Проверенный администратором документ заменить нельзя
+    if document.status != DocumentStatus.PENDING:
+        await callback.answer(get_text("documents.retake_unavailable", lang), show_alert=True)
+        return
+    
+    await state.set_state(DocumentRetakeStates.waiting_for_photo)
+    await state.update_data(retake_document_id=doc_id, language=lang)
+    
+    await callback.answer()
+    await callback.message.answer(
+        get_text(
+            "documents.retake_upload",
+            lang,
+            doc_name=get_text(f"documents.{document.document_type.value}", lang)
+        )
+    )
+
+
+@router.message(DocumentRetakeStates.waiting_for_photo, F.photo)
+async def process_document_retake(message: Message, state: FSMContext):
+    """Заменить фото документа новым"""
+    data = await state.get_data()
+    lang = data.get("language", "ru")
+    doc_id = data.get("retake_document_id")
+    await state.clear()
+    
+    async with async_session_factory() as session:
+        user_id = select(User.id).where(User.telegram_id == message.from_user.id).scalar_subquery()
+        
+        # Документ снова загрузит фоновая очередь; прежний файл без ссылок
+        # из БД удалит cleanup_service
+        result = await session.execute(
+            update(Document)
+            .where(
+                Document.id == doc_id,
+                Document.user_id == user_id,
+                Document.status == DocumentStatus.PENDING
+            )
+            .values(
+                telegram_file_id=message.photo[-1].file_id,
+                file_path="",
+                review_path=None,
+                thumbnail_path=None,
+                view_file_id=None,
+                original_filename=None,
+                file_size=None,
+                quality_score=None,
+                quality_issues=None,
+                uploaded_at=datetime.utcnow()
+            )
+        )
+        await session.commit()
+    
+    if not result.rowcount:
+        # Пока пользователь переснимал, документ проверил администратор
+        await message.answer(get_text("documents.retake_unavailable", lang))
+        return
+    
+    # Если Redis недоступен, документ подхватит сверка очереди с БД
+    try:
+        await get_document_ingestion_queue().enqueue([doc_id])
+    except REDIS_UNAVAILABLE_ERRORS as e:
+        print(f"⚠️ Failed to enqueue document {doc_id}: {e}")
+    
+    await message.answer(get_text("documents.retake_received", lang))
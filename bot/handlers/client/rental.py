@@ -10,6 +10,7 @@ from database.models.bike import Bike, BikeStatus
 from bot.keyboards.client import get_rental_type_keyboard, get_bikes_keyboard, get_duration_keyboard, get_rental_confirmation_keyboard
 from bot.states.rental import RentalStates
 from services.settings_service import SettingsService
+from bot.utils.screen_cache import screen_cache
 from bot.utils.translations import get_text, get_user_language
 
 router = Router()
@@ -87,6 +88,17 @@ async def show_rental_contacts(message: Message, state: FSMContext):
             )
             return
     
+    # Экран контактов одинаков для всех пользователей одного языка -
+    # берем его из кэша, БД с настройками трогаем только при промахе
+    contact_text, keyboard = await screen_cache.get_or_render(
+        "rental_contacts", lang, lambda: render_rental_contacts(lang)
+    )
+    
+    await message.answer(contact_text, reply_markup=keyboard)
+
+
+async def render_rental_contacts(lang: str):
+    """Отрендерить экран контактов для очной аренды"""
     # Получаем настройки из базы данных
     settings = await SettingsService.get_settings()
     
@@ -113,7 +125,7 @@ async def show_rental_contacts(message: Message, state: FSMContext):
         # [InlineKeyboardButton(text="📋 Мои аренды", callback_data="my_rentals")]  # Закомментировано - не нужно при очной аренде
     ])
     
-    await message.answer(contact_text, reply_markup=keyboard)
+    return contact_text, keyboard
 
 
 # ЗАКОММЕНТИРОВАНО - НЕ НУЖНО ПРИ ОЧНОЙ МОДЕЛИ АРЕНДЫ
@@ -251,7 +263,8 @@ async def show_rental_contacts(message: Message, state: FSMContext):
 #             await callback.answer("❌ Велосипед недоступен", show_alert=True)
 #             return
 #         
-#         await state.update_data(bike_id=bike_id, bike=bike)
+#         # В состоянии храним только id: ORM-объекты не сериализуются в Redis
+#         await state.update_data(bike_id=bike_id)
 #         
 #         # Показываем варианты продолжительности
 #         data = await state.get_data()
@@ -286,7 +299,11 @@ async def show_rental_contacts(message: Message, state: FSMContext):
 # async def show_rental_confirmation(message: Message, state: FSMContext):
 #     """Показать подтверждение аренды"""
 #     data = await state.get_data()
-#     bike = data.get("bike")
+#     async with async_session_factory() as session:
+#         result = await session.execute(
+#             select(Bike).options(selectinload(Bike.batteries)).where(Bike.id == data.get("bike_id"))
+#         )
+#         bike = result.scalar_one_or_none()
 #     rental_type = data.get("rental_type")
 #     duration = data.get("duration")
 #     
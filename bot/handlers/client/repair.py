@@ -6,6 +6,7 @@ from sqlalchemy import select
 from database.base import async_session_factory
 from database.models.user import User, UserStatus
 from database.models.rental import Rental, RentalStatus
+from bot.utils.screen_cache import screen_cache
 
 router = Router()
 
@@ -107,6 +108,14 @@ async def repair_history(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "repair_faq")
 async def repair_faq(callback: CallbackQuery, state: FSMContext):
     """Частые вопросы по ремонту"""
+    # FAQ не зависит от пользователя - отдаем из кэша отрендеренных экранов
+    faq_text, keyboard = await screen_cache.get_or_render("repair_faq", "ru", render_repair_faq)
+    
+    await callback.message.edit_text(faq_text, reply_markup=keyboard)
+
+
+async def render_repair_faq():
+    """Отрендерить экран частых вопросов по ремонту"""
     faq_text = (
         "❓ **Частые вопросы - Ремонт**\n\n"
         "**Q: Кто оплачивает ремонт?**\n"
@@ -121,13 +130,12 @@ async def repair_faq(callback: CallbackQuery, state: FSMContext):
         "A: Да, вы можете арендовать другой велосипед, пока идет ремонт."
     )
     
-    await callback.message.edit_text(
-        faq_text,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🔧 Подать заявку", callback_data="repair_create")],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="repair_back")]
-        ])
-    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔧 Подать заявку", callback_data="repair_create")],
+        [InlineKeyboardButton(text="◀️ Назад", callback_data="repair_back")]
+    ])
+    
+    return faq_text, keyboard
 
 
 @router.callback_query(F.data == "repair_back")
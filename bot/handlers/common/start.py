@@ -16,6 +16,9 @@ from config.settings import settings
 from bot.utils.i18n import change_user_language, get_language_name
 from bot.utils.translations import get_text, get_user_language
 from bot.utils.redis_storage import get_registration_storage
+from bot.utils.tiered_storage import REDIS_UNAVAILABLE_ERRORS
+from bot.utils.user_cache import identity_cache
+from services.document_ingestion import get_document_ingestion_queue
 from services.registration_service import RegistrationService
 
 router = Router()
@@ -50,6 +53,7 @@ async def cmd_start(message: Message, state: FSMContext):
                 user.role = UserRole.ADMIN
                 user.status = UserStatus.VERIFIED
                 await session.commit()
+                identity_cache.invalidate(telegram_id)
                 print(f"✅ Автоматически назначен администратором: {user.full_name} (ID: {telegram_id})")
             
             keyboard = get_main_menu_keyboard(is_staff=user.is_staff, role=user.role.value, language=lang)
@@ -63,19 +67,22 @@ async def cmd_start(message: Message, state: FSMContext):
             await message.answer(welcome_text, reply_markup=keyboard)
         else:
             # Проверяем, есть ли незавершенная регистрация в Redis
+            # (со скользящим TTL чтение заодно продлевает срок хранения данных)
             storage = get_registration_storage()
-            registration_data = await storage.get_all_registration_data(telegram_id)
+            try:
+                registration_data = await storage.get_all_registration_data(telegram_id)
+            except REDIS_UNAVAILABLE_ERRORS as e:
+                # Redis недоступен - начинаем регистрацию заново, FSM работает из памяти
+                print(f"⚠️ Registration data unavailable for {telegram_id}: {e}")
+                registration_data = None
             
             if registration_data:
                 # Есть незавершенная регистрация
                 lang = registration_data.get('language', 'ru')
-                missing = await storage.get_missing_data(telegram_id, lang)
+                missing = storage.find_missing(registration_data)
                 
                 print(f"📋 Incomplete registration found for {telegram_id}: {missing}")
                 
-                # Продлеваем TTL
-                await storage.extend_ttl(telegram_id)
-                
                 await message.answer(
                     get_text("registration.continue_registration", lang),
                     reply_markup=get_document_choice_keyboard(lang)
@@ -249,6 +256,7 @@ async def process_phone_number(message: Message, state: FSMContext, phone: str):
                 existing_user.role = UserRole.ADMIN
                 existing_user.status = UserStatus.VERIFIED
                 await session.commit()
+                identity_cache.invalidate(telegram_id)
                 
                 await message.answer(
                     get_text("start.welcome_back", language, name=full_name),
@@ -433,31 +441,25 @@ async def save_document_photo(message: Message, state: FSMContext, doc_type: Doc
         storage = get_registration_storage()
         doc_type_str = doc_type.value  # "passport", "driver_license" или "selfie"
         
-        await storage.set_document(telegram_id, doc_type_str, file_id)
+        # Запись документа сразу возвращает все данные регистрации,
+        # по ним и проверяем, загружены ли все обязательные документы
+        registration_data = await storage.set_document(telegram_id, doc_type_str, file_id)
         print(f"✅ Document file_id saved to Redis: {telegram_id} -> {doc_type_str} (file_id: {file_id[:20]}...)")
         
         await message.answer(response_text)
         
-        # Проверяем, загружены ли все обязательные документы
-        is_complete = await storage.is_registration_complete(telegram_id)
+        is_complete = storage.check_complete(registration_data)
         
         if is_complete:
             print(f"🎉 All documents collected! Starting atomic registration for {telegram_id}")
             
-            # Получаем все данные из Redis
-            registration_data = await storage.get_all_registration_data(telegram_id)
-            
-            if not registration_data:
-                await message.answer(get_text("documents.save_error", lang))
-                return
-            
             # Атомарно создаем пользователя + все документы в PostgreSQL
             try:
                 async with async_session_factory() as session:
                     async with session.begin():  # Открываем транзакцию
                         registration_service = RegistrationService(message.bot)
                         
-                        user = await registration_service.register_user_with_documents(
+                        user, documents = await registration_service.register_user_with_documents(
                             session=session,
                             telegram_id=telegram_id,
                             user_data=registration_data['user_data'],
@@ -468,6 +470,16 @@ async def save_document_photo(message: Message, state: FSMContext, doc_type: Doc
                         # Если всё прошло успешно, commit произойдет автоматически при выходе из async with
                         print(f"✅ Atomic registration completed for user {user.id}")
                 
+                # Файлы скачает фоновая очередь - пользователь не ждет загрузок.
+                # Если Redis недоступен, документы подхватит сверка очереди с БД
+                try:
+                    await get_document_ingestion_queue().enqueue(doc.id for doc in documents)
+                except REDIS_UNAVAILABLE_ERRORS as e:
+                    print(f"⚠️ Failed to enqueue documents for {telegram_id}: {e}")
+                
+                # Пользователь появился в БД - сбрасываем закэшированную идентичность
+                identity_cache.invalidate(telegram_id)
+                
                 # Очищаем Redis после успешной регистрации
                 await storage.clear_registration_data(telegram_id)
                 print(f"🧹 Redis data cleared for {telegram_id}")
@@ -496,7 +508,7 @@ async def save_document_photo(message: Message, state: FSMContext, doc_type: Doc
                 # Данные остаются в Redis, пользователь может повторить попытку
         else:
             # Не все документы загружены - продолжаем
-            missing = await storage.get_missing_data(telegram_id, lang)
+            missing = storage.find_missing(registration_data)
             print(f"ℹ️ Missing documents for {telegram_id}: {missing}")
         
     except Exception as e:
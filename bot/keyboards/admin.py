@@ -102,14 +102,38 @@ def get_bike_status_keyboard(bike_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_document_verification_keyboard(document_id: int, user_id: int) -> InlineKeyboardMarkup:
-    """Клавиатура для проверки документов"""
+def get_document_verification_keyboard(document_id: int, user_id: int, token: str) -> InlineKeyboardMarkup:
+    """Клавиатура для проверки документов (token - версия показанного фото)"""
     keyboard = [
         [
-            InlineKeyboardButton(text="✅ Одобрить", callback_data=f"doc_approve_{document_id}"),
-            InlineKeyboardButton(text="❌ Отклонить", callback_data=f"doc_reject_{document_id}")
+            InlineKeyboardButton(text="✅ Одобрить", callback_data=f"doc_approve_{document_id}_{token}"),
+            InlineKeyboardButton(text="❌ Отклонить", callback_data=f"doc_reject_{document_id}_{token}")
         ],
-        [InlineKeyboardButton(text="🔄 Требует доработки", callback_data=f"doc_revision_{document_id}")],
+        [InlineKeyboardButton(text="🔄 Требует доработки", callback_data=f"doc_revision_{document_id}_{token}")],
         [InlineKeyboardButton(text="◀️ Назад", callback_data=f"admin_user_docs_{user_id}")]
     ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard) 
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=keyboard) 
+
+def get_user_review_keyboard(user_id: int, token: str) -> InlineKeyboardMarkup:
+    """Клавиатура для проверки всех документов пользователя сразу (token - версия показанных фото)"""
+    keyboard = [
+        [
+            InlineKeyboardButton(text="✅ Одобрить все", callback_data=f"admin_approve_all_{user_id}_{token}"),
+            InlineKeyboardButton(text="❌ Отклонить все", callback_data=f"admin_reject_all_{user_id}_{token}")
+        ],
+        [InlineKeyboardButton(text="◀️ Назад", callback_data=f"admin_user_docs_{user_id}")]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_review_queue_keyboard(user_id: int, token: str) -> InlineKeyboardMarkup:
+    """Клавиатура проверки пользователя из очереди (token - версия показанных фото)"""
+    keyboard = [
+        [
+            InlineKeyboardButton(text="✅ Одобрить все", callback_data=f"admin_queue_approve_{user_id}_{token}"),
+            InlineKeyboardButton(text="❌ Отклонить все", callback_data=f"admin_queue_reject_{user_id}_{token}")
+        ],
+        [InlineKeyboardButton(text="⏭ Пропустить", callback_data="admin_review_skip")],
+        [InlineKeyboardButton(text="⏹ Закончить проверку", callback_data="admin_review_stop")]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -86,4 +86,12 @@ def get_document_choice_keyboard(language: str = "ru") -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text=get_text("documents.passport", language), callback_data="doc_choice_passport")],
         [InlineKeyboardButton(text=get_text("documents.driver_license", language), callback_data="doc_choice_license")]
     ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard) 
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=keyboard) 
+
+
+def get_document_retake_keyboard(document_id: int, language: str = "ru") -> InlineKeyboardMarkup:
+    """Клавиатура с предложением переснять фото документа"""
+    keyboard = [
+        [InlineKeyboardButton(text=get_text("documents.retake_button", language), callback_data=f"retake_doc_{document_id}")]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
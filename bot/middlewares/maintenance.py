@@ -0,0 +1,61 @@
+"""
+Middleware режима технических работ.
+
+Проверяет флаг maintenance_mode в закэшированных настройках (без запроса
+к БД) и отвечает всем, кроме сотрудников, сообщением о техработах.
+Роль пользователя берется из identity_cache: к БД обращаемся только при
+промахе кэша и только пока техработы включены.
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+
+from config.settings import settings
+from services.settings_service import SettingsService
+from bot.utils.translations import LANGUAGES, get_text
+from bot.utils.user_cache import identity_cache
+
+
+class MaintenanceMiddleware(BaseMiddleware):
+    """Outer middleware: блокирует обновления не-сотрудников во время техработ"""
+    
+    async def _is_staff(self, user: User) -> bool:
+        """Может ли пользователь работать с ботом во время техработ"""
+        if user.id in settings.admin_ids:
+            return True
+        # PermissionMiddleware во время техработ не вызывается и кэш не
+        # заполняет, поэтому при промахе роль читается из БД здесь
+        try:
+            identity = await identity_cache.get(user.id)
+        except Exception as e:
+            # Во время техработ БД может быть недоступна
+            print(f"⚠️ Failed to load identity of {user.id} during maintenance: {e}")
+            return False
+        return identity.is_staff
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        snapshot = SettingsService.get_cached()
+        if snapshot is None or not snapshot.maintenance_mode:
+            return await handler(event, data)
+        
+        user: User = data.get("event_from_user")
+        if user is None or await self._is_staff(user):
+            return await handler(event, data)
+        
+        # Язык берем из Telegram, чтобы не обращаться к БД
+        lang = user.language_code if user.language_code in LANGUAGES else "ru"
+        text = snapshot.maintenance_message or get_text("common.maintenance", lang)
+        
+        if isinstance(event, Message):
+            await event.answer(text)
+        elif isinstance(event, CallbackQuery):
+            # Текст alert ограничен Telegram 200 символами
+            await event.answer(text[:200], show_alert=True)
+        
+        return None
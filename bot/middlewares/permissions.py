@@ -0,0 +1,95 @@
+"""
+Декларативная проверка прав доступа на уровне роутеров.
+
+Роутер объявляет требуемое право один раз:
+
+    router = Router()
+    require_permission(router, Permission.VERIFY_DOCUMENTS)
+
+а отдельный обработчик может ужесточить его флагом:
+
+    @router.message(..., flags={"permission": Permission.ADMIN})
+
+Проверка выполняется inner-middleware (то есть только для обновлений,
+прошедших фильтры обработчика) по закэшированной идентичности
+пользователя - до обработчика и без лишних запросов к БД.
+"""
+import enum
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+
+from bot.utils.translations import get_text
+from bot.utils.user_cache import UserIdentity, identity_cache
+
+
+class Permission(enum.Enum):
+    STAFF = "staff"                        # Менеджер или администратор
+    ADMIN = "admin"                        # Только администратор
+    VERIFY_DOCUMENTS = "verify_documents"  # Проверка документов
+    MANAGE_BIKES = "manage_bikes"          # Управление велосипедами
+    MANAGE_SETTINGS = "manage_settings"    # Изменение настроек системы
+
+
+# Проверки прав по идентичности пользователя
+_PERMISSION_CHECKS: Dict[Permission, Callable[[UserIdentity], bool]] = {
+    Permission.STAFF: lambda identity: identity.is_staff,
+    Permission.ADMIN: lambda identity: identity.is_admin,
+    Permission.VERIFY_DOCUMENTS: lambda identity: identity.can_verify_documents,
+    Permission.MANAGE_BIKES: lambda identity: identity.can_manage_bikes,
+    Permission.MANAGE_SETTINGS: lambda identity: identity.is_staff,
+}
+
+# Ключи переводов для сообщений об отказе
+_DENIED_MESSAGES: Dict[Permission, str] = {
+    Permission.STAFF: "errors.no_manager_rights",
+    Permission.ADMIN: "errors.no_admin_rights",
+    Permission.VERIFY_DOCUMENTS: "errors.no_document_verification_rights",
+    Permission.MANAGE_BIKES: "errors.no_bike_management_rights",
+    Permission.MANAGE_SETTINGS: "errors.no_settings_rights",
+}
+
+
+class PermissionMiddleware(BaseMiddleware):
+    """Inner middleware: пропускает к обработчику только пользователей с нужным правом"""
+    
+    def __init__(self, permission: Permission):
+        self.permission = permission
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        permission = get_flag(data, "permission", default=self.permission)
+        
+        user: User = data.get("event_from_user")
+        if user is None:
+            return None
+        
+        identity = await identity_cache.get(user.id)
+        
+        if _PERMISSION_CHECKS[permission](identity):
+            # Обработчики могут получить идентичность аргументом identity
+            data["identity"] = identity
+            return await handler(event, data)
+        
+        print(f"⛔ Access denied: {user.id} lacks {permission.value}")
+        text = get_text(_DENIED_MESSAGES[permission], identity.language)
+        
+        if isinstance(event, Message):
+            await event.answer(text)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        
+        return None
+
+
+def require_permission(router: Router, permission: Permission) -> None:
+    """Потребовать право для всех сообщений и callback-запросов роутера"""
+    middleware = PermissionMiddleware(permission)
+    router.message.middleware(middleware)
+    router.callback_query.middleware(middleware)
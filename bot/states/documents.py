@@ -0,0 +1,5 @@
+from aiogram.fsm.state import State, StatesGroup
+
+
+class DocumentRetakeStates(StatesGroup):
+    waiting_for_photo = State()
@@ -0,0 +1,197 @@
+"""
+Отправка фото документов с повторным использованием file_id.
+
+При первой отправке файл загружается в Telegram из хранилища
+(services/document_storage.py), а file_id, который Telegram возвращает
+в ответе, сохраняется в Document.view_file_id.
+Дальше документ отправляется по file_id - это короткий запрос без
+загрузки файла. Если Telegram не принимает сохраненный file_id (например,
+сменился токен бота), файл загружается заново и file_id обновляется.
+
+Несколько документов (например, все документы пользователя на проверке)
+отправляются одним альбомом - один запрос sendMediaGroup вместо запроса
+на каждый документ.
+
+Фото можно загрузить заранее (warm_up_file_ids): файлы отправляются
+в служебный чат, file_id сохраняются, а сообщения сразу удаляются.
+"""
+from typing import Dict, List, Optional, Sequence, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, InputFile, InputMediaPhoto, Message
+from sqlalchemy import update
+
+from database.base import async_session_factory
+from database.models.document import Document
+from services.document_storage import get_blob_storage
+
+
+async def remember_file_ids(documents: Sequence[Document], messages: Sequence[Message]) -> None:
+    """
+    Сохранить file_id, полученные после отправки фото документов
+    
+    file_id сохраняется, только если файлы документа в БД те же, что были
+    отправлены: пока фото загружалось в Telegram, пользователь мог его
+    переснять, и file_id старого фото показывал бы замененный документ.
+    
+    Args:
+        documents: Документы
+        messages: Отправленные сообщения с фото (в том же порядке)
+    """
+    sent: Dict[int, Document] = {}
+    for document, message in zip(documents, messages):
+        if not message.photo:
+            continue
+        
+        file_id = message.photo[-1].file_id
+        if file_id != document.view_file_id:
+            document.view_file_id = file_id
+            sent[document.id] = document
+    
+    if not sent:
+        return
+    
+    async with async_session_factory() as session:
+        for document in sent.values():
+            if document.review_path is None:
+                same_review = Document.review_path.is_(None)
+            else:
+                same_review = Document.review_path == document.review_path
+            await session.execute(
+                update(Document)
+                .where(
+                    Document.id == document.id,
+                    Document.file_path == document.file_path,
+                    same_review
+                )
+                .values(view_file_id=document.view_file_id)
+            )
+        await session.commit()
+
+
+async def remember_file_id(document: Document, message: Message) -> None:
+    """
+    Сохранить file_id, полученный после загрузки фото документа
+    
+    Args:
+        document: Документ
+        message: Отправленное сообщение с фото
+    """
+    await remember_file_ids([document], [message])
+
+
+async def document_photo(document: Document) -> Union[InputFile, str]:
+    """Получить фото документа для отправки: сохраненный file_id или файл из хранилища"""
+    if document.view_file_id:
+        return document.view_file_id
+    return await get_blob_storage().input_file(document.view_path)
+
+
+async def send_document_photo(
+    message: Message,
+    document: Document,
+    caption: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+) -> Message:
+    """
+    Отправить фото документа в чат message
+    
+    Args:
+        message: Сообщение, в чат которого отправляется фото
+        document: Документ
+        caption: Подпись
+        reply_markup: Клавиатура
+    
+    Returns:
+        Message: Отправленное сообщение
+    """
+    if document.view_file_id:
+        try:
+            return await message.answer_photo(
+                photo=document.view_file_id,
+                caption=caption,
+                reply_markup=reply_markup
+            )
+        except TelegramBadRequest as e:
+            print(f"⚠️ Cached file_id of document {document.id} rejected ({e}), uploading again")
+            document.view_file_id = None
+    
+    sent = await message.answer_photo(
+        photo=await document_photo(document),
+        caption=caption,
+        reply_markup=reply_markup
+    )
+    await remember_file_id(document, sent)
+    return sent
+
+
+async def send_document_album(
+    message: Message,
+    documents: Sequence[Document],
+    caption: str
+) -> List[Message]:
+    """
+    Отправить фото документов одним альбомом в чат message
+    
+    Args:
+        message: Сообщение, в чат которого отправляется альбом
+        documents: Документы (от 2 до 10; один документ отправляется обычным фото)
+        caption: Подпись (показывается под альбомом)
+    
+    Returns:
+        List[Message]: Отправленные сообщения
+    """
+    if len(documents) == 1:
+        return [await send_document_photo(message, documents[0], caption)]
+    
+    async def build_media() -> List[InputMediaPhoto]:
+        return [
+            InputMediaPhoto(media=await document_photo(document), caption=caption if i == 0 else None)
+            for i, document in enumerate(documents)
+        ]
+    
+    try:
+        sent = await message.answer_media_group(media=await build_media())
+    except TelegramBadRequest as e:
+        if not any(document.view_file_id for document in documents):
+            raise
+        # Какой из file_id не подошел, Telegram не сообщает - загружаем все заново
+        print(f"⚠️ Cached file_ids of documents {[d.id for d in documents]} rejected ({e}), uploading again")
+        for document in documents:
+            document.view_file_id = None
+        sent = await message.answer_media_group(media=await build_media())
+    
+    await remember_file_ids(documents, sent)
+    return sent
+
+
+async def warm_up_file_ids(bot: Bot, chat_id: int, documents: Sequence[Document]) -> None:
+    """
+    Загрузить в Telegram фото документов без сохраненного file_id
+    
+    Args:
+        bot: Бот
+        chat_id: Служебный чат (бот должен иметь право удалять в нем сообщения)
+        documents: Документы
+    """
+    documents = [document for document in documents if not document.view_file_id]
+    
+    # В альбоме не больше 10 фото
+    for start in range(0, len(documents), 10):
+        batch = documents[start:start + 10]
+        if len(batch) == 1:
+            sent = [await bot.send_photo(chat_id, await document_photo(batch[0]), disable_notification=True)]
+        else:
+            sent = await bot.send_media_group(
+                chat_id,
+                [InputMediaPhoto(media=await document_photo(document)) for document in batch],
+                disable_notification=True
+            )
+        
+        await remember_file_ids(batch, sent)
+        
+        try:
+            await bot.delete_messages(chat_id, [message.message_id for message in sent])
+        except TelegramBadRequest as e:
+            print(f"⚠️ Could not delete warm-up messages in chat {chat_id}: {e}")
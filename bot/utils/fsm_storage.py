@@ -0,0 +1,382 @@
+"""
+Redis-хранилище FSM с ограниченным временем жизни ключей.
+
+Стандартный RedisStorage без state_ttl/data_ttl хранит состояние и данные
+каждого пользователя, бросившего сценарий на полпути, бесконечно.
+Здесь TTL выбирается по группе состояний (регистрация, аренда, настройки,
+ремонт): ключ data всегда живет столько же, сколько состояние его группы.
+
+В Redis Cluster ключи строятся HashTagKeyBuilder: состояние и данные
+пользователя попадают в один слот, поэтому pipeline и Lua-скрипт работают.
+
+CachedRedisStorage дополнительно кэширует чтения состояния и данных в памяти
+процесса с инвалидацией через client-side caching Redis.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple, cast
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, StateType, StorageKey
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, KeyBuilder, RedisStorage
+from redis.asyncio import Redis
+
+from bot.utils import serialization
+from bot.utils.redis_client import use_hash_tags
+from config.settings import settings
+
+
+# Группы состояний FSM: имя StatesGroup -> имя группы в настройках
+FSM_GROUPS: Dict[str, str] = {
+    "RegistrationStates": "registration",
+    "RentalStates": "rental",
+    "SettingsStates": "settings",
+    "RepairStates": "repair",
+}
+
+# Группа для состояний вне FSM_GROUPS и для данных без состояния
+DEFAULT_GROUP = "default"
+
+# SET data с TTL группы текущего состояния - одним вызовом.
+# KEYS[1] - ключ state, KEYS[2] - ключ data
+# ARGV[1] - JSON данных, ARGV[2] - TTL по умолчанию,
+# далее пары (имя StatesGroup, TTL данных)
+SET_DATA_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+local state = redis.call('GET', KEYS[1])
+if state then
+    local group = string.match(state, '^([^:]+):')
+    for i = 3, #ARGV, 2 do
+        if ARGV[i] == group then
+            ttl = tonumber(ARGV[i + 1])
+            break
+        end
+    end
+end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ttl)
+return ttl
+"""
+
+# Канал, в который Redis присылает инвалидации client-side caching (RESP2)
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+# Локальный кэш FSM: максимальное время жизни записи (секунды) и размер
+FSM_CACHE_TTL = settings.fsm_cache_ttl
+FSM_CACHE_SIZE = 10000
+
+# Проверка соединения отслеживания при отсутствии инвалидаций (секунды)
+TRACKING_PING_INTERVAL = 10
+
+# Пауза перед повторным включением отслеживания при ошибке Redis (секунды)
+TRACKING_RETRY_DELAY = 5
+
+
+def get_group_ttls() -> Dict[str, Tuple[int, int]]:
+    """
+    TTL состояний и данных FSM по группам из настроек
+    
+    Returns:
+        Словарь {группа: (state_ttl, data_ttl)}
+    """
+    return {
+        "registration": (settings.fsm_registration_state_ttl, settings.fsm_registration_data_ttl),
+        "rental": (settings.fsm_rental_state_ttl, settings.fsm_rental_data_ttl),
+        "settings": (settings.fsm_settings_state_ttl, settings.fsm_settings_data_ttl),
+        "repair": (settings.fsm_repair_state_ttl, settings.fsm_repair_data_ttl),
+        DEFAULT_GROUP: (settings.fsm_state_ttl, settings.fsm_data_ttl),
+    }
+
+
+def get_state_group(state: Optional[str]) -> str:
+    """Определить группу по строке состояния вида 'RentalStates:choosing_bike'"""
+    if not state:
+        return DEFAULT_GROUP
+    return FSM_GROUPS.get(state.split(":", 1)[0], DEFAULT_GROUP)
+
+
+class HashTagKeyBuilder(DefaultKeyBuilder):
+    """
+    Построитель ключей для Redis Cluster: идентификатор пользователя
+    берется в hash tag, например fsm:{-100123:456}:state
+    """
+    
+    def build(self, key: StorageKey, part: str) -> str:
+        ident = [str(key.chat_id)]
+        if key.thread_id:
+            ident.append(str(key.thread_id))
+        ident.append(str(key.user_id))
+        
+        parts = [self.prefix]
+        if self.with_bot_id:
+            parts.append(str(key.bot_id))
+        parts.append("{" + self.separator.join(ident) + "}")
+        if self.with_destiny:
+            parts.append(key.destiny)
+        elif key.destiny != DEFAULT_DESTINY:
+            raise ValueError("HashTagKeyBuilder is not configured to use key destiny other than the default")
+        parts.append(part)
+        return self.separator.join(parts)
+
+
+class GroupTTLRedisStorage(RedisStorage):
+    """RedisStorage с TTL состояния и данных, зависящим от группы состояний"""
+    
+    def __init__(
+        self,
+        redis: Redis,
+        key_builder: Optional[KeyBuilder] = None,
+        group_ttls: Optional[Dict[str, Tuple[int, int]]] = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            redis: Клиент Redis
+            key_builder: Построитель ключей (по умолчанию DefaultKeyBuilder)
+            group_ttls: {группа: (state_ttl, data_ttl)}, по умолчанию из настроек
+        """
+        if key_builder is None:
+            key_builder = HashTagKeyBuilder() if use_hash_tags() else DefaultKeyBuilder()
+        
+        # Данные FSM сериализуются orjson с проверкой на примитивы
+        kwargs.setdefault("json_dumps", serialization.dumps)
+        kwargs.setdefault("json_loads", serialization.loads)
+        
+        self.group_ttls = group_ttls or get_group_ttls()
+        default_state_ttl, default_data_ttl = self.group_ttls[DEFAULT_GROUP]
+        super().__init__(
+            redis,
+            key_builder=key_builder,
+            state_ttl=default_state_ttl,
+            data_ttl=default_data_ttl,
+            **kwargs
+        )
+        self._set_data_script = redis.register_script(SET_DATA_SCRIPT)
+        
+        # Аргументы скрипта: пары (имя StatesGroup, TTL данных группы)
+        self._data_ttl_args = []
+        for group_name, group in FSM_GROUPS.items():
+            self._data_ttl_args.extend([group_name, self.group_ttls[group][1]])
+    
+    def get_ttls(self, state: Optional[str]) -> Tuple[int, int]:
+        """(state_ttl, data_ttl) для строки состояния"""
+        return self.group_ttls[get_state_group(state)]
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        """Записать состояние и выровнять TTL данных по его группе (один round-trip)"""
+        state_key = self.key_builder.build(key, "state")
+        data_key = self.key_builder.build(key, "data")
+        value = state.state if isinstance(state, State) else state
+        state_ttl, data_ttl = self.get_ttls(value)
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if value is None:
+                pipe.delete(state_key)
+            else:
+                pipe.set(state_key, value, ex=state_ttl)
+            # EXPIRE на несуществующий ключ ничего не делает
+            pipe.expire(data_key, data_ttl)
+            await pipe.execute()
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        """Записать данные с TTL группы текущего состояния (один вызов Lua)"""
+        data_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(data_key)
+            return
+        
+        await self._set_data_script(
+            keys=[self.key_builder.build(key, "state"), data_key],
+            args=[self.json_dumps(data), self.data_ttl, *self._data_ttl_args]
+        )
+
+
+class CachedRedisStorage(GroupTTLRedisStorage):
+    """
+    GroupTTLRedisStorage с кэшем состояний и данных FSM в памяти процесса.
+    
+    Используется client-side caching Redis в режиме BCAST: Redis присылает
+    инвалидацию при любом изменении ключа с префиксом FSM (с любой реплики),
+    и запись сразу удаляется из локального кэша. Пока отслеживание не
+    установлено (или соединение потеряно), кэш не используется.
+    Записи дополнительно живут не дольше cache_ttl секунд.
+    """
+    
+    def __init__(
+        self,
+        redis: Redis,
+        key_builder: Optional[KeyBuilder] = None,
+        cache_ttl: int = FSM_CACHE_TTL,
+        max_size: int = FSM_CACHE_SIZE,
+        **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            redis: Клиент Redis
+            key_builder: Построитель ключей (по умолчанию DefaultKeyBuilder)
+            cache_ttl: Максимальное время жизни записи в локальном кэше (секунды)
+            max_size: Максимальное количество записей в локальном кэше
+        """
+        super().__init__(redis, key_builder=key_builder, **kwargs)
+        self.cache_ttl = cache_ttl
+        self.max_size = max_size
+        self.key_prefix = (
+            getattr(self.key_builder, "prefix", "fsm")
+            + getattr(self.key_builder, "separator", ":")
+        )
+        
+        # redis_key -> (expires_at, значение или None)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        
+        # Чтения, которые сейчас выполняются, и ключи, изменившиеся во время
+        # такого чтения (результат этого чтения в кэш не кладется)
+        self._inflight: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        
+        # Кэш работает только при активном отслеживании; номер сессии
+        # отслеживания меняется при каждом его включении/выключении
+        self._tracking = False
+        self._session = 0
+    
+    def _invalidate(self, redis_key: str) -> None:
+        """Сбросить ключ из кэша (и результат читающих его сейчас запросов)"""
+        self._entries.pop(redis_key, None)
+        if redis_key in self._inflight:
+            self._dirty.add(redis_key)
+    
+    def _set_tracking(self, enabled: bool) -> None:
+        """Включить/выключить кэш вместе с отслеживанием, сбросив все записи"""
+        self._tracking = enabled
+        self._session += 1
+        self._entries.clear()
+        self._dirty.update(self._inflight)
+    
+    async def _cached_get(self, redis_key: str) -> Optional[str]:
+        """GET с кэшированием результата (включая отсутствие ключа)"""
+        entry = self._entries.get(redis_key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(redis_key)
+                return value
+            del self._entries[redis_key]
+        
+        session = self._session
+        self._inflight[redis_key] = self._inflight.get(redis_key, 0) + 1
+        try:
+            value = await self.redis.get(redis_key)
+        finally:
+            remaining = self._inflight[redis_key] - 1
+            if remaining:
+                self._inflight[redis_key] = remaining
+                dirty = redis_key in self._dirty
+            else:
+                del self._inflight[redis_key]
+                dirty = redis_key in self._dirty
+                self._dirty.discard(redis_key)
+        
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        
+        if self._tracking and session == self._session and not dirty:
+            self._entries[redis_key] = (time.monotonic() + self.cache_ttl, value)
+            self._entries.move_to_end(redis_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        
+        return value
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._cached_get(self.key_builder.build(key, "state"))
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        # В кэше хранится JSON, поэтому обработчики получают свою копию данных
+        value = await self._cached_get(self.key_builder.build(key, "data"))
+        if value is None:
+            return {}
+        return cast(Dict[str, Any], self.json_loads(value))
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        try:
+            await super().set_state(key, state)
+        finally:
+            self._invalidate(self.key_builder.build(key, "state"))
+            self._invalidate(self.key_builder.build(key, "data"))
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        try:
+            await super().set_data(key, data)
+        finally:
+            self._invalidate(self.key_builder.build(key, "data"))
+    
+    def _handle_invalidation(self, message) -> None:
+        """Обработать сообщение из канала __redis__:invalidate"""
+        if not isinstance(message, list) or len(message) < 3 or message[0] not in (b"message", "message"):
+            return
+        
+        keys = message[2]
+        if keys is None:
+            # FLUSHDB/FLUSHALL - сбрасываем весь кэш
+            self._entries.clear()
+            self._dirty.update(self._inflight)
+            return
+        
+        for redis_key in keys:
+            self._invalidate(redis_key.decode("utf-8") if isinstance(redis_key, bytes) else redis_key)
+    
+    async def run_invalidation_listener(self) -> None:
+        """
+        Поддерживать отслеживание ключей FSM и получать инвалидации.
+        
+        Одно соединение подписано на __redis__:invalidate, второе включает
+        CLIENT TRACKING с перенаправлением в первое (RESP2). Второе соединение
+        периодически пингуется: если оно пропало, отслеживание прекратилось,
+        и кэш отключается до переподключения.
+        """
+        print(f"🔄 FSM cache invalidation listener started (prefix: {self.key_prefix})")
+        
+        while True:
+            listener = self.redis.connection_pool.make_connection()
+            tracker = self.redis.connection_pool.make_connection()
+            try:
+                await listener.connect()
+                await tracker.connect()
+                
+                await listener.send_command("CLIENT", "ID")
+                client_id = await listener.read_response()
+                await listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+                await listener.read_response()
+                
+                await tracker.send_command(
+                    "CLIENT", "TRACKING", "ON", "REDIRECT", client_id,
+                    "BCAST", "PREFIX", self.key_prefix
+                )
+                await tracker.read_response()
+                
+                # Пока отслеживания не было, кэш мог устареть - начинаем с пустого
+                self._set_tracking(True)
+                print("✅ FSM client-side cache enabled")
+                
+                while True:
+                    message = await listener.read_response(timeout=TRACKING_PING_INTERVAL)
+                    if message is None:
+                        await tracker.send_command("PING")
+                        await tracker.read_response()
+                        continue
+                    self._handle_invalidation(message)
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ FSM cache listener error: {e}")
+            finally:
+                if self._tracking:
+                    print("⚠️ FSM client-side cache disabled until tracking is restored")
+                self._set_tracking(False)
+                for connection in (listener, tracker):
+                    try:
+                        await connection.disconnect()
+                    except Exception:
+                        pass
+            
+            await asyncio.sleep(TRACKING_RETRY_DELAY)
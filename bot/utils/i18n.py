@@ -6,6 +6,7 @@ from sqlalchemy import select
 
 from database.base import async_session_factory
 from database.models.user import User
+from bot.utils.user_cache import identity_cache
 
 
 def setup_i18n():
@@ -46,6 +47,7 @@ async def change_user_language(telegram_id: int, new_language: str) -> bool:
                 old_lang = user.language
                 user.language = new_language
                 await session.commit()
+                identity_cache.invalidate(telegram_id)
                 print(f"✅ Язык изменен: {old_lang} → {new_language} для пользователя {telegram_id}")
                 return True
             else:
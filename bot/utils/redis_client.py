@@ -0,0 +1,337 @@
+"""
+Клиенты Redis с настроенным пулом соединений и метриками.
+
+Для FSM и для данных приложения (регистрация, уведомления о настройках)
+создаются отдельные пулы, чтобы всплеск запросов FSM не занимал
+соединения, нужные остальному коду, и наоборот. Пул блокирующий: при
+исчерпании соединений запрос ждет не дольше redis_pool_timeout, а не
+падает сразу. Таймауты сокета и повтор при таймауте не дают зависшему
+Redis остановить все обработчики.
+
+Каждый клиент считает команды, ошибки и задержки (включая pipeline и
+Lua-скрипты); run_redis_metrics_reporter периодически печатает их вместе
+с загрузкой пула.
+
+Режим подключения задается redis_mode:
+    standalone - один Redis по REDIS_URL
+    sentinel   - мастер из REDIS_SENTINEL_MASTER, адреса Sentinel в REDIS_SENTINELS
+                 (REDIS_URL задает только базу и пароль)
+    cluster    - Redis Cluster, REDIS_URL указывает на любой из узлов.
+                 Ключи одного пользователя получают hash tag ({...}), чтобы
+                 оказаться в одном слоте и работать в pipeline и Lua-скриптах.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.connection import parse_url
+from redis.asyncio.retry import Retry
+from redis.asyncio.sentinel import Sentinel
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import NoScriptError, TimeoutError as RedisTimeoutError
+
+from config.settings import settings
+
+
+# Сколько последних задержек хранить для расчета перцентилей
+LATENCY_WINDOW = 5000
+
+# Команды дольше этого порога считаются медленными (секунды)
+SLOW_COMMAND_THRESHOLD = 0.1
+
+# Имена пулов
+FSM_POOL = "fsm"
+APP_POOL = "app"
+
+# Режимы подключения
+STANDALONE_MODE = "standalone"
+SENTINEL_MODE = "sentinel"
+CLUSTER_MODE = "cluster"
+
+# Созданные клиенты по имени пула
+_clients: Dict[str, "InstrumentedRedis"] = {}
+
+
+class RedisMetrics:
+    """Счетчики команд и задержек одного клиента Redis"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.reset()
+    
+    def reset(self) -> None:
+        """Начать новое окно измерений"""
+        self.commands = 0
+        self.errors = 0
+        self.slow = 0
+        self.max_latency = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+    
+    def observe(self, elapsed: float, failed: bool) -> None:
+        """Учесть выполненную команду"""
+        self.commands += 1
+        if failed:
+            self.errors += 1
+        if elapsed > SLOW_COMMAND_THRESHOLD:
+            self.slow += 1
+        self.max_latency = max(self.max_latency, elapsed)
+        self.latencies.append(elapsed)
+    
+    def snapshot(self, pool: Optional[BlockingConnectionPool] = None) -> dict:
+        """Текущие значения метрик (задержки в миллисекундах)"""
+        ordered = sorted(self.latencies)
+        p50 = ordered[len(ordered) // 2] if ordered else 0.0
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        
+        stats = {
+            "commands": self.commands,
+            "errors": self.errors,
+            "slow": self.slow,
+            "p50_ms": round(p50 * 1000, 2),
+            "p95_ms": round(p95 * 1000, 2),
+            "max_ms": round(self.max_latency * 1000, 2),
+        }
+        
+        # У Redis Cluster свой пул на каждый узел - общей загрузки нет
+        if pool is not None and hasattr(pool, "_in_use_connections"):
+            in_use = len(pool._in_use_connections)
+            stats.update({
+                "pool_in_use": in_use,
+                "pool_created": in_use + len(pool._available_connections),
+                "pool_max": pool.max_connections,
+            })
+        
+        return stats
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline, учитывающий время выполнения в метриках клиента"""
+    
+    metrics: RedisMetrics
+    
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await super().execute(raise_on_error=raise_on_error)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - start, failed)
+
+
+class InstrumentedRedis(Redis):
+    """Клиент Redis, учитывающий время выполнения каждой команды"""
+    
+    def __init__(self, *args, name: str = "redis", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = RedisMetrics(name)
+    
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await super().execute_command(*args, **options)
+        except NoScriptError:
+            # Первый EVALSHA после перезапуска Redis - скрипт будет загружен и вызван повторно
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - start, failed)
+    
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        pipe = InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipe.metrics = self.metrics
+        return pipe
+
+
+class InstrumentedRedisCluster(RedisCluster):
+    """Клиент Redis Cluster, учитывающий время выполнения каждой команды"""
+    
+    def __init__(self, *args, name: str = "redis", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = RedisMetrics(name)
+    
+    async def execute_command(self, *args, **kwargs):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await super().execute_command(*args, **kwargs)
+        except NoScriptError:
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - start, failed)
+    
+    async def aclose(self, close_connection_pool: Optional[bool] = None) -> None:
+        # Совместимость с Redis.aclose (RedisStorage.close передает close_connection_pool)
+        await super().aclose()
+
+
+def use_hash_tags() -> bool:
+    """Нужно ли помещать ключи одного пользователя в один слот (Redis Cluster)"""
+    return settings.redis_mode == CLUSTER_MODE
+
+
+def hash_tag(value) -> str:
+    """Часть ключа, определяющая слот в Redis Cluster ({value}); вне кластера - как есть"""
+    return f"{{{value}}}" if use_hash_tags() else str(value)
+
+
+def _retry() -> Optional[Retry]:
+    """Политика повтора команд при таймауте"""
+    if not settings.redis_retry_on_timeout:
+        return None
+    return Retry(ExponentialBackoff(cap=0.5, base=0.05), settings.redis_retries)
+
+
+def _connection_kwargs() -> dict:
+    """Общие параметры соединений для всех режимов"""
+    return {
+        "socket_timeout": settings.redis_socket_timeout,
+        "socket_connect_timeout": settings.redis_socket_connect_timeout,
+        "socket_keepalive": True,
+        "health_check_interval": settings.redis_health_check_interval,
+        "retry": _retry(),
+    }
+
+
+def _parse_sentinels(value: str):
+    """Разобрать 'host1:26379,host2:26379' в список (host, port)"""
+    sentinels = []
+    for address in value.split(","):
+        address = address.strip()
+        if not address:
+            continue
+        host, _, port = address.rpartition(":")
+        sentinels.append((host, int(port)))
+    return sentinels
+
+
+def _create_sentinel_client(name: str, max_connections: int) -> InstrumentedRedis:
+    """Клиент мастера, адрес которого определяется через Sentinel"""
+    url_options = parse_url(settings.redis_url)
+    sentinel = Sentinel(
+        _parse_sentinels(settings.redis_sentinels),
+        sentinel_kwargs={
+            "socket_timeout": settings.redis_socket_timeout,
+            "socket_connect_timeout": settings.redis_socket_connect_timeout,
+        },
+    )
+    client = sentinel.master_for(
+        settings.redis_sentinel_master,
+        redis_class=InstrumentedRedis,
+        max_connections=max_connections,
+        db=url_options.get("db", 0),
+        username=url_options.get("username"),
+        password=url_options.get("password"),
+        retry_on_timeout=settings.redis_retry_on_timeout,
+        **_connection_kwargs(),
+    )
+    client.metrics = RedisMetrics(name)
+    return client
+
+
+def _create_cluster_client(name: str, max_connections: int) -> InstrumentedRedisCluster:
+    """Клиент Redis Cluster (max_connections - на каждый узел)"""
+    kwargs = _connection_kwargs()
+    if settings.redis_retry_on_timeout:
+        kwargs["retry_on_error"] = [RedisTimeoutError]
+    return InstrumentedRedisCluster.from_url(
+        settings.redis_url,
+        name=name,
+        max_connections=max_connections,
+        **kwargs,
+    )
+
+
+def _create_standalone_client(name: str, max_connections: int) -> InstrumentedRedis:
+    """Клиент одного Redis с блокирующим пулом соединений"""
+    pool = BlockingConnectionPool.from_url(
+        settings.redis_url,
+        max_connections=max_connections,
+        timeout=settings.redis_pool_timeout,
+        retry_on_timeout=settings.redis_retry_on_timeout,
+        **_connection_kwargs(),
+    )
+    return InstrumentedRedis(connection_pool=pool, name=name)
+
+
+def create_redis_client(name: str, max_connections: int):
+    """
+    Создать клиент Redis с собственным пулом соединений (в режиме redis_mode)
+    
+    Args:
+        name: Имя пула (для метрик)
+        max_connections: Максимальное количество соединений в пуле
+    """
+    if settings.redis_mode == SENTINEL_MODE:
+        client = _create_sentinel_client(name, max_connections)
+    elif settings.redis_mode == CLUSTER_MODE:
+        client = _create_cluster_client(name, max_connections)
+    elif settings.redis_mode == STANDALONE_MODE:
+        client = _create_standalone_client(name, max_connections)
+    else:
+        raise ValueError(f"Unknown REDIS_MODE: {settings.redis_mode}")
+    
+    _clients[name] = client
+    return client
+
+
+def create_pubsub_client(client):
+    """
+    Клиент для Redis pub/sub.
+    
+    Асинхронный клиент Redis Cluster не поддерживает pub/sub, но PUBLISH
+    в кластере рассылается на все узлы, поэтому достаточно подключиться
+    к узлу из REDIS_URL. В остальных режимах используется сам client.
+    """
+    if settings.redis_mode != CLUSTER_MODE:
+        return client
+    
+    pubsub_client = _create_standalone_client("pubsub", 4)
+    _clients["pubsub"] = pubsub_client
+    return pubsub_client
+
+
+def get_redis_stats() -> Dict[str, dict]:
+    """Метрики всех созданных клиентов"""
+    return {
+        name: client.metrics.snapshot(getattr(client, "connection_pool", None))
+        for name, client in _clients.items()
+    }
+
+
+async def run_redis_metrics_reporter(interval_seconds: int = 300):
+    """
+    Периодически выводить метрики пулов Redis (и начинать новое окно)
+    
+    Args:
+        interval_seconds: Интервал между отчетами в секундах
+    """
+    print(f"📈 Redis metrics reporter started (interval: {interval_seconds}s)")
+    
+    while True:
+        await asyncio.sleep(interval_seconds)
+        
+        for name, stats in get_redis_stats().items():
+            pool_info = ""
+            if "pool_in_use" in stats:
+                pool_info = f"pool {stats['pool_in_use']}/{stats['pool_created']} (max {stats['pool_max']}), "
+            print(
+                f"📈 Redis [{name}]: {pool_info}{stats['commands']} cmds,"
+                f" {stats['errors']} errors, {stats['slow']} slow,"
+                f" p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, max {stats['max_ms']}ms"
+            )
+            _clients[name].metrics.reset()
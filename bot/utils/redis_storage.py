@@ -1,36 +1,130 @@
 """
 Redis storage для временных данных регистрации.
-Данные хранятся с TTL 24 часа и автоматически удаляются.
+Данные хранятся с TTL (по умолчанию 24 часа) и автоматически удаляются.
+Со скользящим TTL (registration_sliding_ttl) срок продлевается при каждом
+чтении и записи в том же round-trip, поэтому отдельно продлевать его не нужно.
+
+Все данные регистрации пользователя лежат в одном hash
+registration:<telegram_id> (в Redis Cluster - registration:{<telegram_id>}):
+    language        - выбранный язык
+    user_data       - JSON с ФИО, телефоном, email, username
+    doc:<doc_type>  - file_id документа от Telegram
+Чтение - один HGETALL, запись - HSET + EXPIRE одним Lua-скриптом.
+Документ сохраняется Lua-скриптом, который атомарно записывает поле,
+продлевает TTL и возвращает всё состояние регистрации.
+Скрипты работают с одним ключом, поэтому подходят и для Redis Cluster.
 """
-import json
 from typing import Optional, Dict, Any
 from redis.asyncio import Redis
 from config.settings import settings
+from bot.utils import serialization
+from bot.utils.redis_client import hash_tag
+
+
+# TTL для данных регистрации (по умолчанию 24 часа)
+REGISTRATION_TTL = settings.registration_ttl
+
+# Поля hash регистрации
+LANGUAGE_FIELD = "language"
+USER_DATA_FIELD = "user_data"
+DOCUMENT_FIELD_PREFIX = "doc:"
 
+# HSET полей + EXPIRE одним атомарным вызовом (MULTI недоступен в Redis Cluster).
+# KEYS[1] - ключ hash, ARGV[1] - TTL, далее пары (поле, значение)
+SET_FIELDS_SCRIPT = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+"""
 
-# TTL для данных регистрации (24 часа)
-REGISTRATION_TTL = 24 * 60 * 60  # 86400 секунд
+# HSET поля документа + EXPIRE + HGETALL одним атомарным вызовом.
+# KEYS[1] - ключ hash, ARGV[1] - поле, ARGV[2] - file_id, ARGV[3] - TTL
+SET_DOCUMENT_SCRIPT = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return redis.call('HGETALL', KEYS[1])
+"""
 
 
 class RegistrationStorage:
     """Хранилище для временных данных регистрации в Redis"""
     
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, ttl: int = REGISTRATION_TTL, sliding_ttl: Optional[bool] = None):
+        """
+        Args:
+            redis: Клиент Redis
+            ttl: Время жизни данных регистрации (секунды)
+            sliding_ttl: Продлевать TTL при чтении (по умолчанию из настроек)
+        """
         self.redis = redis
+        self.ttl = ttl
+        self.sliding_ttl = settings.registration_sliding_ttl if sliding_ttl is None else sliding_ttl
+        self._set_fields_script = redis.register_script(SET_FIELDS_SCRIPT)
+        self._set_document_script = redis.register_script(SET_DOCUMENT_SCRIPT)
+    
+    def _key(self, telegram_id: int) -> str:
+        """Генерирует ключ hash регистрации для Redis"""
+        return f"registration:{hash_tag(telegram_id)}"
+    
+    async def _hset(self, telegram_id: int, mapping: Dict[str, str]) -> None:
+        """Записать поля hash и обновить TTL за один round-trip"""
+        args = [self.ttl]
+        for field, value in mapping.items():
+            args.extend([field, value])
+        await self._set_fields_script(keys=[self._key(telegram_id)], args=args)
+    
+    async def _read(self, telegram_id: int, field: Optional[str] = None):
+        """
+        Прочитать одно поле (HGET) или весь hash (HGETALL).
+        Со скользящим TTL в том же pipeline продлевается срок жизни ключа.
+        """
+        key = self._key(telegram_id)
+        if not self.sliding_ttl:
+            if field is None:
+                return await self.redis.hgetall(key)
+            return await self.redis.hget(key, field)
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if field is None:
+                pipe.hgetall(key)
+            else:
+                pipe.hget(key, field)
+            pipe.expire(key, self.ttl)
+            value, _ = await pipe.execute()
+        return value
     
-    def _key(self, telegram_id: int, suffix: str) -> str:
-        """Генерирует ключ для Redis"""
-        return f"registration:{telegram_id}:{suffix}"
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+    
+    def _parse(self, raw: Dict) -> Dict[str, Any]:
+        """Разобрать содержимое hash в {language, user_data, documents}"""
+        fields = {self._decode(k): self._decode(v) for k, v in raw.items()}
+        
+        user_data = fields.get(USER_DATA_FIELD)
+        documents = {
+            field[len(DOCUMENT_FIELD_PREFIX):]: value
+            for field, value in fields.items()
+            if field.startswith(DOCUMENT_FIELD_PREFIX)
+        }
+        
+        return {
+            "language": fields.get(LANGUAGE_FIELD),
+            "user_data": serialization.loads(user_data) if user_data else None,
+            "documents": documents
+        }
+    
+    async def _fetch(self, telegram_id: int) -> Dict[str, Any]:
+        """Прочитать все данные регистрации одним HGETALL"""
+        raw = await self._read(telegram_id)
+        return self._parse(raw)
     
     async def set_language(self, telegram_id: int, language: str) -> None:
         """Сохранить выбранный язык"""
-        key = self._key(telegram_id, "language")
-        await self.redis.setex(key, REGISTRATION_TTL, language)
+        await self._hset(telegram_id, {LANGUAGE_FIELD: language})
     
     async def get_language(self, telegram_id: int) -> Optional[str]:
         """Получить выбранный язык"""
-        key = self._key(telegram_id, "language")
-        value = await self.redis.get(key)
+        value = await self._read(telegram_id, LANGUAGE_FIELD)
         return value.decode() if value else None
     
     async def set_user_data(self, telegram_id: int, data: Dict[str, Any]) -> None:
@@ -41,34 +135,34 @@ class RegistrationStorage:
             telegram_id: Telegram ID пользователя
             data: Словарь с данными (full_name, phone, email, username)
         """
-        key = self._key(telegram_id, "data")
-        json_data = json.dumps(data, ensure_ascii=False)
-        await self.redis.setex(key, REGISTRATION_TTL, json_data)
+        await self._hset(telegram_id, {USER_DATA_FIELD: serialization.dumps(data)})
     
     async def get_user_data(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Получить данные пользователя"""
-        key = self._key(telegram_id, "data")
-        value = await self.redis.get(key)
-        return json.loads(value) if value else None
+        value = await self._read(telegram_id, USER_DATA_FIELD)
+        return serialization.loads(value) if value else None
     
-    async def set_document(self, telegram_id: int, doc_type: str, file_id: str) -> None:
+    async def set_document(self, telegram_id: int, doc_type: str, file_id: str) -> Optional[Dict[str, Any]]:
         """
         Сохранить file_id документа от Telegram
         
+        Поле документа записывается на стороне Redis, поэтому фото,
+        присланные одновременно, не затирают друг друга.
+        
         Args:
             telegram_id: Telegram ID пользователя
             doc_type: Тип документа (passport/driver_license/selfie)
             file_id: File ID от Telegram
-        """
-        key = self._key(telegram_id, "documents")
-        
-        # Получаем текущий словарь документов
-        documents = await self.get_documents(telegram_id) or {}
-        documents[doc_type] = file_id
         
-        # Сохраняем обновленный словарь
-        json_data = json.dumps(documents, ensure_ascii=False)
-        await self.redis.setex(key, REGISTRATION_TTL, json_data)
+        Returns:
+            Все данные регистрации после записи (как get_all_registration_data)
+        """
+        raw = await self._set_document_script(
+            keys=[self._key(telegram_id)],
+            args=[f"{DOCUMENT_FIELD_PREFIX}{doc_type}", file_id, self.ttl]
+        )
+        # HGETALL из Lua приходит плоским списком [field, value, ...]
+        return self._to_registration_data(self._parse(dict(zip(raw[::2], raw[1::2]))))
     
     async def get_documents(self, telegram_id: int) -> Optional[Dict[str, str]]:
         """
@@ -77,9 +171,8 @@ class RegistrationStorage:
         Returns:
             Словарь {doc_type: file_id} или None
         """
-        key = self._key(telegram_id, "documents")
-        value = await self.redis.get(key)
-        return json.loads(value) if value else None
+        documents = (await self._fetch(telegram_id))["documents"]
+        return documents or None
     
     async def get_all_registration_data(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -88,30 +181,31 @@ class RegistrationStorage:
         Returns:
             Словарь с полными данными или None если нет данных
         """
-        language = await self.get_language(telegram_id)
-        user_data = await self.get_user_data(telegram_id)
-        documents = await self.get_documents(telegram_id)
-        
-        if not user_data:
+        return self._to_registration_data(await self._fetch(telegram_id))
+    
+    @staticmethod
+    def _to_registration_data(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Привести разобранный hash к формату get_all_registration_data"""
+        if not data["user_data"]:
             return None
         
         return {
-            "language": language or "ru",
-            "user_data": user_data,
-            "documents": documents or {}
+            "language": data["language"] or "ru",
+            "user_data": data["user_data"],
+            "documents": data["documents"]
         }
     
-    async def is_registration_complete(self, telegram_id: int) -> bool:
+    @staticmethod
+    def check_complete(data: Optional[Dict[str, Any]]) -> bool:
         """
-        Проверить, завершена ли регистрация
+        Проверить по уже прочитанным данным, завершена ли регистрация
         (все данные заполнены и все обязательные документы загружены)
         """
-        data = await self.get_all_registration_data(telegram_id)
         if not data:
             return False
         
-        user_data = data.get("user_data", {})
-        documents = data.get("documents", {})
+        user_data = data.get("user_data") or {}
+        documents = data.get("documents") or {}
         
         # Проверяем наличие обязательных полей
         required_fields = ["full_name", "phone"]
@@ -124,35 +218,14 @@ class RegistrationStorage:
         
         return has_id_document and has_selfie
     
-    async def clear_registration_data(self, telegram_id: int) -> None:
-        """Удалить все данные регистрации пользователя"""
-        keys = [
-            self._key(telegram_id, "language"),
-            self._key(telegram_id, "data"),
-            self._key(telegram_id, "documents")
-        ]
-        await self.redis.delete(*keys)
-    
-    async def extend_ttl(self, telegram_id: int) -> None:
-        """Продлить TTL всех ключей регистрации"""
-        keys = [
-            self._key(telegram_id, "language"),
-            self._key(telegram_id, "data"),
-            self._key(telegram_id, "documents")
-        ]
-        for key in keys:
-            if await self.redis.exists(key):
-                await self.redis.expire(key, REGISTRATION_TTL)
-    
-    async def get_missing_data(self, telegram_id: int, language: str = "ru") -> Dict[str, bool]:
+    @staticmethod
+    def find_missing(data: Optional[Dict[str, Any]]) -> Dict[str, bool]:
         """
-        Проверить, какие данные отсутствуют
+        Определить по уже прочитанным данным, что отсутствует
         
         Returns:
             Словарь с флагами отсутствующих данных
         """
-        data = await self.get_all_registration_data(telegram_id)
-        
         if not data:
             return {
                 "user_data": True,
@@ -160,8 +233,8 @@ class RegistrationStorage:
                 "selfie": True
             }
         
-        user_data = data.get("user_data", {})
-        documents = data.get("documents", {})
+        user_data = data.get("user_data") or {}
+        documents = data.get("documents") or {}
         
         return {
             "full_name": not user_data.get("full_name"),
@@ -169,6 +242,47 @@ class RegistrationStorage:
             "id_document": not ("passport" in documents or "driver_license" in documents),
             "selfie": not documents.get("selfie")
         }
+    
+    async def is_registration_complete(self, telegram_id: int, data: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Проверить, завершена ли регистрация
+        
+        Args:
+            telegram_id: Telegram ID пользователя
+            data: Уже прочитанные данные регистрации (чтобы не читать повторно)
+        """
+        if data is None:
+            data = await self.get_all_registration_data(telegram_id)
+        return self.check_complete(data)
+    
+    async def clear_registration_data(self, telegram_id: int) -> None:
+        """Удалить все данные регистрации пользователя"""
+        await self.redis.delete(self._key(telegram_id))
+    
+    async def extend_ttl(self, telegram_id: int) -> None:
+        """Продлить TTL данных регистрации (одна команда EXPIRE)"""
+        await self.redis.expire(self._key(telegram_id), self.ttl)
+    
+    async def get_missing_data(
+        self,
+        telegram_id: int,
+        language: str = "ru",
+        data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, bool]:
+        """
+        Проверить, какие данные отсутствуют
+        
+        Args:
+            telegram_id: Telegram ID пользователя
+            language: Язык пользователя
+            data: Уже прочитанные данные регистрации (чтобы не читать повторно)
+        
+        Returns:
+            Словарь с флагами отсутствующих данных
+        """
+        if data is None:
+            data = await self.get_all_registration_data(telegram_id)
+        return self.find_missing(data)
 
 
 # Глобальный экземпляр (будет инициализирован при старте бота)
@@ -187,4 +301,3 @@ def get_registration_storage() -> RegistrationStorage:
     if _registration_storage is None:
         raise RuntimeError("RegistrationStorage not initialized. Call init_registration_storage first.")
     return _registration_storage
-
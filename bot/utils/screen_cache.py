@@ -0,0 +1,66 @@
+"""
+Кэш отрендеренных статичных экранов (текст + клавиатура).
+
+Экраны вроде FAQ по ремонту или контактов для аренды одинаковы для всех
+пользователей одного языка и зависят только от системных настроек.
+Ключ кэша: (экран, язык, версия настроек). Версия увеличивается в
+SettingsService при каждом изменении настроек, поэтому устаревшие записи
+больше никогда не читаются и удаляются при первой смене версии.
+"""
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from services.settings_service import SettingsService
+
+
+# Отрендеренный экран: текст и (опционально) inline-клавиатура
+RenderedScreen = Tuple[str, Optional[InlineKeyboardMarkup]]
+
+
+class ScreenCache:
+    """Кэш отрендеренных экранов по (экран, язык, версия настроек)"""
+    
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, int], RenderedScreen] = {}
+        self._version = SettingsService.get_version()
+    
+    async def get_or_render(
+        self,
+        screen: str,
+        language: str,
+        render: Callable[[], Awaitable[RenderedScreen]]
+    ) -> RenderedScreen:
+        """
+        Получить экран из кэша или отрендерить его
+        
+        Args:
+            screen: Имя экрана (например, "repair_faq")
+            language: Код языка
+            render: Корутина-фабрика, возвращающая (text, reply_markup)
+        
+        Returns:
+            Кортеж (text, reply_markup)
+        """
+        version = SettingsService.get_version()
+        if version != self._version:
+            # Настройки изменились - все старые экраны неактуальны
+            self._entries.clear()
+            self._version = version
+        
+        key = (screen, language, version)
+        rendered = self._entries.get(key)
+        if rendered is None:
+            rendered = await render()
+            # Не сохраняем результат, если настройки поменялись во время рендера
+            if SettingsService.get_version() == version:
+                self._entries[key] = rendered
+        return rendered
+    
+    def invalidate(self) -> None:
+        """Сбросить все закэшированные экраны"""
+        self._entries.clear()
+
+
+# Глобальный экземпляр
+screen_cache = ScreenCache()
@@ -0,0 +1,60 @@
+"""
+Сериализация данных FSM и данных регистрации для Redis.
+
+Используется orjson: формат остается JSON (старые ключи читаются как
+прежде), а кодирование и декодирование в несколько раз быстрее
+стандартного json. Перед записью значения проверяются: в Redis допускаются
+только примитивы (str, int, float, bool, None) и вложенные dict/list из них.
+ORM-объекты, datetime, Enum и т.п. нужно класть в состояние по id или
+в виде строки - иначе при записи будет TypeError.
+"""
+from typing import Any
+
+import orjson
+
+
+# Допустимые скалярные типы значений
+PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
+
+def ensure_primitive(value: Any, path: str = "data") -> None:
+    """
+    Проверить, что значение состоит только из примитивов
+    
+    Args:
+        value: Проверяемое значение
+        path: Путь к значению (для сообщения об ошибке)
+    
+    Raises:
+        TypeError: если встретилось значение недопустимого типа
+    """
+    if isinstance(value, PRIMITIVE_TYPES):
+        return
+    
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(f"{path}: ключи должны быть строками, получен {type(key).__name__}")
+            ensure_primitive(item, f"{path}.{key}")
+        return
+    
+    if isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            ensure_primitive(item, f"{path}[{index}]")
+        return
+    
+    raise TypeError(
+        f"{path}: значение типа {type(value).__name__} нельзя сохранить в Redis, "
+        f"сохраняйте id или примитивы"
+    )
+
+
+def dumps(value: Any) -> bytes:
+    """Сериализовать значение (с проверкой на примитивы)"""
+    ensure_primitive(value)
+    return orjson.dumps(value)
+
+
+def loads(data: Any) -> Any:
+    """Десериализовать значение (bytes или str)"""
+    return orjson.loads(data)
@@ -0,0 +1,159 @@
+"""
+Двухуровневое хранилище FSM: Redis + локальная память на время сбоев.
+
+Пока Redis доступен, все операции идут в него. При ошибке соединения
+хранилище переключается на локальный уровень (MemoryStorage): чтения и
+записи обслуживаются из памяти процесса, а каждая запись помечается версией
+ключа. Фоновая задача переподключается к Redis и переносит в него накопленные
+записи; ключ считается перенесенным, только если за время переноса его версия
+не изменилась. После переноса хранилище снова работает через Redis.
+
+Состояния, записанные в Redis до сбоя, на время сбоя недоступны:
+пользователь в середине сценария увидит его с начала.
+"""
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from bot.utils.serialization import ensure_primitive
+
+
+# Ошибки, означающие недоступность Redis (а не ошибку в данных)
+REDIS_UNAVAILABLE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+# Интервал попыток переподключения к Redis (секунды)
+RECONNECT_INTERVAL = 5
+
+
+class TieredStorage(BaseStorage):
+    """FSM-хранилище с локальным уровнем на время недоступности Redis"""
+    
+    def __init__(self, redis_storage: RedisStorage, online: bool = True):
+        """
+        Args:
+            redis_storage: Основное хранилище в Redis
+            online: Доступен ли Redis на момент создания
+        """
+        self.redis_storage = redis_storage
+        self.local = MemoryStorage()
+        self._online = online
+        
+        # Ключи, записанные локально и еще не перенесенные в Redis:
+        # (ключ, "state" | "data") -> версия (растет с каждой записью)
+        self._pending: Dict[Tuple[StorageKey, str], int] = {}
+    
+    @property
+    def online(self) -> bool:
+        """Работает ли хранилище через Redis"""
+        return self._online
+    
+    def _go_offline(self, error: Exception) -> None:
+        """Переключиться на локальный уровень"""
+        if self._online:
+            print(f"⚠️ Redis unavailable ({error}), FSM switched to local storage")
+        self._online = False
+    
+    def _mark_pending(self, key: StorageKey, part: str) -> None:
+        """Отметить локальную запись, которую нужно перенести в Redis"""
+        self._pending[(key, part)] = self._pending.get((key, part), 0) + 1
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        if self._online:
+            try:
+                await self.redis_storage.set_state(key, value)
+                return
+            except REDIS_UNAVAILABLE_ERRORS as e:
+                self._go_offline(e)
+        
+        await self.local.set_state(key, value)
+        self._mark_pending(key, "state")
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        if self._online:
+            try:
+                return await self.redis_storage.get_state(key)
+            except REDIS_UNAVAILABLE_ERRORS as e:
+                self._go_offline(e)
+        
+        return await self.local.get_state(key)
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if self._online:
+            try:
+                await self.redis_storage.set_data(key, data)
+                return
+            except REDIS_UNAVAILABLE_ERRORS as e:
+                self._go_offline(e)
+        
+        # Проверяем сразу, иначе ошибка всплывет только при переносе в Redis
+        ensure_primitive(data)
+        await self.local.set_data(key, data)
+        self._mark_pending(key, "data")
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        if self._online:
+            try:
+                return await self.redis_storage.get_data(key)
+            except REDIS_UNAVAILABLE_ERRORS as e:
+                self._go_offline(e)
+        
+        return await self.local.get_data(key)
+    
+    async def _replay(self) -> int:
+        """
+        Перенести локальные записи в Redis
+        
+        Returns:
+            Количество перенесенных ключей
+        """
+        replayed = 0
+        while self._pending:
+            for (key, part), version in list(self._pending.items()):
+                if part == "state":
+                    await self.redis_storage.set_state(key, await self.local.get_state(key))
+                else:
+                    await self.redis_storage.set_data(key, await self.local.get_data(key))
+                
+                # Пока переносили, ключ могли перезаписать - тогда перенесем еще раз
+                if self._pending.get((key, part)) == version:
+                    del self._pending[(key, part)]
+                replayed += 1
+        
+        # Всё перенесено - локальный уровень (включая записи, созданные
+        # чтениями во время сбоя) больше не нужен
+        self.local.storage.clear()
+        return replayed
+    
+    async def run_reconnect_loop(self) -> None:
+        """Фоновая задача: переподключение к Redis и перенос локальных записей"""
+        print(f"🔄 FSM storage reconnect loop started (interval: {RECONNECT_INTERVAL}s)")
+        
+        while True:
+            await asyncio.sleep(RECONNECT_INTERVAL)
+            if self._online:
+                continue
+            
+            try:
+                await self.redis_storage.redis.ping()
+                replayed = await self._replay()
+            except REDIS_UNAVAILABLE_ERRORS:
+                continue
+            except Exception as e:
+                print(f"❌ FSM replay error: {e}")
+                continue
+            
+            # Между окончанием переноса и переключением нет await -
+            # новых локальных записей здесь появиться не может
+            self._online = True
+            print(f"✅ Redis is back, FSM storage online (replayed {replayed} keys)")
+    
+    async def close(self) -> None:
+        await self.local.close()
+        await self.redis_storage.close()
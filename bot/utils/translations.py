@@ -1,14 +1,41 @@
 """
 Утилиты для работы с переводами
+
+Переводы хранятся в locales/<язык>/messages.json. Для быстрого холодного
+старта все каталоги компилируются в плоский вид ("section.key" -> текст)
+с уже подставленным русским fallback и сохраняются в один снапшот
+(locales/catalog.pickle, см. scripts/build_translations.py). Если снапшот
+отсутствует или устарел, каталоги компилируются из JSON при первом обращении.
+
+Актуальность снапшота определяется по хешу содержимого JSON-файлов:
+время изменения после checkout или сборки образа может быть любым.
+Хеш не считается, только если время изменения и размер всех файлов
+совпадают с записанными в снапшоте.
 """
+import hashlib
 import json
+import os
+import pickle
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
+
 
+# Поддерживаемые языки и язык по умолчанию (fallback)
+SUPPORTED_LANGUAGES = ["ru", "tg", "uz", "ky"]
+DEFAULT_LANGUAGE = "ru"
+
+LOCALES_DIR = Path(__file__).parent.parent.parent / "locales"
+SNAPSHOT_PATH = LOCALES_DIR / "catalog.pickle"
+
+# Версия формата снапшота (увеличивать при изменении структуры)
+SNAPSHOT_FORMAT = 2
 
 # Кэш для загруженных переводов
 _translations_cache: Dict[str, Dict[str, Any]] = {}
 
+# Плоские каталоги {язык: {"section.key": текст}} с подставленным fallback
+_flat_catalogs: Optional[Dict[str, Dict[str, str]]] = None
+
 
 def load_translations(language: str = "ru") -> Dict[str, Any]:
     """
@@ -23,8 +50,7 @@ def load_translations(language: str = "ru") -> Dict[str, Any]:
     if language in _translations_cache:
         return _translations_cache[language]
     
-    locales_dir = Path(__file__).parent.parent.parent / "locales"
-    translation_file = locales_dir / language / "messages.json"
+    translation_file = LOCALES_DIR / language / "messages.json"
     
     try:
         with open(translation_file, "r", encoding="utf-8") as f:
@@ -39,6 +65,138 @@ def load_translations(language: str = "ru") -> Dict[str, Any]:
         return {}
 
 
+def _flatten(translations: Dict[str, Any], prefix: str = "") -> Dict[str, str]:
+    """Превратить вложенный словарь в плоский {"section.key": текст}"""
+    flat = {}
+    for key, value in translations.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = str(value)
+    return flat
+
+
+def _source_files() -> List[Path]:
+    """JSON-файлы переводов всех поддерживаемых языков"""
+    return [LOCALES_DIR / language / "messages.json" for language in SUPPORTED_LANGUAGES]
+
+
+def source_hash() -> str:
+    """SHA-256 содержимого всех JSON-файлов переводов"""
+    digest = hashlib.sha256()
+    for path in _source_files():
+        digest.update(path.name.encode())
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _source_stat() -> List[Optional[Tuple[int, int]]]:
+    """(mtime_ns, размер) JSON-файлов переводов (None - файла нет)"""
+    stat = []
+    for path in _source_files():
+        try:
+            info = path.stat()
+        except OSError:
+            stat.append(None)
+            continue
+        stat.append((info.st_mtime_ns, info.st_size))
+    return stat
+
+
+def compile_catalogs() -> Dict[str, Any]:
+    """
+    Скомпилировать плоские каталоги всех языков из JSON
+    
+    Returns:
+        Dict со снапшотом: {"format", "hash", "stat", "catalogs", "report"}, где
+        report = {язык: {"missing": [...], "extra": [...]}} относительно
+        языка по умолчанию
+    """
+    # Снимаем до чтения: если файл изменится во время компиляции, снапшот
+    # не совпадет по stat и будет проверен по хешу
+    stat = _source_stat()
+    
+    raw = {}
+    for language, path in zip(SUPPORTED_LANGUAGES, _source_files()):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw[language] = _flatten(json.load(f))
+        except Exception as e:
+            print(f"Error loading translations for {language}: {e}")
+            raw[language] = {}
+    
+    default = raw[DEFAULT_LANGUAGE]
+    catalogs = {}
+    report = {}
+    
+    for language, flat in raw.items():
+        # Fallback-цепочка разрешается один раз здесь, а не при каждом вызове
+        catalogs[language] = {**default, **flat}
+        report[language] = {
+            "missing": sorted(set(default) - set(flat)),
+            "extra": sorted(set(flat) - set(default))
+        }
+    
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "hash": source_hash(),
+        "stat": stat,
+        "catalogs": catalogs,
+        "report": report
+    }
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: Path = SNAPSHOT_PATH) -> None:
+    """Атомарно записать снапшот каталогов на диск"""
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _snapshot_is_fresh(snapshot: Dict[str, Any]) -> bool:
+    """Снапшот собран из текущего содержимого JSON-файлов"""
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        return False
+    # Файлы не трогали с момента сборки - хеш можно не считать
+    if snapshot.get("stat") == _source_stat():
+        return True
+    return snapshot.get("hash") == source_hash()
+
+
+def load_catalogs() -> Dict[str, Dict[str, str]]:
+    """
+    Получить плоские каталоги: из снапшота одним чтением,
+    а если его нет или он устарел - скомпилировать из JSON
+    """
+    global _flat_catalogs
+    if _flat_catalogs is not None:
+        return _flat_catalogs
+    
+    snapshot = None
+    if SNAPSHOT_PATH.exists():
+        try:
+            with open(SNAPSHOT_PATH, "rb") as f:
+                snapshot = pickle.load(f)
+            if not _snapshot_is_fresh(snapshot):
+                snapshot = None
+        except Exception as e:
+            print(f"⚠️ Failed to load translations snapshot: {e}")
+            snapshot = None
+    
+    if snapshot is None:
+        snapshot = compile_catalogs()
+        try:
+            write_snapshot(snapshot)
+        except OSError as e:
+            # Например, read-only файловая система - работаем из памяти
+            print(f"⚠️ Failed to write translations snapshot: {e}")
+    
+    _flat_catalogs = snapshot["catalogs"]
+    return _flat_catalogs
+
+
 def get_text(key: str, language: str = "ru", **kwargs) -> str:
     """
     Получить переведенный текст по ключу
@@ -55,29 +213,24 @@ def get_text(key: str, language: str = "ru", **kwargs) -> str:
         >>> get_text("start.welcome_back", "ru", name="Иван")
         "👋 Добро пожаловать обратно, Иван!"
     """
-    translations = load_translations(language)
+    catalogs = load_catalogs()
+    catalog = catalogs.get(language) or catalogs[DEFAULT_LANGUAGE]
     
-    # Разбираем ключ (например, "start.welcome_back")
-    keys = key.split(".")
-    value = translations
+    # Каталог плоский и уже содержит русский fallback - один поиск по словарю
+    value = catalog.get(key)
     
     try:
-        for k in keys:
-            value = value[k]
+        if value is None:
+            raise KeyError(key)
         
         # Если есть параметры для форматирования
-        if kwargs and isinstance(value, str):
+        if kwargs:
             return value.format(**kwargs)
         
-        return str(value)
-    except (KeyError, TypeError) as e:
+        return value
+    except (KeyError, IndexError):
         # Если ключ не найден, возвращаем сам ключ (для отладки)
         print(f"Translation key not found: {key} for language {language}")
-        
-        # Пробуем fallback к русскому
-        if language != "ru":
-            return get_text(key, "ru", **kwargs)
-        
         return f"[{key}]"
 
 
@@ -0,0 +1,128 @@
+"""
+Кэш идентичности пользователей (роль, статус, язык) для проверок прав.
+
+Middleware проверки прав и режима техработ вызываются на каждое обновление,
+поэтому роль пользователя берется из памяти процесса, а в БД идем только
+при промахе (одним узким запросом). Записи живут IDENTITY_TTL секунд и
+сбрасываются явно, когда роль, статус или язык пользователя меняются.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+
+from config.settings import settings
+from database.base import async_session_factory
+from database.models.user import User, UserRole, UserStatus
+
+
+# Время жизни записи в кэше (секунды)
+IDENTITY_TTL = 60
+
+# Максимальное количество записей в кэше
+IDENTITY_CACHE_SIZE = 10000
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """Минимальный набор данных пользователя для проверки прав"""
+    telegram_id: int
+    user_id: Optional[int] = None          # None, если пользователя нет в БД
+    full_name: Optional[str] = None
+    role: Optional[UserRole] = None
+    status: Optional[UserStatus] = None
+    language: str = "ru"
+    
+    @property
+    def exists(self) -> bool:
+        return self.user_id is not None
+    
+    @property
+    def is_admin(self) -> bool:
+        return self.role == UserRole.ADMIN or self.telegram_id in settings.admin_ids
+    
+    @property
+    def is_manager(self) -> bool:
+        return self.role == UserRole.MANAGER
+    
+    @property
+    def is_staff(self) -> bool:
+        """Проверка, является ли пользователь сотрудником (менеджер или админ)"""
+        return self.is_admin or self.is_manager
+    
+    @property
+    def can_verify_documents(self) -> bool:
+        return self.is_staff
+    
+    @property
+    def can_manage_bikes(self) -> bool:
+        return self.is_staff
+    
+    @property
+    def can_manage_users(self) -> bool:
+        return self.is_admin
+
+
+class IdentityCache:
+    """LRU-кэш UserIdentity с ограниченным временем жизни"""
+    
+    def __init__(self, ttl: int = IDENTITY_TTL, max_size: int = IDENTITY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, UserIdentity]]" = OrderedDict()
+    
+    def peek(self, telegram_id: int) -> Optional[UserIdentity]:
+        """Получить идентичность только из кэша (без обращения к БД)"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            return None
+        
+        expires_at, identity = entry
+        if expires_at < time.monotonic():
+            del self._entries[telegram_id]
+            return None
+        
+        self._entries.move_to_end(telegram_id)
+        return identity
+    
+    async def get(self, telegram_id: int) -> UserIdentity:
+        """Получить идентичность пользователя (из кэша или из БД)"""
+        identity = self.peek(telegram_id)
+        if identity is not None:
+            return identity
+        
+        async with async_session_factory() as session:
+            result = await session.execute(
+                select(User.id, User.full_name, User.role, User.status, User.language)
+                .where(User.telegram_id == telegram_id)
+            )
+            row = result.one_or_none()
+        
+        if row is None:
+            identity = UserIdentity(telegram_id=telegram_id)
+        else:
+            identity = UserIdentity(
+                telegram_id=telegram_id,
+                user_id=row.id,
+                full_name=row.full_name,
+                role=row.role,
+                status=row.status,
+                language=row.language or "ru"
+            )
+        
+        self._entries[telegram_id] = (time.monotonic() + self.ttl, identity)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        
+        return identity
+    
+    def invalidate(self, telegram_id: int) -> None:
+        """Сбросить запись пользователя (после смены роли, статуса или языка)"""
+        self._entries.pop(telegram_id, None)
+
+
+# Глобальный экземпляр
+identity_cache = IdentityCache()
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, computed_field
-from typing import List
+from functools import cached_property
+from typing import FrozenSet
 
 
 class Settings(BaseSettings):
@@ -13,6 +14,37 @@ class Settings(BaseSettings):
     
     # Redis
     redis_url: str = Field(default="redis://localhost:6379/0", env="REDIS_URL")
+    redis_mode: str = Field(default="standalone", env="REDIS_MODE")  # standalone | sentinel | cluster
+    redis_sentinels: str = Field(default="", env="REDIS_SENTINELS")  # host1:26379,host2:26379
+    redis_sentinel_master: str = Field(default="mymaster", env="REDIS_SENTINEL_MASTER")
+    redis_max_connections: int = Field(default=20, env="REDIS_MAX_CONNECTIONS")  # Пул данных приложения
+    redis_fsm_max_connections: int = Field(default=50, env="REDIS_FSM_MAX_CONNECTIONS")  # Пул FSM
+    redis_pool_timeout: float = Field(default=2.0, env="REDIS_POOL_TIMEOUT")  # Ожидание свободного соединения
+    redis_socket_timeout: float = Field(default=2.0, env="REDIS_SOCKET_TIMEOUT")
+    redis_socket_connect_timeout: float = Field(default=2.0, env="REDIS_SOCKET_CONNECT_TIMEOUT")
+    redis_retry_on_timeout: bool = Field(default=True, env="REDIS_RETRY_ON_TIMEOUT")
+    redis_retries: int = Field(default=1, env="REDIS_RETRIES")
+    redis_health_check_interval: int = Field(default=30, env="REDIS_HEALTH_CHECK_INTERVAL")
+    redis_metrics_interval: int = Field(default=300, env="REDIS_METRICS_INTERVAL")  # 0 - не выводить метрики
+    
+    # Registration (временные данные регистрации в Redis)
+    registration_ttl: int = Field(default=86400, env="REGISTRATION_TTL")  # 24 часа
+    registration_sliding_ttl: bool = Field(default=True, env="REGISTRATION_SLIDING_TTL")  # Продлевать TTL при каждом обращении
+    
+    # FSM: TTL состояния и данных по группам состояний (секунды)
+    fsm_state_ttl: int = Field(default=86400, env="FSM_STATE_TTL")  # Состояния вне групп ниже
+    fsm_data_ttl: int = Field(default=86400, env="FSM_DATA_TTL")
+    fsm_registration_state_ttl: int = Field(default=86400, env="FSM_REGISTRATION_STATE_TTL")  # Как данные регистрации в Redis
+    fsm_registration_data_ttl: int = Field(default=86400, env="FSM_REGISTRATION_DATA_TTL")
+    fsm_rental_state_ttl: int = Field(default=7200, env="FSM_RENTAL_STATE_TTL")
+    fsm_rental_data_ttl: int = Field(default=7200, env="FSM_RENTAL_DATA_TTL")
+    fsm_settings_state_ttl: int = Field(default=3600, env="FSM_SETTINGS_STATE_TTL")
+    fsm_settings_data_ttl: int = Field(default=3600, env="FSM_SETTINGS_DATA_TTL")
+    fsm_repair_state_ttl: int = Field(default=3600, env="FSM_REPAIR_STATE_TTL")
+    fsm_repair_data_ttl: int = Field(default=3600, env="FSM_REPAIR_DATA_TTL")
+    fsm_compaction_interval_hours: int = Field(default=6, env="FSM_COMPACTION_INTERVAL_HOURS")
+    fsm_cache_enabled: bool = Field(default=False, env="FSM_CACHE_ENABLED")  # Кэш FSM в памяти (client-side caching Redis)
+    fsm_cache_ttl: int = Field(default=30, env="FSM_CACHE_TTL")  # Максимальное время жизни записи кэша FSM
     
     # Payment System (Точка Банк)
     tochka_jwt_token: str = Field(default="", env="TOCHKA_JWT_TOKEN")  # JWT токен для API
@@ -22,17 +54,40 @@ class Settings(BaseSettings):
     # File Storage
     upload_path: str = Field(default="./uploads", env="UPLOAD_PATH")
     max_file_size: int = Field(default=10485760, env="MAX_FILE_SIZE")  # 10MB
+    storage_backend: str = Field(default="local", env="STORAGE_BACKEND")  # local | s3
+    s3_endpoint_url: str = Field(default="", env="S3_ENDPOINT_URL")  # Пусто - AWS S3; MinIO: http://minio:9000
+    s3_bucket: str = Field(default="velo-documents", env="S3_BUCKET")
+    s3_region: str = Field(default="us-east-1", env="S3_REGION")
+    s3_access_key: str = Field(default="", env="S3_ACCESS_KEY")
+    s3_secret_key: str = Field(default="", env="S3_SECRET_KEY")
+    s3_presigned_urls: bool = Field(default=False, env="S3_PRESIGNED_URLS")  # Telegram скачивает фото по ссылке (хранилище должно быть доступно из интернета)
+    s3_presign_ttl: int = Field(default=300, env="S3_PRESIGN_TTL")
+    
+    # Document ingestion (фоновая загрузка документов из Telegram)
+    document_ingest_workers: int = Field(default=2, env="DOCUMENT_INGEST_WORKERS")
+    document_ingest_concurrency: int = Field(default=3, env="DOCUMENT_INGEST_CONCURRENCY")  # Одновременных загрузок на воркер
+    document_ingest_max_attempts: int = Field(default=5, env="DOCUMENT_INGEST_MAX_ATTEMPTS")
+    document_ingest_retry_delay: int = Field(default=5, env="DOCUMENT_INGEST_RETRY_DELAY")  # Секунды, удваивается с каждой попыткой
+    image_workers: int = Field(default=2, env="IMAGE_WORKERS")  # Процессов для подготовки фото документов
+    document_min_sharpness: float = Field(default=100.0, env="DOCUMENT_MIN_SHARPNESS")  # Дисперсия лапласиана; ниже - фото размыто (0 - не проверять)
+    document_min_brightness: float = Field(default=40.0, env="DOCUMENT_MIN_BRIGHTNESS")  # Средняя яркость 0-255
+    document_max_glare: float = Field(default=0.2, env="DOCUMENT_MAX_GLARE")  # Доля засвеченных пикселей
+    document_min_resolution: int = Field(default=600, env="DOCUMENT_MIN_RESOLUTION")  # Пикселей по меньшей стороне
+    
+    # Document review queue (проверка документов по очереди)
+    document_review_lease_ttl: int = Field(default=300, env="DOCUMENT_REVIEW_LEASE_TTL")  # Секунды, пока пользователь закреплен за администратором
+    document_review_warmup_chat_id: int = Field(default=0, env="DOCUMENT_REVIEW_WARMUP_CHAT_ID")  # Служебный чат для загрузки фото заранее (0 - не загружать)
     
     # Logging
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     
     @computed_field
-    @property
-    def admin_ids(self) -> List[int]:
-        """Parse comma-separated admin IDs from environment variable"""
+    @cached_property
+    def admin_ids(self) -> FrozenSet[int]:
+        """Parse comma-separated admin IDs from environment variable (once)"""
         if not self.admin_ids_str.strip():
-            return []
-        return [int(id.strip()) for id in self.admin_ids_str.split(",") if id.strip()]
+            return frozenset()
+        return frozenset(int(id.strip()) for id in self.admin_ids_str.split(",") if id.strip())
     
     class Config:
         # Порядок важен: сначала проверяется .env.local (для разработки), 
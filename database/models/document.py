@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Float, ForeignKey, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database.base import Base
 import enum
+from typing import List
 
 
 class DocumentType(enum.Enum):
@@ -29,9 +30,15 @@ class Document(Base):
     
     # Информация о документе
     document_type = Column(Enum(DocumentType), nullable=False)
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False)  # Ключ файла в хранилище (services/document_storage.py); пустая строка, пока файл не загружен из Telegram
+    telegram_file_id = Column(String(255), nullable=True)  # file_id фото от Telegram
+    review_path = Column(String(500), nullable=True)  # Уменьшенная копия без EXIF для просмотра
+    thumbnail_path = Column(String(500), nullable=True)  # Миниатюра
+    view_file_id = Column(String(255), nullable=True)  # file_id отправленной копии для просмотра (для повторных отправок)
     original_filename = Column(String(255), nullable=True)
     file_size = Column(Integer, nullable=True)
+    quality_score = Column(Float, nullable=True)  # Резкость фото - дисперсия лапласиана (services/image_processing.py); None - не оценивалось
+    quality_issues = Column(String(100), nullable=True)  # Проблемы качества через запятую (blurry, dark, ...); пустая строка - проблем нет
     
     # Статус и проверка
     status = Column(Enum(DocumentStatus), default=DocumentStatus.PENDING, nullable=False)
@@ -50,6 +57,21 @@ class Document(Base):
     def __repr__(self):
         return f"<Document(id={self.id}, type={self.document_type.value}, status={self.status.value})>"
     
+    @property
+    def is_ingested(self) -> bool:
+        """Загружен ли файл документа из Telegram"""
+        return bool(self.file_path)
+    
+    @property
+    def view_path(self) -> str:
+        """Ключ файла для показа в боте: уменьшенная копия, если она есть"""
+        return self.review_path or self.file_path
+    
+    @property
+    def quality_problems(self) -> List[str]:
+        """Проблемы качества фото, найденные при загрузке"""
+        return self.quality_issues.split(",") if self.quality_issues else []
+    
     @property
     def is_approved(self) -> bool:
         return self.status == DocumentStatus.APPROVED 
\ No newline at end of file
@@ -1,10 +1,7 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.fsm.storage.redis import RedisStorage
 from loguru import logger
-import redis.asyncio as redis
 
 from config.settings import settings
 from database.base import init_db
@@ -17,8 +14,21 @@ from bot.handlers.admin.admin_panel import router as admin_panel_router
 from bot.handlers.admin.bike_management import router as bike_management_router
 from bot.handlers.admin.document_verification import router as document_verification_router
 from bot.handlers.admin.settings_management import router as settings_management_router
+from bot.middlewares.maintenance import MaintenanceMiddleware
+from bot.utils.fsm_storage import CachedRedisStorage, GroupTTLRedisStorage
+from bot.utils.redis_client import (
+    APP_POOL, CLUSTER_MODE, FSM_POOL,
+    create_pubsub_client, create_redis_client, run_redis_metrics_reporter
+)
+from bot.utils.tiered_storage import TieredStorage
 from bot.utils.redis_storage import init_registration_storage
 from services.cleanup_service import run_periodic_cleanup
+from services.document_ingestion import init_document_ingestion_queue, run_document_ingestion_workers
+from services.document_review_queue import init_document_review_queue
+from services.document_storage import close_blob_storage, get_blob_storage
+from services.fsm_compactor import run_periodic_fsm_compaction
+from services.image_processing import shutdown_image_executor
+from services.settings_service import SettingsService, run_settings_invalidation_listener
 from services.webhook_server import run_webhook_server
 import os
 
@@ -40,25 +50,57 @@ async def main():
     # Инициализация бота
     bot = Bot(token=settings.bot_token)
     
-    # Выбор хранилища для FSM состояний
+    # Отдельные пулы соединений Redis для FSM и для данных приложения.
+    # Клиенты подключаются лениво, поэтому создаются даже при недоступном Redis.
+    fsm_redis = create_redis_client(FSM_POOL, settings.redis_fsm_max_connections)
+    app_redis = create_redis_client(APP_POOL, settings.redis_max_connections)
+    pubsub_redis = create_pubsub_client(app_redis)
+    logger.info(f"🔌 Redis: режим {settings.redis_mode}")
+    
+    # Хранилище для FSM состояний: Redis с локальным уровнем на время его недоступности
+    redis_online = True
     try:
-        # Пытаемся подключиться к Redis
-        redis_client = redis.from_url(settings.redis_url)
-        await redis_client.ping()
-        storage = RedisStorage(redis_client)
+        await fsm_redis.ping()
         logger.info("✅ Подключение к Redis успешно")
-        
-        # Инициализируем хранилище для данных регистрации
-        init_registration_storage(redis_client)
-        logger.info("✅ Registration storage инициализирован")
     except Exception as e:
-        # Если Redis недоступен, используем память
-        logger.warning(f"⚠️ Redis недоступен ({e}), используем MemoryStorage")
-        logger.warning("⚠️ Регистрация пользователей может работать некорректно без Redis")
-        storage = MemoryStorage()
+        redis_online = False
+        logger.warning(f"⚠️ Redis недоступен ({e}), FSM работает из памяти до переподключения")
+    
+    # TTL состояний и данных FSM зависят от группы состояний (см. FSM_* в настройках)
+    if settings.fsm_cache_enabled and settings.redis_mode == CLUSTER_MODE:
+        logger.warning("⚠️ Кэш FSM в памяти не поддерживается в Redis Cluster, отключен")
+        redis_fsm_storage = GroupTTLRedisStorage(fsm_redis)
+    elif settings.fsm_cache_enabled:
+        # Повторные чтения состояния отдаются из памяти процесса
+        redis_fsm_storage = CachedRedisStorage(fsm_redis)
+    else:
+        redis_fsm_storage = GroupTTLRedisStorage(fsm_redis)
+    storage = TieredStorage(redis_fsm_storage, online=redis_online)
+    
+    # Инициализируем хранилище для данных регистрации
+    init_registration_storage(app_redis)
+    logger.info("✅ Registration storage инициализирован")
+    
+    # Очередь фоновой загрузки документов регистрации
+    init_document_ingestion_queue(app_redis)
+    
+    # Очередь проверки документов администраторами (аренда пользователей в Redis)
+    init_document_review_queue(app_redis)
+    
+    # Хранилище файлов документов (создаем сразу, чтобы ошибка настройки была видна при запуске)
+    get_blob_storage()
+    logger.info(f"🗂️ Хранилище документов: {settings.storage_backend}")
+    
+    # Изменения настроек рассылаются другим репликам через Redis pub/sub
+    SettingsService.init_cache(pubsub_redis)
     
     dp = Dispatcher(storage=storage)
     
+    # Режим техработ проверяется до любых обработчиков (флаг берется из кэша настроек)
+    maintenance_middleware = MaintenanceMiddleware()
+    dp.message.outer_middleware(maintenance_middleware)
+    dp.callback_query.outer_middleware(maintenance_middleware)
+    
     # Мультиязычность настроена через bot/utils/translations.py (простые JSON переводы)
     logger.info("✅ Мультиязычность (i18n) готова к использованию")
     
@@ -94,6 +136,52 @@ async def main():
         )
         logger.info("🧹 Cleanup service запущен (проверка каждый час)")
         
+        # Воркеры загрузки документов из Telegram (независимо от обработки апдейтов)
+        ingestion_task = asyncio.create_task(
+            run_document_ingestion_workers(
+                bot,
+                workers=settings.document_ingest_workers,
+                concurrency=settings.document_ingest_concurrency
+            )
+        )
+        logger.info(
+            f"📥 Загрузка документов: {settings.document_ingest_workers} воркеров"
+            f" x {settings.document_ingest_concurrency} загрузок"
+        )
+        
+        # Прогреваем кэш настроек и слушаем изменения от других реплик
+        await SettingsService.get_settings()
+        settings_listener_task = asyncio.create_task(
+            run_settings_invalidation_listener(pubsub_redis)
+        )
+        logger.info("🔄 Кэш настроек синхронизируется через Redis pub/sub")
+        
+        # Переподключение к Redis и перенос записей FSM, сделанных во время сбоя
+        fsm_reconnect_task = asyncio.create_task(storage.run_reconnect_loop())
+        
+        # Удаляем брошенные FSM-ключи, оставшиеся без TTL
+        fsm_compaction_task = asyncio.create_task(
+            run_periodic_fsm_compaction(
+                fsm_redis,
+                redis_fsm_storage,
+                interval_hours=settings.fsm_compaction_interval_hours
+            )
+        )
+        logger.info(f"🗜️ FSM compactor запущен (каждые {settings.fsm_compaction_interval_hours}ч)")
+        
+        # Инвалидации локального кэша FSM приходят от Redis (client-side caching)
+        fsm_cache_task = None
+        if isinstance(redis_fsm_storage, CachedRedisStorage):
+            fsm_cache_task = asyncio.create_task(redis_fsm_storage.run_invalidation_listener())
+            logger.info("⚡ Кэш FSM в памяти включен (инвалидация через CLIENT TRACKING)")
+        
+        # Загрузка пулов Redis и задержки команд
+        redis_metrics_task = None
+        if settings.redis_metrics_interval > 0:
+            redis_metrics_task = asyncio.create_task(
+                run_redis_metrics_reporter(settings.redis_metrics_interval)
+            )
+        
         # Опционально запускаем webhook сервер для ЮKassa
         webhook_task = None
         if os.getenv("ENABLE_WEBHOOK_SERVER", "false").lower() == "true":
@@ -106,7 +194,7 @@ async def main():
         # Запуск бота
         logger.info("🤖 Бот запущен и готов к работе!")
         await dp.start_polling(bot)
-        
+    
     except Exception as e:
         logger.error(f"❌ Ошибка при запуске: {e}")
         raise
@@ -119,6 +207,60 @@ async def main():
             except asyncio.CancelledError:
                 pass
         
+        # Останавливаем воркеры загрузки документов
+        if 'ingestion_task' in locals():
+            ingestion_task.cancel()
+            try:
+                await ingestion_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Останавливаем пул процессов обработки фото
+        shutdown_image_executor()
+        
+        # Закрываем соединения с хранилищем документов
+        await close_blob_storage()
+        
+        # Останавливаем слушатель изменений настроек
+        if 'settings_listener_task' in locals() and settings_listener_task:
+            settings_listener_task.cancel()
+            try:
+                await settings_listener_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Останавливаем переподключение FSM-хранилища
+        if 'fsm_reconnect_task' in locals():
+            fsm_reconnect_task.cancel()
+            try:
+                await fsm_reconnect_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Останавливаем компактификацию FSM
+        if 'fsm_compaction_task' in locals() and fsm_compaction_task:
+            fsm_compaction_task.cancel()
+            try:
+                await fsm_compaction_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Останавливаем слушатель инвалидаций кэша FSM
+        if 'fsm_cache_task' in locals() and fsm_cache_task:
+            fsm_cache_task.cancel()
+            try:
+                await fsm_cache_task
+            except asyncio.CancelledError:
+                pass
+        
+        # Останавливаем вывод метрик Redis
+        if 'redis_metrics_task' in locals() and redis_metrics_task:
+            redis_metrics_task.cancel()
+            try:
+                await redis_metrics_task
+            except asyncio.CancelledError:
+                pass
+        
         # Останавливаем webhook сервер
         if 'webhook_task' in locals() and webhook_task:
             webhook_task.cancel()
@@ -128,8 +270,10 @@ async def main():
                 pass
         
         await bot.session.close()
-        if hasattr(storage, 'close'):
-            await storage.close()
+        await storage.close()
+        await app_redis.aclose(close_connection_pool=True)
+        if pubsub_redis is not app_redis:
+            await pubsub_redis.aclose(close_connection_pool=True)
 
 
 if __name__ == "__main__":
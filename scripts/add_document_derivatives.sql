@@ -0,0 +1,11 @@
+-- SQL скрипт для добавления колонок review_path и thumbnail_path в таблицу documents
+-- Копии для просмотра и миниатюры готовятся при загрузке документа;
+-- для старых документов колонки остаются пустыми и показывается оригинал
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS review_path VARCHAR(500);
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS thumbnail_path VARCHAR(500);
+
+-- Проверяем результат
+SELECT id, user_id, document_type, file_path, review_path, thumbnail_path
+FROM documents
+ORDER BY id;
@@ -0,0 +1,12 @@
+-- SQL скрипт для добавления колонок оценки качества фото в таблицу documents
+-- quality_score - резкость (дисперсия лапласиана), quality_issues - найденные
+-- при загрузке проблемы (blurry, dark, overexposed, low_resolution)
+-- Документы, загруженные раньше, остаются без оценки (NULL)
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS quality_score DOUBLE PRECISION;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS quality_issues VARCHAR(100);
+
+-- Проверяем результат
+SELECT id, user_id, document_type, quality_score, quality_issues
+FROM documents
+ORDER BY id;
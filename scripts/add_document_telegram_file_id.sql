@@ -0,0 +1,11 @@
+-- SQL скрипт для добавления колонки telegram_file_id в таблицу documents
+-- Нужен для существующих баз: документы теперь загружаются из Telegram
+-- фоновой очередью, и до загрузки file_path пустой, а file_id хранится в БД
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS telegram_file_id VARCHAR(255);
+
+-- Проверяем результат (документы, ожидающие загрузки)
+SELECT id, user_id, document_type, telegram_file_id
+FROM documents
+WHERE file_path = ''
+ORDER BY id;
@@ -0,0 +1,10 @@
+-- SQL скрипт для добавления колонки view_file_id в таблицу documents
+-- В ней хранится file_id, который Telegram вернул при первой отправке фото
+-- документа: повторные просмотры отправляются по нему без загрузки файла
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS view_file_id VARCHAR(255);
+
+-- Проверяем результат
+SELECT id, user_id, document_type, view_file_id
+FROM documents
+ORDER BY id;
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации данных FSM и регистрации: json vs orjson.
+
+Сравнивает стандартный json (как было раньше в RedisStorage и
+RegistrationStorage) с bot.utils.serialization (orjson + проверка на
+примитивы) на типичных данных, которые пишутся и читаются при каждом
+обновлении. Выводит время кодирования и декодирования на одну операцию.
+
+Использование:
+    python scripts/benchmark_serializer.py
+    python scripts/benchmark_serializer.py --number 200000
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bot.utils import serialization
+
+
+# Типичные данные, которые хранятся в Redis
+PAYLOADS = {
+    "fsm_registration": {
+        "language": "ru",
+        "telegram_id": 6080737314,
+        "username": "ivan_petrov",
+        "full_name": "Иванов Иван Иванович",
+        "chosen_document_type": "passport",
+    },
+    "fsm_extension": {
+        "rental_id": 1542,
+        "tariff_key": "day",
+    },
+    "registration_user_data": {
+        "full_name": "Иванов Иван Иванович",
+        "phone": "+79991234567",
+        "username": "ivan_petrov",
+        "email": None,
+    },
+}
+
+
+def json_dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def measure(func, value, number: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    total = min(timeit.repeat(lambda: func(value), number=number, repeat=5))
+    return total / number * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации json vs orjson")
+    parser.add_argument("--number", type=int, default=100000, help="Количество вызовов в одном замере")
+    args = parser.parse_args()
+    
+    print(f"⏱️  Сериализация, мкс на операцию (лучшее из 5 по {args.number} вызовов)\n")
+    print(f"{'Данные':<26} {'Размер':>7} {'json enc':>9} {'orjson enc':>11} {'json dec':>9} {'orjson dec':>11}")
+    print("-" * 78)
+    
+    total_json = 0.0
+    total_fast = 0.0
+    for name, payload in PAYLOADS.items():
+        encoded_json = json_dumps(payload)
+        encoded_fast = serialization.dumps(payload)
+        assert json.loads(encoded_fast) == payload  # Формат совместим со старыми ключами
+        
+        json_enc = measure(json_dumps, payload, args.number)
+        fast_enc = measure(serialization.dumps, payload, args.number)
+        json_dec = measure(json.loads, encoded_json, args.number)
+        fast_dec = measure(serialization.loads, encoded_fast, args.number)
+        
+        total_json += json_enc + json_dec
+        total_fast += fast_enc + fast_dec
+        
+        print(
+            f"{name:<26} {len(encoded_fast):>6}B {json_enc:>9.2f} {fast_enc:>11.2f} "
+            f"{json_dec:>9.2f} {fast_dec:>11.2f}"
+        )
+    
+    print("-" * 78)
+    print(f"\n📊 Запись + чтение всех данных: json {total_json:.2f} мкс, orjson {total_fast:.2f} мкс")
+    print(f"⚡ Экономия на одно обновление: {total_json - total_fast:.2f} мкс ({total_json / total_fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Скрипт для сборки снапшота переводов (locales/catalog.pickle).
+
+Компилирует JSON-каталоги ru/tg/uz/ky в плоский вид с русским fallback,
+сохраняет их одним файлом с хешем исходников и выводит отчет
+об отсутствующих и лишних ключах по языкам.
+
+Использование:
+    python scripts/build_translations.py            # собрать снапшот
+    python scripts/build_translations.py --check    # только отчет
+    python scripts/build_translations.py --strict   # ошибка, если ключи расходятся
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bot.utils.translations import (
+    DEFAULT_LANGUAGE, SNAPSHOT_PATH, compile_catalogs, write_snapshot
+)
+
+
+def print_report(report: dict) -> int:
+    """Вывести отчет по ключам и вернуть количество расхождений"""
+    problems = 0
+    
+    for language, diff in report.items():
+        if language == DEFAULT_LANGUAGE:
+            continue
+        
+        missing = diff["missing"]
+        extra = diff["extra"]
+        problems += len(missing) + len(extra)
+        
+        status = "✅" if not missing and not extra else "⚠️ "
+        print(f"{status} {language}: отсутствует {len(missing)}, лишних {len(extra)}")
+        for key in missing:
+            print(f"      - {key} (будет показан текст на {DEFAULT_LANGUAGE})")
+        for key in extra:
+            print(f"      + {key} (нет в {DEFAULT_LANGUAGE})")
+    
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка снапшота переводов")
+    parser.add_argument("--check", action="store_true", help="Только проверить ключи, не записывать снапшот")
+    parser.add_argument("--strict", action="store_true", help="Завершиться с ошибкой при расхождении ключей")
+    args = parser.parse_args()
+    
+    print("🌐 Компиляция переводов...\n")
+    snapshot = compile_catalogs()
+    
+    for language, catalog in snapshot["catalogs"].items():
+        print(f"📄 {language}: {len(catalog)} ключей")
+    print()
+    
+    problems = print_report(snapshot["report"])
+    
+    if not args.check:
+        write_snapshot(snapshot)
+        size_kb = SNAPSHOT_PATH.stat().st_size / 1024
+        print(f"\n✅ Снапшот записан: {SNAPSHOT_PATH} ({size_kb:.1f} KB)")
+        print(f"🔑 Хеш исходников: {snapshot['hash']}")
+    
+    if args.strict and problems:
+        print(f"\n❌ Найдено расхождений: {problems}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
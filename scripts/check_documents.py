@@ -12,12 +12,14 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from database.base import async_session_factory
 from database.models.user import User
 from database.models.document import Document
+from services.document_storage import close_blob_storage, get_blob_storage
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
 
 async def check_documents():
     """Проверить документы в базе данных"""
+    storage = get_blob_storage()
     
     async with async_session_factory() as session:
         # Получаем всех пользователей с документами
@@ -46,11 +48,11 @@ async def check_documents():
             if user.documents:
                 print(f"\n   📄 Документы:")
                 for doc in user.documents:
-                    file_exists = "✅" if Path(doc.file_path).exists() else "❌"
+                    file_exists = "✅" if doc.is_ingested and await storage.exists(doc.file_path) else "❌"
                     print(f"      • ID: {doc.id}")
                     print(f"        Тип: {doc.document_type.value}")
                     print(f"        Статус: {doc.status.value}")
-                    print(f"        Путь: {doc.file_path}")
+                    print(f"        Ключ: {doc.file_path}")
                     print(f"        Файл существует: {file_exists}")
                     if doc.uploaded_at:
                         print(f"        Загружен: {doc.uploaded_at.strftime('%d.%m.%Y %H:%M:%S')}")
@@ -63,6 +65,7 @@ async def check_documents():
 
 async def check_specific_user(telegram_id: int):
     """Проверить документы конкретного пользователя"""
+    storage = get_blob_storage()
     
     async with async_session_factory() as session:
         result = await session.execute(
@@ -87,14 +90,14 @@ async def check_specific_user(telegram_id: int):
         if user.documents:
             print(f"📄 Список документов:\n")
             for i, doc in enumerate(user.documents, 1):
-                file_exists = Path(doc.file_path).exists()
+                file_exists = doc.is_ingested and await storage.exists(doc.file_path)
                 print(f"{i}. Документ ID: {doc.id}")
                 print(f"   Тип: {doc.document_type.value}")
                 print(f"   Статус: {doc.status.value}")
-                print(f"   Путь: {doc.file_path}")
+                print(f"   Ключ: {doc.file_path}")
                 print(f"   Файл существует: {'✅ Да' if file_exists else '❌ Нет'}")
                 if not file_exists:
-                    print(f"   ⚠️  ВНИМАНИЕ: Файл не найден на диске!")
+                    print(f"   ⚠️  ВНИМАНИЕ: Файл не найден в хранилище!")
                 if doc.uploaded_at:
                     print(f"   Загружен: {doc.uploaded_at.strftime('%d.%m.%Y %H:%M:%S')}")
                 if doc.verified_at:
@@ -119,6 +122,8 @@ async def main():
             print("Использование: python check_documents.py [TELEGRAM_ID]")
     else:
         await check_documents()
+    
+    await close_blob_storage()
 
 
 if __name__ == "__main__":
@@ -1,31 +1,83 @@
 #!/usr/bin/env python3
 """
-Скрипт для исправления путей к документам в базе данных.
-Конвертирует относительные пути в абсолютные.
+Скрипт для переноса документов в хранилище с адресацией по содержимому.
+Файлы, записанные в БД старыми путями (абсолютными или относительными
+вида uploads/...), переносятся в хранилище (services/document_storage.py;
+при STORAGE_BACKEND=s3 - загружаются в S3), а в БД записываются ключи
+файлов. Копии для просмотра переносятся вместе с оригиналом. Повторный
+запуск безопасен: уже перенесенные документы пропускаются.
 """
 
 import asyncio
+import mimetypes
 import os
 from pathlib import Path
-from sqlalchemy import select, update
+from typing import Optional
 
 # Добавляем корневую директорию проекта в путь
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from sqlalchemy import select
+
 from database.base import async_session_factory
 from database.models.document import Document
+from services.document_storage import (
+    REVIEW_SUFFIX,
+    THUMBNAIL_SUFFIX,
+    blob_key,
+    close_blob_storage,
+    derivative_key,
+    get_upload_dir,
+    hash_file,
+    store_file,
+)
 
 
-async def fix_document_paths():
-    """Исправить пути к документам в базе данных"""
+# Получаем абсолютный путь к корню проекта
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def is_storage_key(value: str) -> bool:
+    """Записано ли в БД уже значение в формате ключа хранилища"""
+    return not os.path.isabs(value) and not value.startswith((".", "uploads/"))
+
+
+def find_legacy_file(old_path: str) -> Optional[Path]:
+    """Найти файл по старому пути"""
+    if os.path.isabs(old_path):
+        candidates = [Path(old_path)]
+    else:
+        candidates = [(PROJECT_ROOT / old_path).absolute(), get_upload_dir() / old_path]
     
-    # Получаем абсолютный путь к корню проекта
-    project_root = Path(__file__).parent.parent
+    for path in candidates:
+        if path.is_file():
+            return path
+    return None
+
+
+async def move_derivative(old_path: Optional[str], key: str) -> Optional[str]:
+    """Перенести копию для просмотра в хранилище под ключом key"""
+    if not old_path:
+        return None
+    if is_storage_key(old_path):
+        return old_path
+    
+    source = find_legacy_file(old_path)
+    if source is None:
+        # Копия потеряна - без нее показывается оригинал
+        return None
+    
+    await store_file(source, key, "image/jpeg")
+    return key
+
+
+async def fix_document_paths():
+    """Перенести документы со старыми путями в хранилище"""
     
     async with async_session_factory() as session:
-        # Получаем все документы
-        result = await session.execute(select(Document))
+        # Получаем все загруженные документы
+        result = await session.execute(select(Document).where(Document.file_path != ""))
         documents = result.scalars().all()
         
         print(f"📄 Найдено документов в базе данных: {len(documents)}")
@@ -33,28 +85,30 @@ async def fix_document_paths():
         updated_count = 0
         for doc in documents:
             old_path = doc.file_path
+            if is_storage_key(old_path):
+                continue
+            
+            source = find_legacy_file(old_path)
+            if source is None:
+                print(f"⚠️  Файл не найден для документа ID {doc.id}: {old_path}")
+                continue
+            
+            extension = source.suffix.lstrip(".").lower()
+            key = blob_key(hash_file(source), extension)
+            created = await store_file(source, key, mimetypes.guess_type(source.name)[0])
             
-            # Проверяем, является ли путь относительным
-            if not os.path.isabs(old_path):
-                # Конвертируем в абсолютный путь
-                new_path = (project_root / old_path).absolute()
-                
-                # Проверяем, существует ли файл
-                if new_path.exists():
-                    doc.file_path = str(new_path)
-                    updated_count += 1
-                    print(f"✅ Обновлен путь для документа ID {doc.id}:")
-                    print(f"   Старый: {old_path}")
-                    print(f"   Новый:  {new_path}")
-                else:
-                    print(f"⚠️  Файл не найден для документа ID {doc.id}: {new_path}")
-            else:
-                # Путь уже абсолютный, проверяем существование файла
-                if not Path(old_path).exists():
-                    print(f"⚠️  Файл не найден для документа ID {doc.id}: {old_path}")
+            doc.file_path = key
+            doc.review_path = await move_derivative(doc.review_path, derivative_key(key, REVIEW_SUFFIX))
+            doc.thumbnail_path = await move_derivative(doc.thumbnail_path, derivative_key(key, THUMBNAIL_SUFFIX))
+            # Коммитим по одному документу: файл уже перенесен
+            await session.commit()
+            
+            updated_count += 1
+            print(f"✅ Документ ID {doc.id} перенесен{'' if created else ' (такой файл уже был в хранилище)'}:")
+            print(f"   Старый путь: {old_path}")
+            print(f"   Ключ:        {key}")
         
         if updated_count > 0:
-            await session.commit()
             print(f"\n✅ Обновлено записей: {updated_count}")
         else:
             print(f"\n✅ Все пути уже корректны")
@@ -62,7 +116,7 @@ async def fix_document_paths():
 
 async def main():
     """Главная функция"""
-    print("🔧 Исправление путей к документам в базе данных...\n")
+    print("🔧 Перенос документов в хранилище...\n")
     try:
         await fix_document_paths()
         print("\n✅ Готово!")
@@ -70,8 +124,9 @@ async def main():
         print(f"\n❌ Ошибка: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await close_blob_storage()
 
 
 if __name__ == "__main__":
     asyncio.run(main())
-
@@ -1,5 +1,7 @@
 -- SQL скрипт для обновления относительных путей к документам на абсолютные
 -- Используйте этот скрипт, если документы были сохранены с относительными путями
+-- УСТАРЕЛ: документы теперь хранятся по ключам (services/document_storage.py),
+-- для переноса старых путей используйте scripts/fix_document_paths.py
 
 -- Сначала посмотрим, какие пути есть в базе
 SELECT id, user_id, document_type, file_path 
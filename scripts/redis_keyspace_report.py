@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Отчет о занятой памяти Redis по шаблонам ключей.
+
+Проходит keyspace через SCAN (без KEYS и без блокировки Redis), группирует
+ключи по шаблону (числа заменяются на *: fsm:*:*:data,
+registration:*, в Redis Cluster - fsm:{*:*}:data, registration:{*}) и для каждого шаблона выводит количество ключей, суммарный
+и p95 размер (по выборке MEMORY USAGE) и распределение TTL.
+Ключи без TTL в шаблонах fsm:* и registration:* - признак утечки.
+
+Использование:
+    python scripts/redis_keyspace_report.py                  # отчет по REDIS_URL
+    python scripts/redis_keyspace_report.py --sample 0.1     # MEMORY USAGE для 10% ключей
+    python scripts/redis_keyspace_report.py --match 'fsm:*'  # только FSM-ключи
+    python scripts/redis_keyspace_report.py --json           # отчет в JSON
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bot.utils.redis_client import create_redis_client
+
+
+# Сколько ключей запрашивать за один SCAN и обрабатывать одним pipeline
+SCAN_BATCH_SIZE = 1000
+
+# Максимум замеров размера на шаблон (reservoir sampling)
+MAX_SAMPLES_PER_PATTERN = 10000
+
+# Интервалы распределения TTL: (название, верхняя граница в секундах)
+TTL_BUCKETS = [
+    ("<1h", 3600),
+    ("1h-24h", 86400),
+    ("1d-7d", 7 * 86400),
+    (">7d", None),
+]
+NO_TTL_BUCKET = "no_ttl"
+
+
+# Число, стоящее отдельной частью ключа (id пользователя, чата), в т.ч. внутри {...}
+NUMBER_PATTERN = re.compile(r"(?<![\w-])-?\d+(?![\w-])")
+
+
+def key_pattern(key: str) -> str:
+    """Шаблон ключа: числовые части (id пользователей, чатов) заменяются на *"""
+    return NUMBER_PATTERN.sub("*", key)
+
+
+def ttl_bucket(ttl: int) -> str:
+    """Интервал распределения TTL для значения команды TTL"""
+    if ttl < 0:
+        return NO_TTL_BUCKET
+    for name, limit in TTL_BUCKETS:
+        if limit is None or ttl < limit:
+            return name
+    return TTL_BUCKETS[-1][0]
+
+
+def percentile(values: List[int], percent: float) -> int:
+    """Перцентиль (ближайший ранг) для непустого списка"""
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+class PatternStats:
+    """Статистика по одному шаблону ключей"""
+    
+    def __init__(self):
+        self.count = 0
+        self.sampled = 0
+        self.samples: List[int] = []
+        self.ttl = {NO_TTL_BUCKET: 0, **{name: 0 for name, _ in TTL_BUCKETS}}
+    
+    def add_sample(self, size: int) -> None:
+        """Добавить замер размера (reservoir sampling, чтобы не расти без предела)"""
+        self.sampled += 1
+        if len(self.samples) < MAX_SAMPLES_PER_PATTERN:
+            self.samples.append(size)
+        else:
+            index = random.randrange(self.sampled)
+            if index < MAX_SAMPLES_PER_PATTERN:
+                self.samples[index] = size
+    
+    def to_dict(self) -> dict:
+        """Итоги по шаблону; общий размер экстраполируется по выборке"""
+        mean = sum(self.samples) / len(self.samples) if self.samples else 0
+        return {
+            "count": self.count,
+            "sampled": self.sampled,
+            "total_bytes": int(mean * self.count),
+            "avg_bytes": int(mean),
+            "p95_bytes": percentile(self.samples, 95) if self.samples else 0,
+            "max_sampled_bytes": max(self.samples) if self.samples else 0,
+            "ttl": self.ttl,
+        }
+
+
+async def analyze(client, match: str, sample_rate: float) -> Dict[str, dict]:
+    """
+    Пройти keyspace и собрать статистику по шаблонам
+    
+    Args:
+        client: Клиент Redis
+        match: Шаблон SCAN MATCH
+        sample_rate: Доля ключей, для которых запрашивается MEMORY USAGE
+    
+    Returns:
+        Словарь {шаблон: статистика}, отсортированный по суммарному размеру
+    """
+    stats: Dict[str, PatternStats] = {}
+    batch: List[str] = []
+    
+    async def process(keys: List[str]) -> None:
+        sampled = [random.random() < sample_rate for _ in keys]
+        async with client.pipeline(transaction=False) as pipe:
+            for key, sample in zip(keys, sampled):
+                pipe.ttl(key)
+                if sample:
+                    pipe.memory_usage(key)
+            results = iter(await pipe.execute(raise_on_error=False))
+        
+        for key, sample in zip(keys, sampled):
+            ttl = next(results)
+            size = next(results) if sample else None
+            if isinstance(ttl, Exception) or ttl == -2:
+                # Ключ истек между SCAN и TTL
+                continue
+            
+            pattern_stats = stats.setdefault(key_pattern(key), PatternStats())
+            pattern_stats.count += 1
+            pattern_stats.ttl[ttl_bucket(ttl)] += 1
+            if isinstance(size, int):
+                pattern_stats.add_sample(size)
+    
+    async for key in client.scan_iter(match=match, count=SCAN_BATCH_SIZE):
+        batch.append(key.decode() if isinstance(key, bytes) else key)
+        if len(batch) >= SCAN_BATCH_SIZE:
+            await process(batch)
+            batch = []
+    if batch:
+        await process(batch)
+    
+    report = {pattern: item.to_dict() for pattern, item in stats.items()}
+    return dict(sorted(report.items(), key=lambda item: item[1]["total_bytes"], reverse=True))
+
+
+def format_bytes(size: int) -> str:
+    """Человекочитаемый размер"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def print_report(report: Dict[str, dict], used_memory: int) -> None:
+    """Вывести отчет таблицей"""
+    buckets = [NO_TTL_BUCKET] + [name for name, _ in TTL_BUCKETS]
+    
+    print(f"{'Шаблон':<40} {'Ключей':>8} {'Всего':>10} {'p95':>9}  " + " ".join(f"{b:>7}" for b in buckets))
+    print("-" * (72 + 8 * len(buckets)))
+    
+    total_keys = 0
+    total_bytes = 0
+    for pattern, item in report.items():
+        total_keys += item["count"]
+        total_bytes += item["total_bytes"]
+        print(
+            f"{pattern:<40} {item['count']:>8} {format_bytes(item['total_bytes']):>10} "
+            f"{format_bytes(item['p95_bytes']):>9}  "
+            + " ".join(f"{item['ttl'][b]:>7}" for b in buckets)
+        )
+    
+    print("-" * (72 + 8 * len(buckets)))
+    print(f"{'Итого':<40} {total_keys:>8} {format_bytes(total_bytes):>10}")
+    print(f"\n📊 used_memory Redis: {format_bytes(used_memory)}")
+    
+    leaks = [
+        pattern for pattern, item in report.items()
+        if item["ttl"][NO_TTL_BUCKET] and pattern.startswith(("fsm:", "registration:"))
+    ]
+    for pattern in leaks:
+        print(f"⚠️  {pattern}: {report[pattern]['ttl'][NO_TTL_BUCKET]} ключей без TTL")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Отчет о памяти Redis по шаблонам ключей")
+    parser.add_argument("--match", default="*", help="Шаблон SCAN MATCH")
+    parser.add_argument("--sample", type=float, default=1.0, help="Доля ключей для MEMORY USAGE (0..1)")
+    parser.add_argument("--json", action="store_true", help="Вывести отчет в JSON")
+    args = parser.parse_args()
+    
+    # Подключение по REDIS_URL / REDIS_MODE, как у бота (в т.ч. Sentinel и Cluster)
+    client = create_redis_client("report", 4)
+    try:
+        report = await analyze(client, args.match, args.sample)
+        info = await client.info("memory")
+    finally:
+        await client.aclose(close_connection_pool=True)
+    
+    # Redis Cluster возвращает INFO по каждому узлу
+    if "used_memory" in info:
+        used_memory = info["used_memory"]
+    else:
+        used_memory = sum(node.get("used_memory", 0) for node in info.values() if isinstance(node, dict))
+    
+    if args.json:
+        print(json.dumps({"used_memory": used_memory, "patterns": report}, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, used_memory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,347 @@
+"""
+Хранилище файлов (blob storage) с подключаемыми драйверами.
+
+Драйвер выбирается настройкой STORAGE_BACKEND:
+    local - файлы в директории загрузок (UPLOAD_PATH) на диске бота
+    s3    - S3-совместимое хранилище (AWS S3, MinIO и т.п.), нужен
+            aiobotocore. Файлы не привязаны к диску, поэтому можно
+            запускать несколько реплик бота.
+
+Файл адресуется ключом - относительным путем вида "3f/a2/3fa2...9c.jpg"
+(см. services/document_storage.py). Запись идет из локального файла:
+put переносит его в хранилище (в S3 - частями, большие файлы через
+multipart upload). Чтение - целиком (get) или потоково (stream).
+
+Для отправки файла в Telegram input_file возвращает то, что можно
+передать в answer_photo: локальный файл, потоковое чтение из хранилища
+или presigned URL (S3_PRESIGNED_URLS=true - только если хранилище
+доступно из интернета: по ссылке файл скачивает сам Telegram).
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncGenerator, AsyncIterator, Iterable, List, Optional, Union
+
+from aiogram.types import FSInputFile, InputFile
+
+
+# Размер части при потоковом чтении
+CHUNK_SIZE = 64 * 1024
+
+# Файлы больше этого размера загружаются в S3 частями (multipart upload)
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    """Файл в хранилище"""
+    key: str
+    size: int
+    modified_at: datetime
+
+
+class BlobInputFile(InputFile):
+    """Файл для отправки в Telegram, читаемый из хранилища потоково"""
+    
+    def __init__(self, storage: "BlobStorage", key: str, chunk_size: int = CHUNK_SIZE):
+        super().__init__(filename=key.rsplit("/", 1)[-1], chunk_size=chunk_size)
+        self.storage = storage
+        self.key = key
+    
+    async def read(self, bot) -> AsyncGenerator[bytes, None]:
+        async for chunk in self.storage.stream(self.key, self.chunk_size):
+            yield chunk
+
+
+class BlobStorage(ABC):
+    """Интерфейс хранилища файлов"""
+    
+    @abstractmethod
+    async def put(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        """
+        Перенести локальный файл в хранилище
+        
+        Args:
+            key: Ключ файла
+            source: Путь к локальному файлу (после вызова файла на этом месте нет)
+            content_type: MIME-тип содержимого
+        """
+    
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        """Прочитать файл целиком"""
+    
+    @abstractmethod
+    def stream(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Читать файл частями"""
+    
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Удалить файл (если его нет - ничего не делать)"""
+    
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Есть ли файл в хранилище"""
+    
+    @abstractmethod
+    def list(self, prefix: str = "") -> AsyncIterator[BlobInfo]:
+        """Перебрать файлы, ключ которых начинается с prefix"""
+    
+    @abstractmethod
+    async def touch(self, key: str) -> None:
+        """Обновить время изменения файла"""
+    
+    async def input_file(self, key: str) -> Union[InputFile, str]:
+        """Получить файл для отправки в Telegram"""
+        return BlobInputFile(self, key)
+    
+    async def close(self) -> None:
+        """Освободить ресурсы драйвера"""
+
+
+class LocalBlobStorage(BlobStorage):
+    """Файлы в директории на локальном диске"""
+    
+    def __init__(self, root: Path, ignored_dirs: Iterable[str] = ()):
+        """
+        Args:
+            root: Корневая директория
+            ignored_dirs: Поддиректории корня, которые не входят в хранилище
+                (не перечисляются в list)
+        """
+        self.root = root
+        self.ignored_dirs = set(ignored_dirs)
+    
+    def path(self, key: str) -> Path:
+        """Получить путь к файлу (абсолютные пути из старых записей - как есть)"""
+        if os.path.isabs(key):
+            return Path(key)
+        return self.root / key
+    
+    def _put(self, key: str, source: Path) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Переименование в пределах одной файловой системы атомарно
+        os.replace(source, path)
+    
+    async def put(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        await asyncio.to_thread(self._put, key, source)
+    
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.path(key).read_bytes)
+    
+    async def stream(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, self.path(key), "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, chunk_size):
+                yield chunk
+        finally:
+            f.close()
+    
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.path(key).unlink, missing_ok=True)
+    
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).is_file)
+    
+    def _list(self, prefix: str) -> List[BlobInfo]:
+        blobs = []
+        for directory, subdirs, files in os.walk(self.root):
+            if directory == str(self.root):
+                subdirs[:] = [name for name in subdirs if name not in self.ignored_dirs]
+            
+            for name in files:
+                # Пропускаем .gitkeep и другие служебные файлы
+                if name.startswith("."):
+                    continue
+                
+                path = Path(directory) / name
+                key = path.relative_to(self.root).as_posix()
+                if not key.startswith(prefix):
+                    continue
+                
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                blobs.append(BlobInfo(
+                    key=key,
+                    size=stat.st_size,
+                    modified_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+                ))
+        return blobs
+    
+    async def list(self, prefix: str = "") -> AsyncIterator[BlobInfo]:
+        for blob in await asyncio.to_thread(self._list, prefix):
+            yield blob
+    
+    async def touch(self, key: str) -> None:
+        await asyncio.to_thread(os.utime, self.path(key))
+    
+    async def input_file(self, key: str) -> Union[InputFile, str]:
+        return FSInputFile(self.path(key))
+
+
+class S3BlobStorage(BlobStorage):
+    """Файлы в S3-совместимом хранилище (нужен aiobotocore)"""
+    
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        presigned_urls: bool = False,
+        presign_ttl: int = 300
+    ):
+        """
+        Args:
+            bucket: Имя bucket
+            endpoint_url: Адрес S3 API (None - AWS S3; для MinIO: http://minio:9000)
+            region: Регион
+            access_key: Ключ доступа
+            secret_key: Секретный ключ
+            presigned_urls: Отдавать в Telegram presigned URL вместо потокового чтения
+            presign_ttl: Время жизни presigned URL (секунды)
+        """
+        try:
+            from aiobotocore.session import get_session
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires aiobotocore (pip install aiobotocore)") from e
+        
+        self.bucket = bucket
+        self.presigned_urls = presigned_urls
+        self.presign_ttl = presign_ttl
+        self._client_error = ClientError
+        self._session = get_session()
+        self._client_options = {
+            "endpoint_url": endpoint_url or None,
+            "region_name": region or None,
+            "aws_access_key_id": access_key or None,
+            "aws_secret_access_key": secret_key or None,
+        }
+        self._client_context = None
+        self._client = None
+        self._lock = asyncio.Lock()
+    
+    async def _get_client(self):
+        """Получить клиент S3 (создается при первом обращении)"""
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    self._client_context = self._session.create_client("s3", **self._client_options)
+                    self._client = await self._client_context.__aenter__()
+        return self._client
+    
+    async def put(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        client = await self._get_client()
+        extra = {"ContentType": content_type} if content_type else {}
+        
+        if source.stat().st_size <= MULTIPART_THRESHOLD:
+            body = await asyncio.to_thread(source.read_bytes)
+            await client.put_object(Bucket=self.bucket, Key=key, Body=body, **extra)
+        else:
+            await self._put_multipart(client, key, source, extra)
+        
+        source.unlink()
+    
+    async def _put_multipart(self, client, key: str, source: Path, extra: dict) -> None:
+        """Загрузить файл частями: в памяти не больше одной части"""
+        upload = await client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            with open(source, "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, MULTIPART_PART_SIZE):
+                    part_number = len(parts) + 1
+                    response = await client.upload_part(
+                        Bucket=self.bucket,
+                        Key=key,
+                        UploadId=upload_id,
+                        PartNumber=part_number,
+                        Body=chunk
+                    )
+                    parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+            
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            await client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+    
+    async def get(self, key: str) -> bytes:
+        client = await self._get_client()
+        response = await client.get_object(Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        async with body:
+            return await body.read()
+    
+    async def stream(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        client = await self._get_client()
+        response = await client.get_object(Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        # Контекст закрывает соединение, даже если чтение прервали
+        async with body:
+            while chunk := await body.read(chunk_size):
+                yield chunk
+    
+    async def delete(self, key: str) -> None:
+        client = await self._get_client()
+        await client.delete_object(Bucket=self.bucket, Key=key)
+    
+    async def exists(self, key: str) -> bool:
+        client = await self._get_client()
+        try:
+            await client.head_object(Bucket=self.bucket, Key=key)
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+    
+    async def list(self, prefix: str = "") -> AsyncIterator[BlobInfo]:
+        client = await self._get_client()
+        paginator = client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield BlobInfo(key=item["Key"], size=item["Size"], modified_at=item["LastModified"])
+    
+    async def touch(self, key: str) -> None:
+        # Копирование объекта в себя с заменой метаданных обновляет LastModified
+        client = await self._get_client()
+        head = await client.head_object(Bucket=self.bucket, Key=key)
+        extra = {"ContentType": head["ContentType"]} if head.get("ContentType") else {}
+        await client.copy_object(
+            Bucket=self.bucket,
+            Key=key,
+            CopySource={"Bucket": self.bucket, "Key": key},
+            MetadataDirective="REPLACE",
+            **extra
+        )
+    
+    async def input_file(self, key: str) -> Union[InputFile, str]:
+        if not self.presigned_urls:
+            return BlobInputFile(self, key)
+        
+        client = await self._get_client()
+        return await client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presign_ttl
+        )
+    
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client_context.__aexit__(None, None, None)
+            self._client = None
+            self._client_context = None
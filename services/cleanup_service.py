@@ -1,33 +1,29 @@
 """
 Сервис для очистки orphaned файлов (файлы без записей в БД).
 Запускается периодически как background задача.
+Orphaned файлы ищутся в хранилище документов (локальном или S3),
+временные файлы - в директории загрузок на диске.
 """
-import os
 import asyncio
-from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Set
 
 from sqlalchemy import select
 from database.base import async_session_factory
 from database.models.document import Document
-from config.settings import settings
+from services.document_storage import (
+    STAGING_DIR_NAME,
+    get_blob_storage,
+    get_upload_dir,
+    normalize_key,
+)
 
 
 class CleanupService:
     """Сервис для очистки временных и orphaned файлов"""
     
     def __init__(self):
-        self.upload_dir = self._get_upload_dir()
-    
-    def _get_upload_dir(self) -> Path:
-        """Получить абсолютный путь к директории загрузок"""
-        if os.path.isabs(settings.upload_path):
-            return Path(settings.upload_path)
-        else:
-            # Получаем абсолютный путь от корня проекта
-            project_root = Path(__file__).parent.parent
-            return project_root / settings.upload_path
+        self.upload_dir = get_upload_dir()
     
     async def cleanup_orphaned_files(self, max_age_hours: int = 48) -> dict:
         """
@@ -45,54 +41,46 @@ class CleanupService:
         print(f"🧹 Starting cleanup of orphaned files (age > {max_age_hours}h)")
         print(f"{'='*60}")
         
-        if not self.upload_dir.exists():
-            print(f"⚠️  Upload directory does not exist: {self.upload_dir}")
-            return {"deleted": 0, "errors": 0, "kept": 0}
-        
-        # Получаем список всех файлов в БД
+        # Получаем список всех файлов в БД (оригиналы и копии для просмотра)
         async with async_session_factory() as session:
-            result = await session.execute(select(Document.file_path))
-            db_files = {Path(row[0]) for row in result.all()}
+            result = await session.execute(
+                select(Document.file_path, Document.review_path, Document.thumbnail_path)
+            )
+            db_files: Set[str] = {
+                normalize_key(key) for row in result.all() for key in row if key
+            }
         
         print(f"📊 Files in database: {len(db_files)}")
         
-        # Проверяем все файлы в директории uploads
+        # Проверяем все файлы хранилища
+        storage = get_blob_storage()
         deleted = 0
         errors = 0
         kept = 0
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+        now = datetime.now(timezone.utc)
+        cutoff_time = now - timedelta(hours=max_age_hours)
         
-        for file_path in self.upload_dir.glob("*"):
-            if not file_path.is_file():
-                continue
-            
-            # Пропускаем .gitkeep и другие служебные файлы
-            if file_path.name.startswith("."):
-                continue
-            
-            file_absolute = file_path.absolute()
-            
-            # Проверяем, есть ли файл в БД
-            if file_absolute in db_files or str(file_absolute) in {str(f) for f in db_files}:
+        async for blob in storage.list():
+            # Проверяем, есть ли файл в БД (один файл может принадлежать
+            # нескольким документам - хранилище не держит дубликатов)
+            if blob.key in db_files:
                 kept += 1
                 continue
             
             # Файл не в БД - проверяем возраст
             try:
-                file_mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
-                
-                if file_mtime < cutoff_time:
+                if blob.modified_at < cutoff_time:
                     # Файл старше cutoff_time - удаляем
-                    file_path.unlink()
-                    print(f"🗑️  Deleted orphaned file: {file_path.name} (age: {datetime.now() - file_mtime})")
+                    await storage.delete(blob.key)
+                    print(f"🗑️  Deleted orphaned file: {blob.key} (age: {now - blob.modified_at})")
                     deleted += 1
                 else:
                     # Файл новый - оставляем (возможно, регистрация еще не завершена)
-                    print(f"⏳ Kept recent orphaned file: {file_path.name} (age: {datetime.now() - file_mtime})")
+                    print(f"⏳ Kept recent orphaned file: {blob.key} (age: {now - blob.modified_at})")
                     kept += 1
                     
             except Exception as e:
-                print(f"❌ Error processing file {file_path.name}: {e}")
+                print(f"❌ Error processing file {blob.key}: {e}")
                 errors += 1
         
         stats = {"deleted": deleted, "errors": errors, "kept": kept}
@@ -108,7 +96,8 @@ class CleanupService:
     async def cleanup_old_temp_files(self, hours: int = 24) -> int:
         """
         Удалить временные файлы старше заданного времени.
-        Временные файлы имеют префикс temp_ или _temp.
+        Временные файлы имеют префикс temp_ или _temp, а также лежат
+        в директории staging (документы незавершенных регистраций).
         
         Args:
             hours: Возраст файлов в часах
@@ -122,7 +111,7 @@ class CleanupService:
         deleted = 0
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
-        for pattern in ["temp_*", "*_temp.*"]:
+        for pattern in ["temp_*", "*_temp.*", f"{STAGING_DIR_NAME}/*"]:
             for file_path in self.upload_dir.glob(pattern):
                 if not file_path.is_file():
                     continue
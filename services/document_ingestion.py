@@ -0,0 +1,575 @@
+"""
+Фоновая загрузка документов из Telegram (очередь в Redis).
+
+Регистрация только создает строки Document с telegram_file_id и пустым
+file_path и ставит задания в очередь - пользователь сразу получает
+подтверждение. Воркеры забирают задания, скачивают файлы и заполняют
+file_path; администраторы видят документ, как только он загружен.
+
+Ключи очереди (в Redis Cluster - с hash tag {document_ingest}, чтобы
+Lua-скрипты работали с несколькими ключами):
+    document_ingest:queue                  - list, задания в ожидании (LPUSH / LMOVE RIGHT)
+    document_ingest:processing:<replica>   - list, задания в работе у реплики
+    document_ingest:heartbeat:<replica>    - string с TTL, реплика жива
+    document_ingest:replicas               - set, реплики, у которых может быть processing
+    document_ingest:delayed                - zset, повторы (score - время запуска)
+    document_ingest:failed                 - list, задания, исчерпавшие попытки
+Задание - JSON {"document_id": ..., "attempts": ...}.
+
+Файлы сохраняются в хранилище с адресацией по содержимому
+(services/document_storage.py), в БД записываются ключи файлов.
+Для фото дополнительно готовятся копия для просмотра и миниатюра
+(services/image_processing.py) - из скачанного файла, до переноса
+в хранилище, поэтому при хранении в S3 файл не скачивается обратно.
+
+Заодно оценивается качество фото (размытость, яркость, разрешение) -
+оценка записывается в Document. Если фото плохое, пользователь сразу
+получает просьбу переснять его, не дожидаясь проверки администратором.
+
+Задание удаляется из processing только после записи file_path в БД,
+поэтому при падении процесса оно не теряется. У каждого запуска реплики
+(<hostname>:<случайный id>) свой список processing, и пока реплика работает,
+она продлевает свой heartbeat. Id новый при каждом запуске: в контейнере
+PID всегда 1, а hostname после перезапуска прежний, и с тем же id свежий
+heartbeat навсегда скрыл бы задания, прерванные падением. Задания возвращаются в очередь только из
+списков реплик, heartbeat которых истек, - при запуске и периодически,
+так что задания работающих реплик не выполняются повторно. Если задание
+все же выполнится дважды (реплика зависла дольше HEARTBEAT_TTL), это
+безопасно: файл с тем же содержимым получает тот же ключ.
+"""
+import asyncio
+import socket
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from aiogram import Bot
+from redis.asyncio import Redis
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import selectinload
+
+from config.settings import settings
+from database.base import async_session_factory
+from database.models.document import Document
+from bot.utils import serialization
+from bot.keyboards.common import get_document_retake_keyboard
+from bot.utils.redis_client import hash_tag
+from bot.utils.translations import get_text
+from services.document_storage import (
+    REVIEW_SUFFIX,
+    THUMBNAIL_SUFFIX,
+    derivative_key,
+    get_blob_storage,
+    store_file,
+)
+from services.file_download import FileRejectedError
+from services.image_processing import ImageQuality, check_quality, create_derivatives
+from services.registration_service import RegistrationService, StagedDocument
+
+
+# Пауза, если очередь пуста (секунды)
+POLL_INTERVAL = 1
+
+# Максимальная задержка перед повтором (секунды)
+MAX_RETRY_DELAY = 300
+
+# Сколько отложенных заданий переносить в очередь за один вызов
+PROMOTE_BATCH = 100
+
+# Интервал сверки БД с очередью (секунды)
+SWEEP_INTERVAL = 600
+
+# Как часто реплика продлевает heartbeat и проверяет, не остановились ли другие (секунды)
+HEARTBEAT_INTERVAL = 10
+
+# Через сколько секунд без heartbeat реплика считается остановленной
+HEARTBEAT_TTL = 60
+
+# Вернуть задание из processing в отложенные.
+# KEYS[1] - processing, KEYS[2] - delayed; ARGV[1] - задание, ARGV[2] - новое задание, ARGV[3] - время запуска
+RETRY_SCRIPT = """
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+"""
+
+# Перенести задание из processing в failed.
+# KEYS[1] - processing, KEYS[2] - failed; ARGV[1] - задание, ARGV[2] - задание с ошибкой
+FAIL_SCRIPT = """
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+redis.call('LPUSH', KEYS[2], ARGV[2])
+"""
+
+# Перенести наступившие отложенные задания в очередь.
+# KEYS[1] - delayed, KEYS[2] - queue; ARGV[1] - текущее время, ARGV[2] - максимум заданий
+PROMOTE_SCRIPT = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('LPUSH', KEYS[2], job)
+end
+return #jobs
+"""
+
+# Вернуть задания остановленной реплики в очередь (если heartbeat все еще нет).
+# KEYS[1] - heartbeat, KEYS[2] - processing, KEYS[3] - queue, KEYS[4] - replicas; ARGV[1] - реплика
+RECOVER_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return -1
+end
+local count = 0
+while redis.call('RPOPLPUSH', KEYS[2], KEYS[3]) do
+    count = count + 1
+end
+redis.call('SREM', KEYS[4], ARGV[1])
+return count
+"""
+
+
+class DocumentIngestionQueue:
+    """Очередь заданий на загрузку документов в Redis"""
+    
+    def __init__(
+        self,
+        redis: Redis,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[int] = None,
+        replica: Optional[str] = None
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            max_attempts: Максимальное количество попыток (по умолчанию из настроек)
+            retry_delay: Базовая задержка повтора в секундах (удваивается с каждой попыткой)
+            replica: Имя реплики (по умолчанию <hostname>:<случайный id>)
+        """
+        self.redis = redis
+        self.max_attempts = max_attempts or settings.document_ingest_max_attempts
+        self.retry_delay = retry_delay or settings.document_ingest_retry_delay
+        self.replica = replica or f"{socket.gethostname()}:{uuid4().hex[:12]}"
+        
+        prefix = hash_tag("document_ingest")
+        self.prefix = prefix
+        self.queue_key = f"{prefix}:queue"
+        self.processing_key = self._processing_key(self.replica)
+        self.heartbeat_key = self._heartbeat_key(self.replica)
+        self.replicas_key = f"{prefix}:replicas"
+        self.delayed_key = f"{prefix}:delayed"
+        self.failed_key = f"{prefix}:failed"
+        
+        self._retry_script = redis.register_script(RETRY_SCRIPT)
+        self._fail_script = redis.register_script(FAIL_SCRIPT)
+        self._promote_script = redis.register_script(PROMOTE_SCRIPT)
+        self._recover_script = redis.register_script(RECOVER_SCRIPT)
+    
+    def _processing_key(self, replica: str) -> str:
+        return f"{self.prefix}:processing:{replica}"
+    
+    def _heartbeat_key(self, replica: str) -> str:
+        return f"{self.prefix}:heartbeat:{replica}"
+    
+    async def heartbeat(self) -> None:
+        """Отметить реплику живой (до первого вызова reserve и затем периодически)"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(self.heartbeat_key, int(time.time()), ex=HEARTBEAT_TTL)
+        pipe.sadd(self.replicas_key, self.replica)
+        await pipe.execute()
+    
+    async def enqueue(self, document_ids: Iterable[int]) -> None:
+        """Поставить документы в очередь на загрузку"""
+        jobs = [serialization.dumps({"document_id": doc_id, "attempts": 0}) for doc_id in document_ids]
+        if jobs:
+            await self.redis.lpush(self.queue_key, *jobs)
+    
+    async def reserve(self) -> Optional[bytes]:
+        """Забрать задание из очереди в processing (None, если очередь пуста)"""
+        return await self.redis.lmove(self.queue_key, self.processing_key, "RIGHT", "LEFT")
+    
+    async def ack(self, raw_job: bytes) -> None:
+        """Задание выполнено"""
+        await self.redis.lrem(self.processing_key, 1, raw_job)
+    
+    async def fail(self, raw_job: bytes, error: Exception, job: Optional[dict] = None) -> None:
+        """Перенести задание из processing в failed без повторов"""
+        job = job or serialization.loads(raw_job)
+        job["error"] = str(error)[:500]
+        await self._fail_script(
+            keys=[self.processing_key, self.failed_key],
+            args=[raw_job, serialization.dumps(job)]
+        )
+    
+    async def retry_or_fail(self, raw_job: bytes, error: Exception) -> bool:
+        """
+        Отложить задание для повтора или, если попытки исчерпаны, перенести в failed
+        
+        Returns:
+            True, если задание будет повторено
+        """
+        job = serialization.loads(raw_job)
+        job["attempts"] += 1
+        
+        if job["attempts"] >= self.max_attempts:
+            await self.fail(raw_job, error, job)
+            return False
+        
+        delay = min(self.retry_delay * 2 ** (job["attempts"] - 1), MAX_RETRY_DELAY)
+        await self._retry_script(
+            keys=[self.processing_key, self.delayed_key],
+            args=[raw_job, serialization.dumps(job), time.time() + delay]
+        )
+        return True
+    
+    async def promote_delayed(self) -> int:
+        """Перенести отложенные задания, время которых наступило, в очередь"""
+        return await self._promote_script(
+            keys=[self.delayed_key, self.queue_key],
+            args=[time.time(), PROMOTE_BATCH]
+        )
+    
+    async def _replicas(self) -> List[str]:
+        return [
+            replica.decode() if isinstance(replica, bytes) else replica
+            for replica in await self.redis.smembers(self.replicas_key)
+        ]
+    
+    async def recover(self) -> int:
+        """Вернуть в очередь задания реплик, которые остановились (heartbeat истек)"""
+        recovered = 0
+        for replica in await self._replicas():
+            count = await self._recover_script(
+                keys=[
+                    self._heartbeat_key(replica),
+                    self._processing_key(replica),
+                    self.queue_key,
+                    self.replicas_key
+                ],
+                args=[replica]
+            )
+            if count > 0:
+                print(f"📥 Recovered {count} ingestion jobs of stopped replica {replica}")
+                recovered += count
+        return recovered
+    
+    async def known_document_ids(self) -> Set[int]:
+        """id документов во всех списках очереди (включая failed)"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrange(self.queue_key, 0, -1)
+        for replica in await self._replicas():
+            pipe.lrange(self._processing_key(replica), 0, -1)
+        pipe.zrange(self.delayed_key, 0, -1)
+        pipe.lrange(self.failed_key, 0, -1)
+        
+        document_ids = set()
+        for jobs in await pipe.execute():
+            for raw_job in jobs:
+                document_ids.add(serialization.loads(raw_job)["document_id"])
+        return document_ids
+
+
+async def _store_derivatives(staged: StagedDocument) -> Tuple[Optional[Tuple[str, str]], Optional[ImageQuality]]:
+    """
+    Подготовить копии для просмотра из скачанного файла, перенести их
+    в хранилище и оценить качество фото
+    
+    Returns:
+        ((ключ копии для просмотра, ключ миниатюры), оценка качества) или
+        (None, None), если формат не поддерживается
+    """
+    review_key = derivative_key(staged.key, REVIEW_SUFFIX)
+    thumbnail_key = derivative_key(staged.key, THUMBNAIL_SUFFIX)
+    
+    # Тот же файл уже загружали - копии есть, повторно не считаем
+    storage = get_blob_storage()
+    if await storage.exists(review_key) and await storage.exists(thumbnail_key):
+        await storage.touch(review_key)
+        await storage.touch(thumbnail_key)
+        return (review_key, thumbnail_key), await check_quality(staged.staged_path)
+    
+    derivatives = await create_derivatives(staged.staged_path)
+    if derivatives is None:
+        return None, None
+    
+    await store_file(derivatives.review_path, review_key, "image/jpeg")
+    await store_file(derivatives.thumbnail_path, thumbnail_key, "image/jpeg")
+    return (review_key, thumbnail_key), derivatives.quality
+
+
+async def _discard_stored_files(keys: List[str]) -> None:
+    """Удалить из хранилища файлы, на которые не ссылается ни один документ"""
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(Document.file_path, Document.review_path, Document.thumbnail_path)
+            .where(or_(
+                Document.file_path.in_(keys),
+                Document.review_path.in_(keys),
+                Document.thumbnail_path.in_(keys)
+            ))
+        )
+        referenced = {value for row in result for value in row}
+    
+    # Файл с тем же содержимым может принадлежать другому документу
+    storage = get_blob_storage()
+    for key in keys:
+        if key not in referenced:
+            await storage.delete(key)
+
+
+async def _request_retake(bot: Bot, document: Document, issues: List[str]) -> None:
+    """Попросить пользователя переснять фото документа плохого качества"""
+    lang = document.user.language or "ru"
+    problems = "\n".join(f"• {get_text(f'documents.quality_{issue}', lang)}" for issue in issues)
+    
+    try:
+        await bot.send_message(
+            document.user.telegram_id,
+            get_text(
+                "documents.retake_request",
+                lang,
+                doc_name=get_text(f"documents.{document.document_type.value}", lang),
+                problems=problems
+            ),
+            reply_markup=get_document_retake_keyboard(document.id, lang)
+        )
+    except Exception as e:
+        # Документ уже загружен - без уведомления его проверит администратор
+        print(f"⚠️ Failed to request retake of document {document.id}: {e}")
+
+
+async def ingest_document(bot: Bot, document_id: int) -> bool:
+    """
+    Скачать документ из Telegram и записать путь к файлу в БД
+    
+    Args:
+        bot: Экземпляр бота
+        document_id: ID документа
+    
+    Returns:
+        True, если файл загружен; False, если загружать нечего
+        (документ удален, уже загружен или фото заменили во время загрузки)
+    """
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(Document)
+            .options(selectinload(Document.user))
+            .where(Document.id == document_id)
+        )
+        document = result.scalar_one_or_none()
+    
+    if not document or document.is_ingested or not document.telegram_file_id:
+        return False
+    
+    registration_service = RegistrationService(bot)
+    staged_documents = await registration_service.stage_documents(
+        document.user.telegram_id,
+        {document.document_type.value: document.telegram_file_id}
+    )
+    staged = staged_documents[0]
+    
+    try:
+        # Уменьшенные копии без EXIF для просмотра и оценка качества (в пуле
+        # процессов). Без них документ все равно доступен - показывается оригинал
+        derivative_keys, quality = None, None
+        try:
+            derivative_keys, quality = await _store_derivatives(staged)
+        except Exception as e:
+            print(f"⚠️ Failed to prepare review image for document {document_id}: {e}")
+        
+        # Сначала файл, потом запись в БД: если commit не пройдет, файл без
+        # записи удалит cleanup_service, а повтор задания найдет его в хранилище
+        await registration_service.promote_documents(staged_documents)
+    except BaseException:
+        registration_service.discard_documents(staged_documents)
+        raise
+    
+    async with async_session_factory() as session:
+        # Только если документ все еще ждет именно этот файл: пока он
+        # загружался, пользователь мог переснять фото (новый telegram_file_id),
+        # а параллельное задание - уже записать file_path
+        result = await session.execute(
+            update(Document)
+            .where(
+                Document.id == document_id,
+                Document.telegram_file_id == document.telegram_file_id,
+                Document.file_path == ""
+            )
+            .values(
+                file_path=staged.key,
+                original_filename=staged.original_filename,
+                file_size=staged.file_size,
+                review_path=derivative_keys[0] if derivative_keys else None,
+                thumbnail_path=derivative_keys[1] if derivative_keys else None,
+                quality_score=quality.sharpness if quality else None,
+                quality_issues=",".join(quality.issues) if quality else None,
+                # Файл для просмотра изменился - file_id прежней отправки не подходит
+                view_file_id=None
+            )
+        )
+        await session.commit()
+    
+    if not result.rowcount:
+        print(f"ℹ️ Document {document_id} changed during ingestion, discarding downloaded file")
+        await _discard_stored_files([staged.key, *(derivative_keys or ())])
+        return False
+    
+    if quality and quality.issues:
+        await _request_retake(bot, document, quality.issues)
+    
+    return True
+
+
+async def _process_job(bot: Bot, queue: DocumentIngestionQueue, raw_job: bytes) -> None:
+    """Выполнить одно задание"""
+    document_id = serialization.loads(raw_job)["document_id"]
+    
+    try:
+        await ingest_document(bot, document_id)
+    except FileRejectedError as e:
+        # Файл слишком большой или не того типа - повтор не поможет
+        await queue.fail(raw_job, e)
+        print(f"❌ Document {document_id} rejected: {e}")
+        return
+    except Exception as e:
+        if await queue.retry_or_fail(raw_job, e):
+            print(f"⚠️ Document {document_id} ingestion failed, will retry: {e}")
+        else:
+            print(f"❌ Document {document_id} ingestion failed permanently: {e}")
+        return
+    
+    await queue.ack(raw_job)
+
+
+async def _run_worker(bot: Bot, queue: DocumentIngestionQueue, worker_id: int, concurrency: int) -> None:
+    """Воркер: не больше concurrency заданий одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight: Set[asyncio.Task] = set()
+    
+    async def run(raw_job: bytes) -> None:
+        try:
+            await _process_job(bot, queue, raw_job)
+        finally:
+            semaphore.release()
+    
+    try:
+        while True:
+            await semaphore.acquire()
+            try:
+                raw_job = await queue.reserve()
+            except Exception as e:
+                semaphore.release()
+                print(f"❌ Ingestion worker {worker_id} error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            
+            if raw_job is None:
+                semaphore.release()
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            
+            task = asyncio.create_task(run(raw_job))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    finally:
+        # Прерванные задания остаются в processing и вернутся в очередь,
+        # когда истечет heartbeat реплики
+        for task in in_flight:
+            task.cancel()
+
+
+async def _sweep(queue: DocumentIngestionQueue) -> int:
+    """
+    Поставить в очередь незагруженные документы, которых в ней нет
+    (например, если постановка в очередь после регистрации не удалась)
+    """
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(Document.id)
+            .where(Document.file_path == "")
+            .where(Document.telegram_file_id.is_not(None))
+        )
+        pending_ids = set(result.scalars().all())
+    
+    if not pending_ids:
+        return 0
+    
+    missing_ids = pending_ids - await queue.known_document_ids()
+    await queue.enqueue(sorted(missing_ids))
+    return len(missing_ids)
+
+
+async def _run_scheduler(queue: DocumentIngestionQueue) -> None:
+    """
+    Перенос отложенных заданий в очередь, heartbeat реплики, возврат заданий
+    остановленных реплик и периодическая сверка с БД
+    """
+    last_sweep = 0.0
+    last_heartbeat = time.monotonic()
+    
+    while True:
+        try:
+            await queue.promote_delayed()
+            
+            if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                last_heartbeat = time.monotonic()
+                await queue.heartbeat()
+                await queue.recover()
+            
+            if time.monotonic() - last_sweep >= SWEEP_INTERVAL:
+                last_sweep = time.monotonic()
+                requeued = await _sweep(queue)
+                if requeued:
+                    print(f"📥 Requeued {requeued} documents for ingestion")
+        except Exception as e:
+            print(f"❌ Ingestion scheduler error: {e}")
+        
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def run_document_ingestion_workers(bot: Bot, workers: int = 2, concurrency: int = 3):
+    """
+    Запустить воркеры загрузки документов
+    
+    Args:
+        bot: Экземпляр бота
+        workers: Количество воркеров
+        concurrency: Максимум одновременных загрузок на воркер
+    """
+    queue = get_document_ingestion_queue()
+    
+    try:
+        # Без heartbeat задания этой реплики вернула бы в очередь другая реплика
+        await queue.heartbeat()
+        await queue.recover()
+    except Exception as e:
+        print(f"❌ Failed to recover ingestion jobs: {e}")
+    
+    print(f"📥 Document ingestion started ({workers} workers x {concurrency} downloads)")
+    
+    tasks: List[asyncio.Task] = [asyncio.create_task(_run_scheduler(queue))]
+    tasks.extend(
+        asyncio.create_task(_run_worker(bot, queue, worker_id, concurrency))
+        for worker_id in range(workers)
+    )
+    
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Глобальный экземпляр очереди
+_document_ingestion_queue: Optional[DocumentIngestionQueue] = None
+
+
+def init_document_ingestion_queue(redis: Redis) -> DocumentIngestionQueue:
+    """Инициализировать глобальную очередь"""
+    global _document_ingestion_queue
+    _document_ingestion_queue = DocumentIngestionQueue(redis)
+    return _document_ingestion_queue
+
+
+def get_document_ingestion_queue() -> DocumentIngestionQueue:
+    """Получить глобальный экземпляр очереди"""
+    if _document_ingestion_queue is None:
+        raise RuntimeError("DocumentIngestionQueue not initialized. Call init_document_ingestion_queue first.")
+    return _document_ingestion_queue
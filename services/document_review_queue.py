@@ -0,0 +1,329 @@
+"""
+Очередь проверки документов ("следующий на проверке").
+
+Администратор проверяет пользователей по одному, не открывая каждый раз
+список: claim_next отдает самого давнего пользователя, у которого все
+документы загружены и есть документы на проверке, и закрепляет его за
+администратором арендой (lease) на DOCUMENT_REVIEW_LEASE_TTL секунд.
+Пока аренда действует, другие администраторы этого пользователя
+не получают. Следующий вызов claim_next (после решения или пропуска)
+освобождает текущего пользователя.
+
+Ключи (в Redis Cluster - с hash tag {document_review}):
+    document_review:lease:<user_id>     - string, telegram_id администратора (SET NX EX)
+    document_review:cursor:<admin_id>   - hash: current - текущий пользователь,
+                                          next - подготовленный следующий
+    document_review:skipped:<admin_id>  - set, пропущенные администратором пользователи
+
+Пока администратор смотрит текущего пользователя, следующий готовится
+в фоне (prefetch): его документы загружаются из БД и держатся в памяти
+процесса, а фото документов без view_file_id заранее загружаются
+в Telegram - в служебный чат DOCUMENT_REVIEW_WARMUP_CHAT_ID, откуда
+сообщения сразу удаляются (получить file_id без отправки файла нельзя).
+Тогда следующий альбом отправляется по file_id без загрузки файлов.
+После закрепления пользователь все равно перечитывается из БД: за время
+подготовки его могли проверить или он мог переснять фото. Из подготовленных
+данных берутся только file_id тех же копий для просмотра.
+Следующий пользователь при подготовке не закрепляется - его может взять
+другой администратор, тогда подготовленные данные просто не пригодятся.
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from redis.asyncio import Redis
+from sqlalchemy import and_, select
+from sqlalchemy.orm import selectinload
+
+from config.settings import settings
+from database.base import async_session_factory
+from database.models.document import Document, DocumentStatus
+from database.models.user import User, UserRole, UserStatus
+from bot.utils.document_photos import warm_up_file_ids
+from bot.utils.redis_client import hash_tag
+
+
+# Курсор и список пропущенных хранятся, пока администратор работает с очередью
+CURSOR_TTL = 3600
+
+# Сколько кандидатов читать из БД за один запрос
+CANDIDATE_BATCH = 20
+
+# Сколько секунд подготовленные данные пользователя считаются свежими
+PREFETCH_TTL = 120
+
+# Освобождение аренды только ее владельцем
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def load_review_user(user_id: int) -> Optional[User]:
+    """Загрузить пользователя с документами (None, если проверять нечего)"""
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(User)
+            .options(selectinload(User.documents))
+            .where(User.id == user_id)
+        )
+        user = result.scalar_one_or_none()
+    
+    if not user or user.status != UserStatus.PENDING:
+        return None
+    if not all(d.is_ingested for d in user.documents):
+        return None
+    if not any(d.status == DocumentStatus.PENDING for d in user.documents):
+        return None
+    return user
+
+
+async def pending_user_ids(exclude: Iterable[int] = (), limit: int = CANDIDATE_BATCH) -> List[int]:
+    """
+    ID пользователей, готовых к проверке: самые давние - первыми, но
+    пользователи с плохими фото - в конце (их попросили переснять фото,
+    и новое, скорее всего, скоро придет)
+    
+    Args:
+        exclude: Пропустить этих пользователей
+        limit: Максимальное количество
+    """
+    exclude = list(exclude)
+    query = (
+        select(User.id)
+        .where(User.status == UserStatus.PENDING)
+        .where(User.role == UserRole.CLIENT)
+        .where(User.documents.any(Document.status == DocumentStatus.PENDING))
+        # Пока файл не загружен, проверять нечего
+        .where(~User.documents.any(Document.file_path == ""))
+        .order_by(
+            User.documents.any(and_(
+                Document.status == DocumentStatus.PENDING,
+                Document.quality_issues != ""
+            )),
+            User.created_at,
+            User.id
+        )
+        .limit(limit)
+    )
+    if exclude:
+        query = query.where(User.id.not_in(exclude))
+    
+    async with async_session_factory() as session:
+        result = await session.execute(query)
+        return list(result.scalars().all())
+
+
+class DocumentReviewQueue:
+    """Очередь проверки документов с арендой пользователей в Redis"""
+    
+    def __init__(
+        self,
+        redis: Redis,
+        lease_ttl: Optional[int] = None,
+        warmup_chat_id: Optional[int] = None
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            lease_ttl: Время аренды пользователя в секундах (по умолчанию из настроек)
+            warmup_chat_id: Чат для предварительной загрузки фото (0 - не загружать)
+        """
+        self.redis = redis
+        self.lease_ttl = lease_ttl or settings.document_review_lease_ttl
+        self.warmup_chat_id = settings.document_review_warmup_chat_id if warmup_chat_id is None else warmup_chat_id
+        
+        self.prefix = hash_tag("document_review")
+        self._release_script = redis.register_script(RELEASE_SCRIPT)
+        
+        # Подготовленные пользователи: user_id -> (время загрузки, пользователь)
+        self._prefetched: Dict[int, Tuple[float, User]] = {}
+        self._prefetch_tasks: Set[asyncio.Task] = set()
+    
+    def lease_key(self, user_id: int) -> str:
+        return f"{self.prefix}:lease:{user_id}"
+    
+    def cursor_key(self, admin_id: int) -> str:
+        return f"{self.prefix}:cursor:{admin_id}"
+    
+    def skipped_key(self, admin_id: int) -> str:
+        return f"{self.prefix}:skipped:{admin_id}"
+    
+    async def _cursor(self, admin_id: int) -> Dict[str, int]:
+        raw = await self.redis.hgetall(self.cursor_key(admin_id))
+        return {
+            (k.decode() if isinstance(k, bytes) else k): int(v)
+            for k, v in raw.items()
+        }
+    
+    async def _skipped(self, admin_id: int) -> Set[int]:
+        return {int(v) for v in await self.redis.smembers(self.skipped_key(admin_id))}
+    
+    async def acquire(self, user_id: int, admin_id: int) -> bool:
+        """
+        Закрепить пользователя за администратором (или продлить аренду)
+        
+        Returns:
+            bool: False - пользователя проверяет другой администратор
+        """
+        key = self.lease_key(user_id)
+        if await self.redis.set(key, admin_id, nx=True, ex=self.lease_ttl):
+            return True
+        
+        owner = await self.redis.get(key)
+        if owner is not None and int(owner) == admin_id:
+            await self.redis.expire(key, self.lease_ttl)
+            return True
+        return False
+    
+    async def _release_lease(self, user_id: int, admin_id: int) -> None:
+        await self._release_script(keys=[self.lease_key(user_id)], args=[admin_id])
+    
+    async def claim_next(self, admin_id: int, skip: bool = False) -> Optional[User]:
+        """
+        Освободить текущего пользователя администратора и закрепить следующего
+        
+        Args:
+            admin_id: telegram_id администратора
+            skip: Текущий пользователь пропущен - больше его не предлагать
+        
+        Returns:
+            Optional[User]: Пользователь с документами (None - проверять некого)
+        """
+        cursor_key = self.cursor_key(admin_id)
+        cursor = await self._cursor(admin_id)
+        
+        current = cursor.get("current")
+        if current is not None:
+            await self._release_lease(current, admin_id)
+            if skip:
+                await self.redis.sadd(self.skipped_key(admin_id), current)
+                await self.redis.expire(self.skipped_key(admin_id), CURSOR_TTL)
+        
+        excluded = await self._skipped(admin_id)
+        if current is not None:
+            excluded.add(current)
+        
+        # Подготовленный следующий - первым, остальные - из БД
+        candidates = [cursor["next"]] if "next" in cursor else []
+        candidates += await pending_user_ids(exclude=excluded)
+        
+        for user_id in dict.fromkeys(candidates):
+            if user_id in excluded:
+                continue
+            if not await self.acquire(user_id, admin_id):
+                continue
+            
+            prefetched = self._take_prefetched(user_id)
+            user = await load_review_user(user_id)
+            if user is None:
+                # Пока пользователь ждал, его проверили (или он переснимает фото)
+                await self._release_lease(user_id, admin_id)
+                continue
+            if prefetched is not None:
+                self._reuse_file_ids(user, prefetched)
+            
+            await self.redis.delete(cursor_key)
+            await self.redis.hset(cursor_key, "current", user_id)
+            await self.redis.expire(cursor_key, CURSOR_TTL)
+            return user
+        
+        await self.redis.delete(cursor_key)
+        return None
+    
+    async def stop(self, admin_id: int) -> None:
+        """Закончить проверку: освободить текущего пользователя и сбросить курсор"""
+        cursor = await self._cursor(admin_id)
+        if "current" in cursor:
+            await self._release_lease(cursor["current"], admin_id)
+        await self.redis.delete(self.cursor_key(admin_id), self.skipped_key(admin_id))
+    
+    async def reset_skipped(self, admin_id: int) -> None:
+        """Снова предлагать пропущенных пользователей"""
+        await self.redis.delete(self.skipped_key(admin_id))
+    
+    def _take_prefetched(self, user_id: int) -> Optional[User]:
+        entry = self._prefetched.pop(user_id, None)
+        if entry is None:
+            return None
+        
+        loaded_at, user = entry
+        if time.monotonic() - loaded_at > PREFETCH_TTL:
+            return None
+        return user
+    
+    @staticmethod
+    def _reuse_file_ids(user: User, prefetched: User) -> None:
+        """Перенести file_id из подготовленных данных, если файл для просмотра тот же"""
+        warmed = {
+            document.id: document
+            for document in prefetched.documents
+            if document.view_file_id
+        }
+        for document in user.documents:
+            source = warmed.get(document.id)
+            if source is not None and not document.view_file_id and source.view_path == document.view_path:
+                document.view_file_id = source.view_file_id
+    
+    def prefetch(self, bot: Bot, admin_id: int) -> None:
+        """Подготовить в фоне следующего пользователя для администратора"""
+        task = asyncio.create_task(self._prefetch(bot, admin_id))
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+    
+    async def _prefetch(self, bot: Bot, admin_id: int) -> None:
+        try:
+            cursor = await self._cursor(admin_id)
+            excluded = await self._skipped(admin_id)
+            if "current" in cursor:
+                excluded.add(cursor["current"])
+            
+            for user_id in await pending_user_ids(exclude=excluded):
+                # Пользователей, которых уже проверяют, не готовим
+                if await self.redis.exists(self.lease_key(user_id)):
+                    continue
+                
+                user = await load_review_user(user_id)
+                if user is None:
+                    continue
+                
+                self._store_prefetched(user)
+                await self.redis.hset(self.cursor_key(admin_id), "next", user_id)
+                
+                if self.warmup_chat_id:
+                    documents = [d for d in user.documents if d.status == DocumentStatus.PENDING]
+                    await warm_up_file_ids(bot, self.warmup_chat_id, documents)
+                return
+        except Exception as e:
+            # Без подготовки следующий пользователь просто загрузится при переходе
+            print(f"⚠️ Review queue prefetch for admin {admin_id} failed: {e}")
+    
+    def _store_prefetched(self, user: User) -> None:
+        now = time.monotonic()
+        self._prefetched = {
+            user_id: entry
+            for user_id, entry in self._prefetched.items()
+            if now - entry[0] <= PREFETCH_TTL
+        }
+        self._prefetched[user.id] = (now, user)
+
+
+# Глобальный экземпляр
+_document_review_queue: Optional[DocumentReviewQueue] = None
+
+
+def init_document_review_queue(redis: Redis) -> DocumentReviewQueue:
+    """Инициализировать глобальную очередь проверки"""
+    global _document_review_queue
+    _document_review_queue = DocumentReviewQueue(redis)
+    return _document_review_queue
+
+
+def get_document_review_queue() -> DocumentReviewQueue:
+    """Получить глобальный экземпляр очереди проверки"""
+    if _document_review_queue is None:
+        raise RuntimeError("DocumentReviewQueue not initialized. Call init_document_review_queue first.")
+    return _document_review_queue
@@ -0,0 +1,161 @@
+"""
+Хранилище файлов документов с адресацией по содержимому.
+
+Файл хранится под именем SHA-256 своего содержимого в двухуровневом
+дереве (по первым байтам хеша), поэтому в одной директории
+не накапливаются тысячи файлов:
+    3f/a2/3fa2...9c.jpg
+    3f/a2/3fa2...9c_review.jpg   (копии для просмотра - рядом)
+
+В БД записывается ключ ("3f/a2/3fa2...9c.jpg"), а не путь на диске.
+Одинаковые файлы (повторная загрузка того же фото) хранятся один раз.
+
+Сами файлы лежат в хранилище, которое возвращает get_blob_storage
+(services/blob_storage.py: локальная директория загрузок или S3) - через
+него файлы читают обработчики, cleanup_service и скрипты. Директория
+загрузок на диске нужна в любом случае: в ней есть временная директория
+для файлов, еще не перенесенных в хранилище. Абсолютные пути из БД,
+записанные до перехода на ключи, понимает только локальный драйвер
+(перенести их можно скриптом scripts/fix_document_paths.py).
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+from config.settings import settings
+from services.blob_storage import BlobStorage, LocalBlobStorage, S3BlobStorage
+
+
+# Поддиректория загрузок для файлов, еще не перенесенных в хранилище
+STAGING_DIR_NAME = "staging"
+
+# Количество уровней директорий и длина имени директории (в hex-символах)
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+# Суффиксы копий для просмотра (см. services/image_processing.py)
+REVIEW_SUFFIX = "_review.jpg"
+THUMBNAIL_SUFFIX = "_thumb.jpg"
+
+# Размер блока при подсчете хеша файла
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Хранилище (создается при первом использовании)
+_storage: Optional[BlobStorage] = None
+
+
+def get_upload_dir() -> Path:
+    """Получить абсолютный путь к директории загрузок"""
+    if os.path.isabs(settings.upload_path):
+        return Path(settings.upload_path)
+    # Получаем абсолютный путь от корня проекта
+    project_root = Path(__file__).parent.parent
+    return project_root / settings.upload_path
+
+
+def get_staging_dir() -> Path:
+    """Получить абсолютный путь к временной директории загрузок"""
+    return get_upload_dir() / STAGING_DIR_NAME
+
+
+def create_blob_storage() -> BlobStorage:
+    """Создать хранилище по настройке STORAGE_BACKEND"""
+    if settings.storage_backend == "local":
+        return LocalBlobStorage(get_upload_dir(), ignored_dirs=[STAGING_DIR_NAME])
+    elif settings.storage_backend == "s3":
+        return S3BlobStorage(
+            bucket=settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key=settings.s3_access_key,
+            secret_key=settings.s3_secret_key,
+            presigned_urls=settings.s3_presigned_urls,
+            presign_ttl=settings.s3_presign_ttl,
+        )
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {settings.storage_backend}")
+
+
+def get_blob_storage() -> BlobStorage:
+    """Получить хранилище файлов документов"""
+    global _storage
+    if _storage is None:
+        _storage = create_blob_storage()
+    return _storage
+
+
+async def close_blob_storage() -> None:
+    """Закрыть хранилище"""
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
+
+
+def blob_key(digest: str, extension: str) -> str:
+    """
+    Получить ключ файла по хешу содержимого
+    
+    Args:
+        digest: SHA-256 содержимого (hex)
+        extension: Расширение без точки
+    
+    Returns:
+        str: Ключ вида "3f/a2/3fa2...9c.jpg"
+    """
+    shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+    return "/".join(shards + [f"{digest}.{extension}"])
+
+
+def derivative_key(key: str, suffix: str) -> str:
+    """Получить ключ копии для просмотра по ключу оригинала"""
+    return f"{key.rsplit('.', 1)[0]}{suffix}"
+
+
+def normalize_key(value: str) -> str:
+    """
+    Привести значение из БД к ключу хранилища: старый абсолютный путь
+    внутри директории загрузок становится ключом, остальное не меняется
+    """
+    if not os.path.isabs(value):
+        return value
+    try:
+        return Path(value).relative_to(get_upload_dir().absolute()).as_posix()
+    except ValueError:
+        return value
+
+
+def hash_file(path: Path) -> str:
+    """Посчитать SHA-256 файла (hex)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def store_file(source: Path, key: str, content_type: Optional[str] = None) -> bool:
+    """
+    Перенести локальный файл в хранилище
+    
+    Args:
+        source: Путь к файлу (после вызова файла на этом месте нет)
+        key: Ключ файла (для одинакового содержимого - одинаковый)
+        content_type: MIME-тип содержимого
+    
+    Returns:
+        bool: True - файл новый; False - такой файл уже был в хранилище
+            (source удален)
+    """
+    storage = get_blob_storage()
+    
+    if await storage.exists(key):
+        source.unlink()
+        # Обновляем время изменения, чтобы cleanup_service не удалил файл
+        # как старый orphaned, пока запись в БД о новом документе еще не сделана
+        await storage.touch(key)
+        return False
+    
+    await storage.put(key, source, content_type)
+    return True
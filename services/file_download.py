@@ -0,0 +1,178 @@
+"""
+Потоковая загрузка файлов из Telegram на диск.
+
+Файл скачивается частями прямо во временный файл (<имя>.part), поэтому
+потребление памяти не зависит от размера фото. Ограничение max_file_size
+проверяется дважды: по размеру из get_file (до загрузки) и по количеству
+полученных байт (загрузка прерывается, как только лимит превышен).
+Тип содержимого определяется по сигнатуре первых байт, а не по ответу
+Telegram; неподдерживаемые файлы отклоняются. Готовый файл сбрасывается
+на диск (fsync) и атомарно переименовывается в итоговое имя с расширением
+по найденному типу. SHA-256 содержимого считается по ходу загрузки -
+по нему файл сохраняется в хранилище (services/document_storage.py).
+"""
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from aiogram import Bot
+
+
+# Размер части при потоковой загрузке
+CHUNK_SIZE = 64 * 1024
+
+# Таймаут загрузки одного файла (секунды)
+DOWNLOAD_TIMEOUT = 60
+
+# Сколько первых байт нужно для определения типа
+SIGNATURE_SIZE = 16
+
+# Поддерживаемые типы: (MIME, расширение)
+JPEG = ("image/jpeg", "jpg")
+PNG = ("image/png", "png")
+WEBP = ("image/webp", "webp")
+HEIC = ("image/heic", "heic")
+PDF = ("application/pdf", "pdf")
+
+# Бренды контейнера ISO BMFF, означающие HEIC/HEIF
+HEIC_BRANDS = (b"heic", b"heix", b"heim", b"heis", b"mif1", b"msf1")
+
+
+class FileRejectedError(ValueError):
+    """Файл не подходит (слишком большой или неподдерживаемого типа) - повтор не поможет"""
+
+
+@dataclass(frozen=True)
+class DownloadedFile:
+    """Скачанный файл"""
+    path: Path
+    size: int
+    content_type: str
+    extension: str
+    sha256: str
+
+
+def detect_content_type(header: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Определить тип файла по сигнатуре
+    
+    Args:
+        header: Первые байты файла (не меньше SIGNATURE_SIZE, если файл не короче)
+    
+    Returns:
+        (MIME, расширение) или None, если тип не поддерживается
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return JPEG
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return PNG
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return WEBP
+    if header[4:8] == b"ftyp" and header[8:12] in HEIC_BRANDS:
+        return HEIC
+    if header.startswith(b"%PDF-"):
+        return PDF
+    return None
+
+
+def _detect_or_reject(header: bytes) -> Tuple[str, str]:
+    """Определить тип файла или отклонить файл"""
+    content_type = detect_content_type(header)
+    if content_type is None:
+        raise FileRejectedError(f"Unsupported file type (signature: {header[:8].hex()})")
+    return content_type
+
+
+def _fsync(path: Path) -> None:
+    """Сбросить содержимое файла на диск"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+async def download_telegram_file(
+    bot: Bot,
+    file_id: str,
+    destination: Path,
+    max_size: int
+) -> DownloadedFile:
+    """
+    Скачать файл из Telegram с ограничением размера
+    
+    Args:
+        bot: Экземпляр бота
+        file_id: File ID от Telegram
+        destination: Путь к итоговому файлу без расширения
+            (расширение добавляется по типу содержимого)
+        max_size: Максимальный размер файла в байтах
+    
+    Returns:
+        DownloadedFile: Скачанный файл
+    
+    Raises:
+        FileRejectedError: Файл больше max_size или неподдерживаемого типа
+        Exception: Если не удалось скачать файл
+    """
+    file_info = await bot.get_file(file_id)
+    
+    # Размер известен заранее - не начинаем заведомо лишнюю загрузку
+    if file_info.file_size and file_info.file_size > max_size:
+        raise FileRejectedError(f"File is too large: {file_info.file_size} > {max_size} bytes")
+    
+    part_path = destination.with_name(f"{destination.name}.part")
+    stream = bot.session.stream_content(
+        url=bot.session.api.file_url(bot.token, file_info.file_path),
+        timeout=DOWNLOAD_TIMEOUT,
+        chunk_size=CHUNK_SIZE,
+        raise_for_status=True
+    )
+    
+    size = 0
+    digest = hashlib.sha256()
+    header = b""
+    content_type = None
+    try:
+        # Части по 64 КБ пишутся в локальный файл напрямую - это быстрее,
+        # чем переключаться в поток на каждую часть
+        with open(part_path, "wb") as f:
+            async for chunk in stream:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileRejectedError(f"File is too large: more than {max_size} bytes")
+                
+                # Тип проверяем, как только пришла сигнатура, а не после загрузки
+                if content_type is None and len(header) < SIGNATURE_SIZE:
+                    header += chunk[:SIGNATURE_SIZE - len(header)]
+                    if len(header) == SIGNATURE_SIZE:
+                        content_type = _detect_or_reject(header)
+                
+                digest.update(chunk)
+                f.write(chunk)
+        
+        # Файл короче сигнатуры
+        if content_type is None:
+            content_type = _detect_or_reject(header)
+        
+        await asyncio.to_thread(_fsync, part_path)
+        
+        mime, extension = content_type
+        path = destination.with_name(f"{destination.name}.{extension}")
+        os.replace(part_path, path)
+    except BaseException:
+        # Прерываем загрузку (закрываем соединение) и удаляем недокачанный файл
+        await stream.aclose()
+        part_path.unlink(missing_ok=True)
+        raise
+    
+    return DownloadedFile(
+        path=path,
+        size=size,
+        content_type=mime,
+        extension=extension,
+        sha256=digest.hexdigest()
+    )
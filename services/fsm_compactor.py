@@ -0,0 +1,184 @@
+"""
+Сервис компактификации FSM-ключей в Redis.
+Запускается периодически как background задача.
+
+Удаляет пустые данные FSM и данные брошенных сценариев (без состояния и
+без TTL - остались от записей до введения TTL), а ключам, у которых TTL
+нет, выставляет TTL их группы. Освобожденная память оценивается через
+MEMORY USAGE до удаления.
+"""
+import asyncio
+from typing import Dict, List
+
+from redis.asyncio import Redis
+
+from bot.utils.fsm_storage import GroupTTLRedisStorage
+
+
+# Сколько ключей запрашивать за один SCAN и обрабатывать одним pipeline
+SCAN_BATCH_SIZE = 500
+
+# Пустые данные FSM (RedisStorage удаляет их сам, но старые записи могли остаться)
+EMPTY_DATA_VALUES = {b"", b"{}", b"null"}
+
+
+class FSMCompactor:
+    """Удаление брошенных и пустых FSM-ключей"""
+    
+    def __init__(self, redis: Redis, storage: GroupTTLRedisStorage):
+        self.redis = redis
+        self.storage = storage
+        separator = getattr(storage.key_builder, "separator", ":")
+        prefix = getattr(storage.key_builder, "prefix", "fsm")
+        self.separator = separator
+        self.data_pattern = f"{prefix}{separator}*{separator}data"
+        self.state_pattern = f"{prefix}{separator}*{separator}state"
+    
+    def _state_key(self, data_key: str) -> str:
+        """Ключ состояния для ключа данных (отличается последней частью)"""
+        return data_key.rsplit(self.separator, 1)[0] + self.separator + "state"
+    
+    async def _memory_usage(self, keys: List[str]) -> int:
+        """Суммарный размер ключей в байтах (MEMORY USAGE)"""
+        if not keys:
+            return 0
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.memory_usage(key)
+                sizes = await pipe.execute()
+            return sum(size or 0 for size in sizes)
+        except Exception as e:
+            print(f"⚠️ MEMORY USAGE unavailable: {e}")
+            return 0
+    
+    async def _compact_data_batch(self, keys: List[str], stats: Dict[str, int]) -> None:
+        """Обработать пачку ключей данных"""
+        state_keys = [self._state_key(key) for key in keys]
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, state_key in zip(keys, state_keys):
+                pipe.get(key)
+                pipe.ttl(key)
+                pipe.get(state_key)
+            results = await pipe.execute()
+        
+        to_delete = []
+        to_expire = []
+        for i, key in enumerate(keys):
+            value, ttl, state = results[i * 3:i * 3 + 3]
+            if value is None:
+                # Ключ истек между SCAN и GET
+                continue
+            
+            if value in EMPTY_DATA_VALUES:
+                to_delete.append(key)
+            elif ttl == -1 and state is None:
+                # Сценарий брошен: состояния нет, а данные без TTL жили бы вечно
+                to_delete.append(key)
+            elif ttl == -1:
+                if isinstance(state, bytes):
+                    state = state.decode()
+                to_expire.append((key, self.storage.get_ttls(state)[1]))
+        
+        if to_delete:
+            stats["reclaimed_bytes"] += await self._memory_usage(to_delete)
+            stats["deleted"] += await self.redis.delete(*to_delete)
+        
+        if to_expire:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, ttl in to_expire:
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+            stats["ttl_set"] += len(to_expire)
+    
+    async def _expire_state_batch(self, keys: List[str], stats: Dict[str, int]) -> None:
+        """Выставить TTL группы ключам состояний без TTL"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.ttl(key)
+                pipe.get(key)
+            results = await pipe.execute()
+        
+        to_expire = []
+        for i, key in enumerate(keys):
+            ttl, state = results[i * 2:i * 2 + 2]
+            if ttl == -1 and state is not None:
+                if isinstance(state, bytes):
+                    state = state.decode()
+                to_expire.append((key, self.storage.get_ttls(state)[0]))
+        
+        if to_expire:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, ttl in to_expire:
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+            stats["ttl_set"] += len(to_expire)
+    
+    async def _scan(self, pattern: str, handle_batch, stats: Dict[str, int]) -> None:
+        """Пройти ключи по шаблону пачками по SCAN_BATCH_SIZE"""
+        batch = []
+        async for key in self.redis.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+            batch.append(key.decode() if isinstance(key, bytes) else key)
+            if len(batch) >= SCAN_BATCH_SIZE:
+                stats["scanned"] += len(batch)
+                await handle_batch(batch, stats)
+                batch = []
+        
+        if batch:
+            stats["scanned"] += len(batch)
+            await handle_batch(batch, stats)
+    
+    async def compact(self) -> Dict[str, int]:
+        """
+        Один проход компактификации
+        
+        Returns:
+            dict: Статистика {scanned, deleted, ttl_set, reclaimed_bytes}
+        """
+        print(f"\n{'='*60}")
+        print(f"🗜️ Starting FSM compaction ({self.data_pattern})")
+        print(f"{'='*60}")
+        
+        stats = {"scanned": 0, "deleted": 0, "ttl_set": 0, "reclaimed_bytes": 0}
+        
+        await self._scan(self.data_pattern, self._compact_data_batch, stats)
+        await self._scan(self.state_pattern, self._expire_state_batch, stats)
+        
+        print("\n📊 FSM compaction statistics:")
+        print(f"   Scanned: {stats['scanned']}")
+        print(f"   Deleted: {stats['deleted']}")
+        print(f"   TTL set: {stats['ttl_set']}")
+        print(f"   Reclaimed: {stats['reclaimed_bytes'] / 1024:.1f} KB")
+        print(f"{'='*60}\n")
+        
+        return stats
+
+
+async def run_periodic_fsm_compaction(
+    redis: Redis,
+    storage: GroupTTLRedisStorage,
+    interval_hours: int = 6
+):
+    """
+    Запустить периодическую компактификацию FSM-ключей.
+    
+    Args:
+        redis: Клиент Redis
+        storage: Хранилище FSM (для ключей и TTL групп)
+        interval_hours: Интервал между проходами в часах
+    """
+    compactor = FSMCompactor(redis, storage)
+    
+    print(f"🔄 FSM compactor started (interval: {interval_hours}h)")
+    
+    while True:
+        try:
+            await compactor.compact()
+        except Exception as e:
+            print(f"❌ FSM compaction error: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        # Ждем следующего запуска
+        await asyncio.sleep(interval_hours * 3600)
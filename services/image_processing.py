@@ -0,0 +1,207 @@
+"""
+Подготовка фото документов для просмотра.
+
+Из оригинала делаются две копии: для просмотра администратором
+(не больше REVIEW_MAX_SIDE по большей стороне) и миниатюра. Обе
+перекодируются в JPEG без EXIF (геолокация, модель телефона и т.п.);
+ориентация из EXIF применяется до удаления. Оригинал не изменяется.
+
+Заодно проверяется качество фото (measure_quality): резкость - дисперсия
+лапласиана, яркость - средний уровень серого, блики - доля белых пикселей,
+и разрешение. Все, кроме разрешения, считается векторно (NumPy)
+по уменьшенной до QUALITY_MAX_SIDE копии в оттенках серого: так оценка
+не зависит от размера оригинала, а расчет занимает миллисекунды.
+
+Обработка изображений нагружает CPU, поэтому выполняется в пуле процессов
+и не блокирует event loop бота.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from config.settings import settings
+
+
+# Копия для просмотра
+REVIEW_MAX_SIDE = 1600
+REVIEW_QUALITY = 85
+
+# Миниатюра
+THUMBNAIL_MAX_SIDE = 320
+THUMBNAIL_QUALITY = 75
+
+# Размер копии, по которой оценивается качество
+QUALITY_MAX_SIDE = 1024
+
+# Пиксели не темнее этого уровня считаются засвеченными
+GLARE_LEVEL = 250
+
+# Проблемы качества фото
+QUALITY_BLURRY = "blurry"
+QUALITY_DARK = "dark"
+QUALITY_OVEREXPOSED = "overexposed"
+QUALITY_LOW_RESOLUTION = "low_resolution"
+
+# Расширения файлов, которые умеет открывать Pillow без плагинов
+SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# Пул процессов (создается при первом использовании)
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass(frozen=True)
+class ImageQuality:
+    """Оценка качества фото документа"""
+    sharpness: float  # Дисперсия лапласиана: чем меньше, тем сильнее размыто
+    brightness: float  # Средняя яркость, 0-255
+    glare: float  # Доля засвеченных пикселей, 0-1
+    width: int
+    height: int
+    
+    @property
+    def issues(self) -> List[str]:
+        """Проблемы по порогам из настроек (пустой список - фото в порядке)"""
+        issues = []
+        if self.sharpness < settings.document_min_sharpness:
+            issues.append(QUALITY_BLURRY)
+        if self.brightness < settings.document_min_brightness:
+            issues.append(QUALITY_DARK)
+        # Белый лист документа сам по себе яркий - засветку выдают блики
+        if self.glare > settings.document_max_glare:
+            issues.append(QUALITY_OVEREXPOSED)
+        if min(self.width, self.height) < settings.document_min_resolution:
+            issues.append(QUALITY_LOW_RESOLUTION)
+        return issues
+
+
+@dataclass(frozen=True)
+class ImageDerivatives:
+    """Копии фото документа"""
+    review_path: Path
+    thumbnail_path: Path
+    quality: ImageQuality
+
+
+def _save_resized(image: Image.Image, path: Path, max_side: int, quality: int) -> None:
+    """Уменьшить изображение и атомарно сохранить в JPEG без метаданных"""
+    resized = image.copy()
+    resized.thumbnail((max_side, max_side), Image.LANCZOS)
+    
+    part_path = path.with_name(f"{path.name}.part")
+    # exif не передается - метаданные в копию не попадают
+    resized.save(part_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(part_path, path)
+
+
+def measure_quality(image: Image.Image) -> ImageQuality:
+    """Оценить резкость, яркость и разрешение фото"""
+    gray = image.convert("L")
+    gray.thumbnail((QUALITY_MAX_SIDE, QUALITY_MAX_SIDE), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32)
+    
+    # Лапласиан (ядро 0 1 0 / 1 -4 1 / 0 1 0) сдвигами массива - без цикла по пикселям
+    laplacian = (
+        pixels[:-2, 1:-1] + pixels[2:, 1:-1]
+        + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+        - 4 * pixels[1:-1, 1:-1]
+    )
+    
+    return ImageQuality(
+        sharpness=float(laplacian.var()) if laplacian.size else 0.0,
+        brightness=float(pixels.mean()),
+        glare=float(np.count_nonzero(pixels >= GLARE_LEVEL)) / pixels.size,
+        width=image.width,
+        height=image.height,
+    )
+
+
+def render_derivatives(source: str, review_path: str, thumbnail_path: str) -> ImageQuality:
+    """
+    Сделать копию для просмотра и миниатюру (выполняется в пуле процессов)
+    
+    Args:
+        source: Путь к оригиналу
+        review_path: Путь к копии для просмотра
+        thumbnail_path: Путь к миниатюре
+    
+    Returns:
+        ImageQuality: Оценка качества оригинала
+    """
+    with Image.open(source) as original:
+        # Поворачиваем по EXIF, пока он еще есть
+        image = ImageOps.exif_transpose(original)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        
+        _save_resized(image, Path(review_path), REVIEW_MAX_SIDE, REVIEW_QUALITY)
+        _save_resized(image, Path(thumbnail_path), THUMBNAIL_MAX_SIDE, THUMBNAIL_QUALITY)
+        return measure_quality(image)
+
+
+def assess_image(source: str) -> ImageQuality:
+    """Оценить качество фото без подготовки копий (выполняется в пуле процессов)"""
+    with Image.open(source) as original:
+        return measure_quality(ImageOps.exif_transpose(original))
+
+
+def get_image_executor() -> ProcessPoolExecutor:
+    """Получить пул процессов для обработки изображений"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _executor
+
+
+def shutdown_image_executor() -> None:
+    """Остановить пул процессов"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def create_derivatives(source: Path) -> Optional[ImageDerivatives]:
+    """
+    Подготовить копии фото документа для просмотра
+    
+    Args:
+        source: Путь к оригиналу
+    
+    Returns:
+        ImageDerivatives или None, если формат не поддерживается (например, PDF)
+    """
+    if source.suffix.lower() not in SUPPORTED_EXTENSIONS:
+        return None
+    
+    review_path = source.with_name(f"{source.stem}_review.jpg")
+    thumbnail_path = source.with_name(f"{source.stem}_thumb.jpg")
+    
+    loop = asyncio.get_running_loop()
+    quality = await loop.run_in_executor(
+        get_image_executor(),
+        render_derivatives,
+        str(source),
+        str(review_path),
+        str(thumbnail_path),
+    )
+    return ImageDerivatives(review_path=review_path, thumbnail_path=thumbnail_path, quality=quality)
+
+
+async def check_quality(source: Path) -> Optional[ImageQuality]:
+    """
+    Оценить качество фото документа
+    
+    Returns:
+        ImageQuality или None, если формат не поддерживается
+    """
+    if source.suffix.lower() not in SUPPORTED_EXTENSIONS:
+        return None
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_executor(), assess_image, str(source))
@@ -1,10 +1,18 @@
 """
 Сервис для атомарной регистрации пользователя с документами.
 Гарантирует консистентность: либо создается пользователь со всеми документами, либо ничего.
+
+Транзакция регистрации только вставляет User и Document (с telegram_file_id
+и пустым file_path) - файлы скачивает фоновая очередь
+(services/document_ingestion.py) через stage_documents и promote_documents:
+документы параллельно скачиваются во временную директорию и затем
+переносятся в хранилище (services/document_storage.py).
 """
-import os
+import asyncio
+import uuid
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 from aiogram import Bot
@@ -14,6 +22,25 @@ from sqlalchemy import select
 from database.models.user import User, UserRole, UserStatus
 from database.models.document import Document, DocumentType, DocumentStatus
 from config.settings import settings
+from services.file_download import download_telegram_file
+from services.document_storage import blob_key, get_staging_dir, store_file
+
+
+@dataclass(frozen=True)
+class StagedDocument:
+    """Документ, скачанный во временную директорию"""
+    document_type: DocumentType
+    staged_path: Path
+    original_filename: str
+    file_size: int
+    content_type: str
+    sha256: str
+    extension: str
+    
+    @property
+    def key(self) -> str:
+        """Ключ файла в хранилище"""
+        return blob_key(self.sha256, self.extension)
 
 
 class RegistrationService:
@@ -22,27 +49,33 @@ class RegistrationService:
     def __init__(self, bot: Bot):
         self.bot = bot
     
-    def _get_upload_dir(self) -> Path:
-        """Получить абсолютный путь к директории загрузок"""
-        if os.path.isabs(settings.upload_path):
-            upload_dir = Path(settings.upload_path)
+    def _get_staging_dir(self) -> Path:
+        """Получить абсолютный путь к временной директории загрузок"""
+        staging_dir = get_staging_dir()
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        return staging_dir
+    
+    @staticmethod
+    def _parse_document_type(doc_type: str) -> DocumentType:
+        """Преобразовать строку в DocumentType"""
+        if doc_type == "passport":
+            return DocumentType.PASSPORT
+        elif doc_type == "driver_license":
+            return DocumentType.DRIVER_LICENSE
+        elif doc_type == "selfie":
+            return DocumentType.SELFIE
         else:
-            # Получаем абсолютный путь от корня проекта
-            project_root = Path(__file__).parent.parent
-            upload_dir = project_root / settings.upload_path
-        
-        # Создаем директорию, если её нет
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        return upload_dir
+            raise ValueError(f"Unknown document type: {doc_type}")
     
     async def _download_document_from_telegram(
         self, 
         file_id: str, 
         telegram_id: int, 
         doc_type: str
-    ) -> Path:
+    ) -> StagedDocument:
         """
-        Скачать документ из Telegram и сохранить на диск
+        Скачать документ из Telegram во временную директорию
+        (потоково, с ограничением max_file_size и проверкой типа)
         
         Args:
             file_id: File ID от Telegram
@@ -50,26 +83,101 @@ class RegistrationService:
             doc_type: Тип документа
             
         Returns:
-            Path: Путь к сохраненному файлу
+            StagedDocument: Скачанный документ
             
         Raises:
+            FileRejectedError: Файл слишком большой или неподдерживаемого типа
             Exception: Если не удалось скачать файл
         """
-        upload_dir = self._get_upload_dir()
+        document_type = self._parse_document_type(doc_type)
+        
+        print(f"📥 Downloading {doc_type} (file_id: {file_id[:20]}...)")
+        
+        # Генерируем имя файла (расширение - по типу содержимого)
+        name = f"{telegram_id}_{doc_type}_{file_id}"
+        
+        # Во временной директории имя уникально для каждой попытки -
+        # повторная регистрация не затрет и не удалит чужие файлы
+        downloaded = await download_telegram_file(
+            self.bot,
+            file_id,
+            self._get_staging_dir() / f"{uuid.uuid4().hex}_{name}",
+            max_size=settings.max_file_size
+        )
+        
+        print(f"✅ Document staged: {doc_type} -> {downloaded.path.name} ({downloaded.content_type}, {downloaded.size} bytes)")
+        return StagedDocument(
+            document_type=document_type,
+            staged_path=downloaded.path,
+            original_filename=f"{name}.{downloaded.extension}",
+            file_size=downloaded.size,
+            content_type=downloaded.content_type,
+            sha256=downloaded.sha256,
+            extension=downloaded.extension,
+        )
+        
+    async def stage_documents(
+        self,
+        telegram_id: int,
+        documents_file_ids: Dict[str, str]
+    ) -> List[StagedDocument]:
+        """
+        Параллельно скачать документы во временную директорию.
+        Вызывается вне транзакции: соединение с БД не держится,
+        пока идут загрузки.
+        
+        Args:
+            telegram_id: Telegram ID пользователя
+            documents_file_ids: Словарь {doc_type: file_id}
+        
+        Returns:
+            List[StagedDocument]: Скачанные документы
+        
+        Raises:
+            Exception: Если не удалось скачать хотя бы один файл
+                (уже скачанные файлы удаляются)
+        """
+        # Проверяем типы до начала загрузок
+        for doc_type in documents_file_ids:
+            self._parse_document_type(doc_type)
         
-        # Получаем информацию о файле
-        file_info = await self.bot.get_file(file_id)
+        results = await asyncio.gather(
+            *(
+                self._download_document_from_telegram(file_id, telegram_id, doc_type)
+                for doc_type, file_id in documents_file_ids.items()
+            ),
+            return_exceptions=True
+        )
         
-        # Генерируем имя файла
-        file_extension = "jpg"
-        filename = f"{telegram_id}_{doc_type}_{file_id}.{file_extension}"
-        file_path = upload_dir / filename
+        staged = [result for result in results if isinstance(result, StagedDocument)]
+        errors = [result for result in results if isinstance(result, BaseException)]
         
-        # Скачиваем файл
-        await self.bot.download_file(file_info.file_path, file_path)
+        if errors:
+            print(f"❌ Failed to download {len(errors)} of {len(results)} documents for {telegram_id}")
+            self.discard_documents(staged)
+            raise errors[0]
         
-        print(f"✅ Document downloaded: {file_path.absolute()}")
-        return file_path
+        return staged
+    
+    async def promote_documents(self, staged_documents: List[StagedDocument]) -> None:
+        """Перенести скачанные документы в хранилище"""
+        for document in staged_documents:
+            if await store_file(document.staged_path, document.key, document.content_type):
+                print(f"✅ Document saved: {document.original_filename} -> {document.key}")
+            else:
+                print(f"♻️  Document already stored: {document.original_filename} -> {document.key}")
+    
+    def discard_documents(self, staged_documents: List[StagedDocument]) -> None:
+        """Удалить скачанные документы (регистрация не удалась)"""
+        print(f"🗑️  Cleaning up {len(staged_documents)} staged files...")
+        
+        for document in staged_documents:
+            try:
+                if document.staged_path.exists():
+                    document.staged_path.unlink()
+                    print(f"   Deleted: {document.staged_path.name}")
+            except Exception as cleanup_error:
+                print(f"   ⚠️  Failed to delete {document.staged_path.name}: {cleanup_error}")
     
     async def register_user_with_documents(
         self,
@@ -78,9 +186,11 @@ class RegistrationService:
         user_data: Dict[str, Any],
         documents_file_ids: Dict[str, str],
         language: str = "ru"
-    ) -> User:
+    ) -> Tuple[User, List[Document]]:
         """
         Атомарно создать пользователя и все его документы в рамках одной транзакции.
+        Файлы не скачиваются: документы создаются с telegram_file_id и пустым
+        file_path, после commit их нужно поставить в очередь загрузки.
         
         Args:
             session: Сессия SQLAlchemy (должна быть в транзакции)
@@ -90,7 +200,7 @@ class RegistrationService:
             language: Язык интерфейса
             
         Returns:
-            User: Созданный пользователь
+            Tuple[User, List[Document]]: Созданный пользователь и его документы
             
         Raises:
             Exception: Если что-то пошло не так (транзакция откатится)
@@ -125,68 +235,29 @@ class RegistrationService:
         
         print(f"✅ User created: ID={user.id}, Name={user.full_name}")
         
-        # 3. Скачиваем и сохраняем все документы
-        downloaded_files: List[Path] = []
-        created_documents: List[Document] = []
-        
-        try:
-            for doc_type, file_id in documents_file_ids.items():
-                # Преобразуем строку в enum
-                if doc_type == "passport":
-                    document_type = DocumentType.PASSPORT
-                elif doc_type == "driver_license":
-                    document_type = DocumentType.DRIVER_LICENSE
-                elif doc_type == "selfie":
-                    document_type = DocumentType.SELFIE
-                else:
-                    raise ValueError(f"Unknown document type: {doc_type}")
-                
-                # Скачиваем файл
-                print(f"📥 Downloading {doc_type} (file_id: {file_id[:20]}...)")
-                file_path = await self._download_document_from_telegram(
-                    file_id, telegram_id, doc_type
-                )
-                downloaded_files.append(file_path)
-                
-                # Создаем запись в БД
-                document = Document(
-                    user_id=user.id,
-                    document_type=document_type,
-                    file_path=str(file_path.absolute()),
-                    original_filename=file_path.name,
-                    file_size=file_path.stat().st_size,
-                    status=DocumentStatus.PENDING,
-                    uploaded_at=datetime.utcnow()
-                )
-                
-                session.add(document)
-                created_documents.append(document)
-                
-                print(f"✅ Document saved: {doc_type} -> {file_path.name}")
-            
-            # 4. Commit в рамках транзакции вызывающего кода
-            # (не делаем commit здесь, чтобы вызывающий код мог откатить при необходимости)
-            
-            print(f"✅ Registration complete: {len(created_documents)} documents")
-            print(f"{'='*60}\n")
-            
-            return user
-            
-        except Exception as e:
-            # При ошибке удаляем скачанные файлы
-            print(f"❌ Error during registration: {e}")
-            print(f"🗑️  Rolling back and cleaning up {len(downloaded_files)} files...")
-            
-            for file_path in downloaded_files:
-                try:
-                    if file_path.exists():
-                        file_path.unlink()
-                        print(f"   Deleted: {file_path.name}")
-                except Exception as cleanup_error:
-                    print(f"   ⚠️  Failed to delete {file_path.name}: {cleanup_error}")
-            
-            # Пробрасываем ошибку дальше для rollback транзакции
-            raise
+        # 3. Создаем записи документов (файлы загрузит очередь)
+        documents: List[Document] = []
+        for doc_type, file_id in documents_file_ids.items():
+            document = Document(
+                user_id=user.id,
+                document_type=self._parse_document_type(doc_type),
+                file_path="",
+                telegram_file_id=file_id,
+                status=DocumentStatus.PENDING,
+                uploaded_at=datetime.utcnow()
+            )
+            session.add(document)
+            documents.append(document)
+        
+        await session.flush()  # Получаем id документов
+        
+        # 4. Commit в рамках транзакции вызывающего кода
+        # (не делаем commit здесь, чтобы вызывающий код мог откатить при необходимости)
+        
+        print(f"✅ Registration complete: {len(documents)} documents queued")
+        print(f"{'='*60}\n")
+        
+        return user, documents
     
     async def check_user_exists(self, session: AsyncSession, telegram_id: int) -> Optional[User]:
         """Проверить, существует ли пользователь в БД"""
@@ -194,4 +265,3 @@ class RegistrationService:
             select(User).where(User.telegram_id == telegram_id)
         )
         return result.scalar_one_or_none()
-
@@ -1,15 +1,129 @@
+"""
+Сервис системных настроек.
+
+Единственная строка system_settings кэшируется в памяти процесса в виде
+неизменяемого снимка (SettingsSnapshot) вместе с уже отформатированными
+часами работы, поэтому чтение настроек не обращается к БД.
+При изменении настроек версия увеличивается, а остальные реплики бота
+получают уведомление через Redis pub/sub и сразу перечитывают строку.
+"""
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
 from sqlalchemy import select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+
 from database.base import async_session_factory
 from database.models.settings import SystemSettings
 
 
+# Канал Redis для уведомлений об изменении настроек
+SETTINGS_CHANNEL = "settings:invalidate"
+
+# Идентификатор текущего процесса (чтобы не обрабатывать свои же уведомления)
+INSTANCE_ID = uuid.uuid4().hex
+
+# Пауза перед переподпиской при ошибке Redis (секунды)
+LISTENER_RETRY_DELAY = 5
+
+# Таймаут ожидания сообщения в канале (секунды). Задается явно, иначе
+# простой канала обрывался бы по socket_timeout пула соединений
+LISTENER_POLL_TIMEOUT = 30
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Неизменяемый снимок строки system_settings"""
+    id: int
+    company_name: str
+    address: str
+    phone: str
+    email: Optional[str]
+    working_hours: str
+    working_hours_monday: str
+    working_hours_tuesday: str
+    working_hours_wednesday: str
+    working_hours_thursday: str
+    working_hours_friday: str
+    working_hours_saturday: str
+    working_hours_sunday: str
+    description: Optional[str]
+    website: Optional[str]
+    is_active: bool
+    maintenance_mode: bool
+    maintenance_message: Optional[str]
+    updated_at: Optional[datetime]
+    # Предварительно отрендеренные часы работы
+    formatted_working_hours: str
+    
+    @classmethod
+    def from_model(cls, model: SystemSettings) -> "SettingsSnapshot":
+        """Создать снимок из ORM-объекта"""
+        return cls(
+            id=model.id,
+            company_name=model.company_name,
+            address=model.address,
+            phone=model.phone,
+            email=model.email,
+            working_hours=model.working_hours,
+            working_hours_monday=model.working_hours_monday,
+            working_hours_tuesday=model.working_hours_tuesday,
+            working_hours_wednesday=model.working_hours_wednesday,
+            working_hours_thursday=model.working_hours_thursday,
+            working_hours_friday=model.working_hours_friday,
+            working_hours_saturday=model.working_hours_saturday,
+            working_hours_sunday=model.working_hours_sunday,
+            description=model.description,
+            website=model.website,
+            is_active=model.is_active,
+            maintenance_mode=model.maintenance_mode,
+            maintenance_message=model.maintenance_message,
+            updated_at=model.updated_at,
+            formatted_working_hours=model.formatted_working_hours
+        )
+
+
 class SettingsService:
     """Сервис для работы с настройками системы"""
     
+    # Версия настроек: увеличивается при каждом изменении (локальном или
+    # пришедшем от другой реплики). Используется как часть ключа кэша
+    # отрендеренных экранов.
+    _version: int = 0
+    
+    # Закэшированный снимок настроек
+    _cache: Optional[SettingsSnapshot] = None
+    _lock = asyncio.Lock()
+    
+    # Redis для рассылки уведомлений другим репликам (опционально)
+    _redis: Optional[Redis] = None
+    
+    @classmethod
+    def init_cache(cls, redis: Optional[Redis]) -> None:
+        """Подключить Redis для уведомлений об изменении настроек"""
+        cls._redis = redis
+    
+    @classmethod
+    def get_version(cls) -> int:
+        """Текущая версия настроек"""
+        return cls._version
+    
+    @classmethod
+    def _bump_version(cls) -> None:
+        """Отметить, что настройки изменились"""
+        cls._version += 1
+    
+    @classmethod
+    def get_cached(cls) -> Optional[SettingsSnapshot]:
+        """Получить закэшированные настройки без обращения к БД (или None)"""
+        return cls._cache
+    
     @staticmethod
-    async def get_settings() -> SystemSettings:
-        """Получить текущие настройки системы"""
+    async def _load_settings() -> SystemSettings:
+        """Прочитать строку настроек из БД (создать, если её нет)"""
         async with async_session_factory() as session:
             result = await session.execute(select(SystemSettings))
             settings = result.scalar_one_or_none()
@@ -23,120 +137,185 @@ class SettingsService:
             
             return settings
     
-    @staticmethod
-    async def update_contact_info(address: str = None, phone: str = None, email: str = None) -> bool:
-        """Обновить контактную информацию"""
-        async with async_session_factory() as session:
+    @classmethod
+    async def get_settings(cls) -> SettingsSnapshot:
+        """Получить текущие настройки системы (из кэша)"""
+        cached = cls._cache
+        if cached is not None:
+            return cached
+        
+        async with cls._lock:
+            # Пока ждали блокировку, настройки мог загрузить другой обработчик
+            if cls._cache is None:
+                cls._cache = SettingsSnapshot.from_model(await cls._load_settings())
+            return cls._cache
+    
+    @classmethod
+    async def refresh(cls) -> SettingsSnapshot:
+        """Перечитать настройки из БД и сбросить зависимые кэши"""
+        async with cls._lock:
             try:
-                # Получаем настройки
-                result = await session.execute(select(SystemSettings))
-                settings = result.scalar_one_or_none()
-                
-                if not settings:
-                    settings = SystemSettings()
-                    session.add(settings)
-                    await session.flush()
-                
-                # Обновляем только переданные поля
-                update_data = {}
-                if address is not None:
-                    update_data['address'] = address
-                if phone is not None:
-                    update_data['phone'] = phone
-                if email is not None:
-                    update_data['email'] = email
-                
-                if update_data:
-                    await session.execute(
-                        update(SystemSettings)
-                        .where(SystemSettings.id == settings.id)
-                        .values(**update_data)
-                    )
-                
-                await session.commit()
-                return True
-                
-            except Exception as e:
-                await session.rollback()
-                print(f"Error updating contact info: {e}")
-                return False
+                cls._cache = SettingsSnapshot.from_model(await cls._load_settings())
+            except Exception:
+                # Прочитаем при следующем обращении
+                cls._cache = None
+                raise
+            finally:
+                cls._bump_version()
+            return cls._cache
     
-    @staticmethod
-    async def update_working_hours(general_hours: str = None, **day_hours) -> bool:
-        """Обновить часы работы"""
+    @classmethod
+    async def _apply_update(cls, values: Dict[str, Any]) -> None:
+        """
+        Обновить строку настроек одним запросом (UPDATE ... RETURNING)
+        и разослать уведомление другим репликам
+        """
+        settings_id = (await cls.get_settings()).id
+        
         async with async_session_factory() as session:
             try:
-                # Получаем настройки
-                result = await session.execute(select(SystemSettings))
-                settings = result.scalar_one_or_none()
-                
-                if not settings:
-                    settings = SystemSettings()
-                    session.add(settings)
-                    await session.flush()
-                
-                # Обновляем часы работы
-                update_data = {}
-                
-                if general_hours is not None:
-                    update_data['working_hours'] = general_hours
-                
-                # Обновляем часы по дням недели
-                day_mapping = {
-                    'monday': 'working_hours_monday',
-                    'tuesday': 'working_hours_tuesday',
-                    'wednesday': 'working_hours_wednesday',
-                    'thursday': 'working_hours_thursday',
-                    'friday': 'working_hours_friday',
-                    'saturday': 'working_hours_saturday',
-                    'sunday': 'working_hours_sunday'
-                }
-                
-                for day, value in day_hours.items():
-                    if day in day_mapping and value is not None:
-                        update_data[day_mapping[day]] = value
-                
-                if update_data:
-                    await session.execute(
-                        update(SystemSettings)
-                        .where(SystemSettings.id == settings.id)
-                        .values(**update_data)
-                    )
-                
+                result = await session.execute(
+                    update(SystemSettings)
+                    .where(SystemSettings.id == settings_id)
+                    .values(**values)
+                    .returning(SystemSettings)
+                )
+                settings = result.scalar_one()
                 await session.commit()
-                return True
-                
-            except Exception as e:
+            except Exception:
                 await session.rollback()
-                print(f"Error updating working hours: {e}")
-                return False
+                # Строка могла измениться/пропасть - перечитаем при следующем обращении
+                cls._cache = None
+                cls._bump_version()
+                raise
+        
+        cls._cache = SettingsSnapshot.from_model(settings)
+        cls._bump_version()
+        await cls._publish_invalidation()
     
-    @staticmethod
-    async def set_maintenance_mode(enabled: bool, message: str = None) -> bool:
+    @classmethod
+    async def _publish_invalidation(cls) -> None:
+        """Уведомить остальные реплики об изменении настроек"""
+        if cls._redis is None:
+            return
+        try:
+            await cls._redis.publish(SETTINGS_CHANNEL, INSTANCE_ID)
+        except Exception as e:
+            print(f"⚠️ Failed to publish settings invalidation: {e}")
+    
+    @classmethod
+    async def update_contact_info(cls, address: str = None, phone: str = None, email: str = None) -> bool:
+        """Обновить контактную информацию"""
+        try:
+            # Обновляем только переданные поля
+            update_data = {}
+            if address is not None:
+                update_data['address'] = address
+            if phone is not None:
+                update_data['phone'] = phone
+            if email is not None:
+                update_data['email'] = email
+            
+            if update_data:
+                await cls._apply_update(update_data)
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error updating contact info: {e}")
+            return False
+    
+    @classmethod
+    async def update_working_hours(cls, general_hours: str = None, **day_hours) -> bool:
+        """Обновить часы работы"""
+        try:
+            update_data = {}
+            
+            if general_hours is not None:
+                update_data['working_hours'] = general_hours
+            
+            # Обновляем часы по дням недели
+            day_mapping = {
+                'monday': 'working_hours_monday',
+                'tuesday': 'working_hours_tuesday',
+                'wednesday': 'working_hours_wednesday',
+                'thursday': 'working_hours_thursday',
+                'friday': 'working_hours_friday',
+                'saturday': 'working_hours_saturday',
+                'sunday': 'working_hours_sunday'
+            }
+            
+            for day, value in day_hours.items():
+                if day in day_mapping and value is not None:
+                    update_data[day_mapping[day]] = value
+            
+            if update_data:
+                await cls._apply_update(update_data)
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error updating working hours: {e}")
+            return False
+    
+    @classmethod
+    async def set_maintenance_mode(cls, enabled: bool, message: str = None) -> bool:
         """Включить/выключить режим технических работ"""
-        async with async_session_factory() as session:
-            try:
-                result = await session.execute(select(SystemSettings))
-                settings = result.scalar_one_or_none()
-                
-                if not settings:
-                    settings = SystemSettings()
-                    session.add(settings)
-                    await session.flush()
-                
-                await session.execute(
-                    update(SystemSettings)
-                    .where(SystemSettings.id == settings.id)
-                    .values(
-                        maintenance_mode=enabled,
-                        maintenance_message=message
-                    )
+        try:
+            await cls._apply_update({
+                'maintenance_mode': enabled,
+                'maintenance_message': message
+            })
+            return True
+        
+        except Exception as e:
+            print(f"Error setting maintenance mode: {e}")
+            return False
+
+
+async def run_settings_invalidation_listener(redis: Redis):
+    """
+    Слушать уведомления об изменении настроек от других реплик.
+    При каждом уведомлении (и после каждой переподписки) настройки
+    перечитываются из БД, так что чтения остаются бесплатными.
+    
+    Args:
+        redis: Клиент Redis
+    """
+    print(f"🔄 Settings invalidation listener started (channel: {SETTINGS_CHANNEL})")
+    
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(SETTINGS_CHANNEL)
+            
+            # Пока не были подписаны, настройки могли измениться - перечитываем
+            await SettingsService.refresh()
+            
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=LISTENER_POLL_TIMEOUT
                 )
+                if message is None or message.get("type") != "message":
+                    continue
                 
-                await session.commit()
-                return True
+                origin = message.get("data")
+                if isinstance(origin, bytes):
+                    origin = origin.decode()
+                if origin == INSTANCE_ID:
+                    continue
                 
-            except Exception as e:
-                await session.rollback()
-                print(f"Error setting maintenance mode: {e}")
-                return False
+                await SettingsService.refresh()
+                print(f"🔄 Settings reloaded after change on replica {origin}")
+        
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Settings listener error: {e}")
+            await asyncio.sleep(LISTENER_RETRY_DELAY)
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass